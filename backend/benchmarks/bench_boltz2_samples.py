@@ -0,0 +1,92 @@
+"""
+Parsing all diffusion samples of a Boltz-2 response: one after the other on
+the event loop (as `structures[0]` alone was), and through the offload
+executor with threads and with processes. A ticker coroutine measures how
+late the event loop wakes it, i.e. how long other requests of the worker
+would stall.
+
+Usage (from backend/):
+    python -m benchmarks.bench_boltz2_samples --samples 10 --residues 3000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+from benchmarks.synthetic import synthetic_mmcif
+from protein_folding.boltz2 import service
+from protein_folding.offload import Offloader
+from protein_folding.utils import calculate_mmcif_plddt
+
+TICK_SECONDS = 0.001
+
+
+async def ticker(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def on_loop(response_data: Dict[str, Any]) -> int:
+    for structure in response_data["structures"]:
+        calculate_mmcif_plddt(structure["structure"])
+    return len(response_data["structures"])
+
+
+async def with_pool(response_data: Dict[str, Any]) -> int:
+    return len([result async for result in service.parse_samples(response_data)])
+
+
+async def measure(label: str, parse, response_data: Dict[str, Any], runs: int) -> None:
+    # Warm up: spawn the pool processes and import NumPy in them
+    await parse(response_data)
+    lags: List[float] = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await parse(response_data)
+        timings.append(time.perf_counter() - start)
+        # Let the ticker run between responses, as other requests would
+        await asyncio.sleep(0.01)
+    stop.set()
+    await tick
+    print(
+        f"{label:<10} median={statistics.median(timings) * 1000:7.1f}ms  "
+        f"loop lag max={max(lags) * 1000:7.1f}ms"
+    )
+
+
+async def main(samples: int, residues: int, workers: int, runs: int) -> None:
+    response_data = {
+        "structures": [
+            {"format": "mmcif", "structure": synthetic_mmcif(residues, seed=i)}
+            for i in range(samples)
+        ],
+        "confidence_scores": [0.5 + i / 100 for i in range(samples)],
+    }
+    size = sum(len(s["structure"]) for s in response_data["structures"])
+    print(f"{samples} samples, {size / 1e6:.1f} MB of mmCIF")
+
+    await measure("on loop", on_loop, response_data, runs)
+    service.offloader = Offloader("thread", workers, min_bytes=0)
+    await measure("threads", with_pool, response_data, runs)
+    service.offloader.close()
+    service.offloader = Offloader("process", workers, min_bytes=0)
+    await measure("processes", with_pool, response_data, runs)
+    service.offloader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--residues", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.samples, args.residues, args.workers, args.runs))
@@ -0,0 +1,87 @@
+"""
+Event loop stalls caused by database queries.
+
+Runs concurrent user-page queries the old way (synchronous sqlite3 on one
+shared connection, inside the coroutine) and through the pooled database
+layer, while a ticker coroutine measures how late the event loop wakes it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_database --users 20000 --queries 200
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+from protein_folding.database import Database
+
+PAGE_SQL = "SELECT id, name, email FROM Users WHERE id > ? ORDER BY id LIMIT ?"
+TICK_SECONDS = 0.001
+
+
+async def ticker(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def measure(
+    label: str, query: Callable[[int], Awaitable[int]], users: int, queries: int
+) -> None:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(query(i * 97 % users) for i in range(queries)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    print(
+        f"{label:<10} {queries / elapsed:>9.0f} queries/s  "
+        f"loop lag p50={statistics.median(lags_ms):.2f}ms "
+        f"max={lags_ms[-1]:.2f}ms"
+    )
+
+
+async def main(users: int, queries: int, limit: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), pool_size=4)
+        await db.migrate()
+        await db.transaction(
+            lambda conn: conn.executemany(
+                "INSERT INTO Users (name, email) VALUES (?, ?)",
+                ((f"user {i}", f"user{i}@example.com") for i in range(users)),
+            )
+        )
+
+        # What fetch_users did: synchronous queries on one global connection
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+
+        async def blocking(after: int) -> int:
+            return len(conn.execute(PAGE_SQL, (after, limit)).fetchall())
+
+        async def pooled(after: int) -> int:
+            rows, _ = await db.fetch_page(PAGE_SQL, (after,), limit)
+            return len(rows)
+
+        await measure("blocking", blocking, users, queries)
+        await measure("pooled", pooled, users, queries)
+        conn.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.queries, args.limit))
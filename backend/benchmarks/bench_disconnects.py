@@ -0,0 +1,94 @@
+"""
+Upstream work left running after a client disconnects mid-fold.
+
+Starts the app and the mock upstream in process, sends each fold request
+over a raw socket, closes the socket part-way through the fold, and reports
+how long the fold kept running and how many NVCF status polls it made after
+the disconnect.
+
+Usage (from backend/):
+    python -m benchmarks.bench_disconnects --latency 3 --disconnect-after 0.5
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+
+from benchmarks import mock_upstream
+from benchmarks.mock_upstream import MockUpstreamServer
+
+APP_PORT = 8788
+SCENARIOS = {
+    "esmfold": ("/api/v1/protein_fold/esmfold", {"sequence": "MKTAYIAKQRQISFVK"}),
+    "boltz2": ("/api/v1/protein_fold/boltz2", {"sequence": "MKTAYIAKQRQISFVK"}),
+    "esmfold batch": (
+        "/api/v1/protein_fold/esmfold/batch",
+        {
+            "records": [
+                {"id": str(i), "sequence": "MKTAYIAKQRQ" + "A" * i} for i in range(20)
+            ]
+        },
+    ),
+}
+
+
+def send_and_disconnect(path: str, body: dict, after: float) -> float:
+    """POST `body` and close the connection after `after` seconds."""
+    data = json.dumps(body).encode()
+    with socket.create_connection(("127.0.0.1", APP_PORT)) as sock:
+        sock.sendall(
+            f"POST {path} HTTP/1.1\r\nHost: localhost\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        time.sleep(after)
+    return time.monotonic()
+
+
+def main(latency: float, disconnect_after: float) -> None:
+    import main as app_module
+    from protein_folding.boltz2 import service as boltz2_service
+    from protein_folding.coalescing import fold_flight
+    from protein_folding.esmfold import service as esmfold_service
+
+    mock_upstream.configure(esmfold_latency=str(latency), boltz2_latency=str(latency))
+    with MockUpstreamServer() as upstream:
+        esmfold_service.INVOKE_URL = f"{upstream.url}/v1/biology/nvidia/esmfold"
+        boltz2_service.INVOKE_URL = f"{upstream.url}/v1/biology/mit/boltz2/predict"
+        boltz2_service.STATUS_URL = f"{upstream.url}/v2/nvcf/pexec/status/{{task_id}}"
+        server = uvicorn.Server(
+            uvicorn.Config(app_module.app, port=APP_PORT, log_level="warning")
+        )
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+
+        print(
+            f"{'endpoint':<14} {'ran on after disconnect ms':>27} {'polls after':>12}"
+        )
+        for name, (path, body) in SCENARIOS.items():
+            disconnected_at = send_and_disconnect(path, body, disconnect_after)
+            polls_at_disconnect = mock_upstream.calls["nvcf_status"]
+            # In-flight folds are tracked by the coalescing layer until they end
+            while fold_flight._calls:
+                time.sleep(0.005)
+            ran_on = time.monotonic() - disconnected_at
+            time.sleep(latency)
+            polls = mock_upstream.calls["nvcf_status"] - polls_at_disconnect
+            print(f"{name:<14} {ran_on * 1000:>27.1f} {polls:>12}")
+
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=3.0)
+    parser.add_argument("--disconnect-after", type=float, default=0.5)
+    args = parser.parse_args()
+    main(args.latency, args.disconnect_after)
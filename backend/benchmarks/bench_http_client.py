@@ -0,0 +1,75 @@
+"""
+Per-request overhead of a fresh `httpx.AsyncClient` per fold versus the shared pool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_http_client --requests 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Callable, List
+
+import httpx
+
+from benchmarks.mock_upstream import MockUpstreamServer
+
+SEQUENCE = "MKTAYIAKQRQISFVKSHFSRQ"
+
+
+async def fresh_client_call(url: str) -> None:
+    # What the services did before: a new client (and connection) per fold
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, json={"sequence": SEQUENCE})
+        response.raise_for_status()
+
+
+def make_pooled_call(client: httpx.AsyncClient) -> Callable:
+    async def pooled_call(url: str) -> None:
+        response = await client.post(url, json={"sequence": SEQUENCE})
+        response.raise_for_status()
+
+    return pooled_call
+
+
+async def measure(call: Callable, url: str, n: int) -> List[float]:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await call(url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: List[float]) -> None:
+    timings_ms = sorted(t * 1000 for t in timings)
+    p95 = timings_ms[int(len(timings_ms) * 0.95) - 1]
+    print(
+        f"{label:<16} mean={statistics.mean(timings_ms):.3f}ms "
+        f"p50={statistics.median(timings_ms):.3f}ms p95={p95:.3f}ms"
+    )
+
+
+async def main(n: int) -> None:
+    from protein_folding.http_client import build_client
+
+    with MockUpstreamServer() as server:
+        url = f"{server.url}/v1/biology/nvidia/esmfold"
+        # Warm up the mock server
+        await measure(fresh_client_call, url, 10)
+
+        report("fresh client", await measure(fresh_client_call, url, n))
+
+        client = build_client()
+        try:
+            report("shared pool", await measure(make_pooled_call(client), url, n))
+        finally:
+            await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,125 @@
+"""
+JSON serialization of fold responses: time, peak memory and body size.
+
+Compares what a response used to cost, validated again and encoded by
+FastAPI through `response_model` or dumped with `model_dump_json`, with the
+fast path: pydantic-core writing bytes directly, cache hits sent as stored,
+and the compact pLDDT encodings.
+
+Peak memory is measured with tracemalloc, which sees the Python objects
+(dicts, strings, bytes) but not pydantic-core's internal buffers.
+
+Usage (from backend/):
+    python -m benchmarks.bench_json --samples 10 --residues 3000
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import pydantic_core
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from benchmarks.synthetic import synthetic_mmcif, synthetic_pdb
+from protein_folding.encoding import fold_response_json, results_json
+from protein_folding.models import (
+    Boltz2Response,
+    Boltz2Result,
+    EsmfoldResponse,
+    EsmfoldResult,
+)
+from protein_folding.utils import calculate_mmcif_plddt, calculate_plddt_from_pdb
+
+
+def boltz2_response(samples: int, residues: int) -> Boltz2Response:
+    results = []
+    for i in range(samples):
+        mmcif = synthetic_mmcif(residues, n_chains=2, seed=i)
+        plddt, chain_plddt = calculate_mmcif_plddt(mmcif)
+        results.append(
+            Boltz2Result(
+                mmcif_string=mmcif,
+                sample_index=i,
+                rank=i + 1,
+                confidence_score=0.9 - i / 100,
+                plddt=plddt,
+                chain_plddt=chain_plddt,
+                confidence_scores=[0.9 - j / 100 for j in range(samples)],
+            )
+        )
+    return Boltz2Response(results=results)
+
+
+def esmfold_response(residues: int) -> EsmfoldResponse:
+    pdb = synthetic_pdb(residues)
+    return EsmfoldResponse(
+        results=[EsmfoldResult(pdb=pdb, plddt=calculate_plddt_from_pdb(pdb))]
+    )
+
+
+def response_model_path(response) -> bytes:
+    """What FastAPI does with a returned model and a `response_model`."""
+    adapter = TypeAdapter(type(response))
+    value = adapter.validate_python(response)
+    return JSONResponse(adapter.dump_python(value, mode="json")).body
+
+
+def measure(fn: Callable[[], bytes], repeat: int) -> Tuple[float, float, int]:
+    """Best time in ms, peak traced memory in MB and body size in MB."""
+    best = min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+    tracemalloc.start()
+    body = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1e6, len(body) / 1e6
+
+
+def paths(response, cached: bytes, wrap) -> List[Tuple[str, Callable[[], bytes]]]:
+    model_type = type(response)
+    return [
+        ("response_model", lambda: response_model_path(response)),
+        ("model_dump_json", lambda: response.model_dump_json().encode()),
+        ("to_json", lambda: pydantic_core.to_json(response)),
+        (
+            "hit, revalidated",
+            lambda: model_type.model_validate_json(wrap(cached)).model_dump_json(),
+        ),
+        ("hit, as stored", lambda: wrap(cached)),
+        ("compact f32", lambda: fold_response_json(response, "f32")),
+        ("compact u8", lambda: fold_response_json(response, "u8")),
+    ]
+
+
+def main(samples: int, residues: int, repeat: int) -> None:
+    boltz2 = boltz2_response(samples, residues)
+    esmfold = esmfold_response(residues)
+    cases = [
+        (
+            f"boltz2 {samples}x{residues}",
+            boltz2,
+            pydantic_core.to_json(boltz2),
+            lambda raw: raw,
+        ),
+        (
+            f"esmfold {residues}",
+            esmfold,
+            pydantic_core.to_json(esmfold.results[0]),
+            lambda raw: results_json([raw]),
+        ),
+    ]
+    print(f"{'response':<20} {'path':<18} {'ms':>8} {'peak MB':>8} {'body MB':>8}")
+    for name, response, cached, wrap in cases:
+        for label, fn in paths(response, cached, wrap):
+            ms, peak, size = measure(fn, repeat)
+            print(f"{name:<20} {label:<18} {ms:>8.2f} {peak:>8.1f} {size:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--residues", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.samples, args.residues, args.repeat)
@@ -0,0 +1,111 @@
+"""
+Result pickup delay and poll traffic of the old fixed 5 s NVCF polling loop
+versus the adaptive poller, for jobs of varying duration.
+
+NVCF is simulated in process, either honoring NVCF-POLL-SECONDS (holding a
+status request until the result is ready) or answering every poll at once.
+
+Usage (from backend/):
+    python -m benchmarks.bench_nvcf_polling --durations 0.2 1 3 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from protein_folding import http_client
+from protein_folding.nvcf import PollPolicy, call_nvcf
+
+INVOKE_URL = "http://nvcf.test/invoke"
+STATUS_URL = "http://nvcf.test/status/{task_id}"
+
+
+def simulated_nvcf(duration: float, long_poll: bool) -> Callable:
+    """An httpx transport handler whose jobs finish `duration` s after submission."""
+    ready_at: Dict[str, float] = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            task_id = uuid.uuid4().hex
+            ready_at[task_id] = time.monotonic() + duration
+        else:
+            task_id = request.url.path.rsplit("/", 1)[-1]
+        remaining = ready_at[task_id] - time.monotonic()
+        hold = float(request.headers.get("nvcf-poll-seconds", 0)) if long_poll else 0
+        if 0 < remaining <= hold:
+            await asyncio.sleep(remaining)
+        elif remaining > 0:
+            await asyncio.sleep(hold)
+            return httpx.Response(202, headers={"nvcf-reqid": task_id})
+        return httpx.Response(200, json={"task_id": task_id})
+
+    return handler
+
+
+async def fixed_interval_call(client: httpx.AsyncClient) -> int:
+    """The previous loop: poll every 5 seconds, forever. Returns the poll count."""
+    headers = {"NVCF-POLL-SECONDS": "300"}
+    response = await client.post(INVOKE_URL, json={}, headers=headers)
+    polls = 0
+    task_id = response.headers.get("nvcf-reqid")
+    while response.status_code == 202:
+        if polls:
+            await asyncio.sleep(5)
+        polls += 1
+        response = await client.get(STATUS_URL.format(task_id=task_id), headers=headers)
+    return polls
+
+
+async def adaptive_call(client: httpx.AsyncClient) -> int:
+    _, stats = await call_nvcf(
+        INVOKE_URL, STATUS_URL, {}, {}, "boltz2", policy=PollPolicy.from_env()
+    )
+    return stats.polls
+
+
+async def measure(
+    call: Callable, duration: float, long_poll: bool, jobs: int
+) -> Tuple[float, float]:
+    """Mean pickup delay after the job finished (s) and mean polls per job."""
+    transport = httpx.MockTransport(simulated_nvcf(duration, long_poll))
+    http_client._client = httpx.AsyncClient(transport=transport)
+
+    async def one() -> Tuple[float, int]:
+        start = time.monotonic()
+        polls = await call(http_client._client)
+        return time.monotonic() - start - duration, polls
+
+    results = await asyncio.gather(*(one() for _ in range(jobs)))
+    await http_client.close_client()
+    return (
+        statistics.mean(delay for delay, _ in results),
+        statistics.mean(polls for _, polls in results),
+    )
+
+
+async def main(durations: List[float], jobs: int) -> None:
+    print(f"{'long poll':<10} {'job s':>6} {'loop':<9} {'pickup ms':>10} {'polls':>6}")
+    for long_poll in (True, False):
+        for duration in durations:
+            for name, call in (
+                ("fixed 5s", fixed_interval_call),
+                ("adaptive", adaptive_call),
+            ):
+                delay, polls = await measure(call, duration, long_poll, jobs)
+                print(
+                    f"{str(long_poll):<10} {duration:>6.1f} {name:<9} "
+                    f"{delay * 1000:>10.1f} {polls:>6.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--durations", type=float, nargs="+", default=[0.2, 1, 3, 8])
+    parser.add_argument("--jobs", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.durations, args.jobs))
@@ -0,0 +1,118 @@
+"""
+Fold response size and encode/decode latency per transport format.
+
+Compares the JSON responses (structure text embedded as a string) with the
+packed binary encoding, each uncompressed and with every content coding the
+server supports. Encode time is what the server spends serializing and
+compressing; decode time is decompressing plus parsing on the client, with
+Python's json/NumPy standing in for the browser.
+
+Usage (from backend/):
+    python -m benchmarks.bench_payloads
+"""
+
+import argparse
+import gzip
+import json
+import timeit
+from typing import Callable, List, Tuple
+
+import brotli
+import zstandard
+
+from benchmarks.synthetic import synthetic_mmcif, synthetic_pdb
+from protein_folding.compression import available_encodings, compress
+from protein_folding.encoding import (
+    pack_boltz2_response,
+    pack_esmfold_response,
+    unpack_structures,
+)
+from protein_folding.models import (
+    Boltz2Response,
+    Boltz2Result,
+    EsmfoldResponse,
+    EsmfoldResult,
+)
+from protein_folding.structure import Structure
+from protein_folding.utils import (
+    calculate_chain_plddt,
+    calculate_plddt_from_pdb,
+    calculate_residue_plddt,
+)
+
+DECOMPRESS = {
+    "identity": lambda body: body,
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda body: zstandard.ZstdDecompressor().decompress(body),
+}
+
+
+def esmfold_response(n_residues: int) -> EsmfoldResponse:
+    pdb = synthetic_pdb(n_residues)
+    return EsmfoldResponse(
+        results=[EsmfoldResult(pdb=pdb, plddt=calculate_plddt_from_pdb(pdb))]
+    )
+
+
+def boltz2_response(n_residues: int) -> Boltz2Response:
+    mmcif = synthetic_mmcif(n_residues, ligand_atoms=30)
+    structure = Structure.from_mmcif(mmcif)
+    return Boltz2Response(
+        results=[
+            Boltz2Result(
+                mmcif_string=mmcif,
+                plddt=calculate_residue_plddt(structure),
+                chain_plddt=calculate_chain_plddt(structure),
+                confidence_scores=[0.9],
+            )
+        ]
+    )
+
+
+def best_ms(fn: Callable, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def formats(model: str) -> List[Tuple[str, Callable, Callable]]:
+    """(name, serialize response, parse body) for each transport format."""
+    pack = pack_esmfold_response if model == "esmfold" else pack_boltz2_response
+    return [
+        ("json", lambda response: response.model_dump_json().encode(), json.loads),
+        ("packed", pack, unpack_structures),
+    ]
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    encodings = ["identity", *available_encodings()]
+    print(
+        f"{'model':<8} {'residues':>8} {'format':<7} {'coding':<8} "
+        f"{'KiB':>9} {'encode ms':>10} {'decode ms':>10}"
+    )
+    for model, build in (("esmfold", esmfold_response), ("boltz2", boltz2_response)):
+        for n in sizes:
+            response = build(n)
+            for name, serialize, parse in formats(model):
+                body = serialize(response)
+                for encoding in encodings:
+                    if encoding == "identity":
+                        wire = body
+                        encode = best_ms(lambda: serialize(response), repeat)
+                    else:
+                        wire = compress(body, encoding)
+                        encode = best_ms(
+                            lambda: compress(serialize(response), encoding), repeat
+                        )
+                    decode = best_ms(lambda: parse(DECOMPRESS[encoding](wire)), repeat)
+                    print(
+                        f"{model:<8} {n:>8} {name:<7} {encoding:<8} "
+                        f"{len(wire) / 1024:>9.1f} {encode:>10.2f} {decode:>10.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
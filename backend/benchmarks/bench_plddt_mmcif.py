@@ -0,0 +1,101 @@
+"""
+mmCIF pLDDT extraction: the original line-splitting parser versus the
+streaming _atom_site tokenizer, on multi-megabyte Boltz-2-style outputs.
+
+Usage (from backend/):
+    python -m benchmarks.bench_plddt_mmcif
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, List
+
+from benchmarks.synthetic import synthetic_mmcif
+from protein_folding.utils import calculate_plddt_from_mmcif
+
+
+def legacy_calculate_plddt_from_mmcif(mmcif_structure: str) -> List[float]:
+    """The splitlines implementation `calculate_plddt_from_mmcif` replaced."""
+    lines = mmcif_structure.splitlines()
+    atom_site_start = None
+    atom_site_headers = []
+    for i, line in enumerate(lines):
+        if line.strip().startswith("_atom_site."):
+            if atom_site_start is None:
+                atom_site_start = i
+            atom_site_headers.append(line.strip())
+        elif atom_site_start is not None and (
+            line.startswith("ATOM") or line.startswith("HETATM")
+        ):
+            break
+        elif (
+            atom_site_start is not None
+            and line.strip()
+            and not line.strip().startswith("_atom_site.")
+        ):
+            break
+    if atom_site_start is None:
+        return []
+
+    auth_seq_id_idx = atom_site_headers.index("_atom_site.auth_seq_id")
+    b_iso_idx = atom_site_headers.index("_atom_site.B_iso_or_equiv")
+    residue_to_scores = defaultdict(list)
+    data_start = atom_site_start + len(atom_site_headers)
+    for line in lines[data_start:]:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("_"):
+            continue
+        if line.startswith("loop_") or line.startswith("data_"):
+            break
+        fields = line.split()
+        if len(fields) <= max(auth_seq_id_idx, b_iso_idx):
+            continue
+        try:
+            residue_idx = int(fields[auth_seq_id_idx])
+            b_factor = float(fields[b_iso_idx])
+            if b_factor <= 1.0:
+                b_factor *= 100
+            residue_to_scores[residue_idx].append(b_factor)
+        except (ValueError, IndexError):
+            continue
+
+    plddt_scores = []
+    for residue_idx in sorted(residue_to_scores.keys()):
+        scores = residue_to_scores[residue_idx]
+        plddt_scores.append(sum(scores) / len(scores))
+    return plddt_scores
+
+
+def peak_memory(fn: Callable, arg: str) -> int:
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    print(f"{'residues':>9} {'MiB':>6} {'impl':<10} {'best ms':>9} {'peak MiB':>9}")
+    for n in sizes:
+        mmcif = synthetic_mmcif(n)
+        # A single chain without ligands is where the old parser was correct
+        legacy = legacy_calculate_plddt_from_mmcif(mmcif)
+        assert calculate_plddt_from_mmcif(mmcif) == legacy
+        size = len(mmcif) / 2**20
+        for label, fn in (
+            ("legacy", legacy_calculate_plddt_from_mmcif),
+            ("streaming", calculate_plddt_from_mmcif),
+        ):
+            best = min(timeit.repeat(lambda: fn(mmcif), number=1, repeat=repeat))
+            peak = peak_memory(fn, mmcif) / 2**20
+            print(f"{n:>9} {size:>6.1f} {label:<10} {best * 1000:>9.2f} {peak:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 30000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,63 @@
+"""
+PDB pLDDT extraction: the original per-line loop versus the vectorized parser.
+
+Usage (from backend/):
+    python -m benchmarks.bench_plddt_pdb
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, List
+
+from benchmarks.synthetic import synthetic_pdb
+from protein_folding.utils import calculate_plddt_from_pdb
+
+
+def legacy_calculate_plddt_from_pdb(protein_structure: str) -> List[float]:
+    """The per-line implementation `calculate_plddt_from_pdb` replaced."""
+    residue_to_scores = defaultdict(list)
+    for line in protein_structure.splitlines():
+        if line.startswith("ATOM"):
+            try:
+                score = float(line[60:66].strip()) * 100
+                residue_idx = int(line[22:26].strip())
+                residue_to_scores[residue_idx].append(score)
+            except (ValueError, IndexError):
+                continue
+    plddt_scores = []
+    for residue_idx in sorted(residue_to_scores.keys()):
+        scores = residue_to_scores[residue_idx]
+        plddt_scores.append(sum(scores) / len(scores))
+    return plddt_scores
+
+
+def peak_memory(fn: Callable, arg: str) -> int:
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    print(f"{'residues':>9} {'impl':<10} {'best ms':>9} {'peak MiB':>9}")
+    for n in sizes:
+        pdb = synthetic_pdb(n)
+        assert calculate_plddt_from_pdb(pdb) == legacy_calculate_plddt_from_pdb(pdb)
+        for label, fn in (
+            ("legacy", legacy_calculate_plddt_from_pdb),
+            ("vectorized", calculate_plddt_from_pdb),
+        ):
+            best = min(timeit.repeat(lambda: fn(pdb), number=1, repeat=repeat))
+            peak = peak_memory(fn, pdb) / 2**20
+            print(f"{n:>9} {label:<10} {best * 1000:>9.2f} {peak:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,127 @@
+"""
+Worker startup time: importing the app, and spawning a server until it answers.
+
+Each measurement runs in a fresh interpreter, as a uvicorn worker or a
+`--reload` cycle does. The import profile lists the modules with the highest
+cumulative import time from `python -X importtime`.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5 --top 15
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+SERVER_PORT = 8789
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def child_env(data_dir: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "NVIDIA_API_KEY": os.environ.get("NVIDIA_API_KEY", "benchmark"),
+        "DATA_DIR": data_dir,
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(data_dir, "prometheus"),
+    }
+
+
+def time_import(env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_server_ready(env: Dict[str, str]) -> float:
+    """Seconds from spawning uvicorn until the app answers a request."""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(SERVER_PORT)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                response = httpx.get(
+                    f"http://127.0.0.1:{SERVER_PORT}/api/v1/protein_fold/quota"
+                )
+                if response.status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before answering")
+            time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def import_profile(env: Dict[str, str], top: int) -> List[Tuple[int, int, str]]:
+    """The `top` imports by cumulative time, as (cumulative us, self us, name)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main(runs: int, top: int) -> None:
+    with socket.socket() as sock:
+        if sock.connect_ex(("127.0.0.1", SERVER_PORT)) == 0:
+            raise SystemExit(f"Port {SERVER_PORT} is in use")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = child_env(data_dir)
+        # The first run warms the OS file cache and writes bytecode
+        time_import(env)
+        imports = [time_import(env) for _ in range(runs)]
+        ready = [time_server_ready(env) for _ in range(runs)]
+        profile = import_profile(env, top)
+
+    print(
+        f"import main      median={statistics.median(imports) * 1000:7.1f}ms "
+        f"min={min(imports) * 1000:7.1f}ms"
+    )
+    print(
+        f"server ready     median={statistics.median(ready) * 1000:7.1f}ms "
+        f"min={min(ready) * 1000:7.1f}ms"
+    )
+    print(f"\n{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in profile:
+        print(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    main(args.runs, args.top)
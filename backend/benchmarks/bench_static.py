@@ -0,0 +1,153 @@
+"""
+Load test for the static frontend routes.
+
+Requests every file of a frontend build from a running server, the way a
+browser would (Accept-Encoding: br, gzip, zstd), and reports requests per
+second, bytes on the wire and latency. With --revalidate each request
+carries the ETag from a first pass, as a returning browser does for
+index.html and images.
+
+--fixture writes a synthetic Vite build of realistic size to --root first;
+serve it by starting the server with STATIC_DIR pointing there, and run
+`invoke precompress --directory <root>` to add .br/.gz variants.
+
+Usage (from backend/):
+    python -m benchmarks.bench_static --fixture --root /tmp/site
+    STATIC_DIR=/tmp/site uvicorn main:app --port 10000 --http httptools
+    python -m benchmarks.bench_static --root /tmp/site --url http://127.0.0.1:10000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+ACCEPT_ENCODING = "gzip, deflate, br, zstd"
+
+
+def write_fixture(root: str) -> None:
+    """Write a synthetic Vite build: an entry chunk, a large vendor chunk, CSS."""
+    rng = random.Random(0)
+    words = ["const", "return", "function", "props", "state", "useEffect", "=>"]
+
+    def script(size: int) -> str:
+        lines = []
+        while sum(map(len, lines)) < size:
+            name = "".join(rng.choices(string.ascii_lowercase, k=6))
+            body = " ".join(rng.choices(words, k=12))
+            lines.append(f"function {name}(a,b){{{body};return a+b}}\n")
+        return "".join(lines)
+
+    os.makedirs(os.path.join(root, "assets"), exist_ok=True)
+    os.makedirs(os.path.join(root, "images"), exist_ok=True)
+    files: Dict[str, bytes] = {
+        "index.html": (
+            '<!doctype html><html><head><script type="module" '
+            'src="/assets/index-B3kq9xZa.js"></script>'
+            '<link rel="stylesheet" href="/assets/index-Dp1fQw7c.css"></head>'
+            '<body><div id="root"></div></body></html>\n'
+        ).encode(),
+        "assets/index-B3kq9xZa.js": script(300_000).encode(),
+        "assets/ketcher_lib-C8vN2mRt.js": script(2_000_000).encode(),
+        "assets/index-Dp1fQw7c.css": ".a{color:red;margin:0 auto}\n".encode() * 1500,
+        "images/logo.png": rng.randbytes(20_000),
+        "favicon.ico": rng.randbytes(15_000),
+    }
+    for name, body in files.items():
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(body)
+    print(f"Wrote {len(files)} files to {root}")
+
+
+def build_paths(root: str) -> List[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith((".br", ".gz")):
+                continue
+            relative = os.path.relpath(os.path.join(dirpath, filename), root)
+            paths.append("/" if relative == "index.html" else f"/{relative}")
+    return sorted(paths)
+
+
+async def fetch(client: httpx.AsyncClient, path: str, headers: Dict[str, str]):
+    # Raw bytes: decompressing would measure the client, not the server
+    async with client.stream("GET", path, headers=headers) as response:
+        size = 0
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+        return response.status_code, size, response.headers.get("etag")
+
+
+async def load(
+    url: str, paths: List[str], seconds: float, concurrency: int, revalidate: bool
+) -> None:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        etags = {}
+        for path in paths:
+            status, _, etag = await fetch(
+                client, path, {"Accept-Encoding": ACCEPT_ENCODING}
+            )
+            if status != 200:
+                raise SystemExit(f"GET {path} returned {status}")
+            etags[path] = etag
+
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        transferred = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker(offset: int) -> None:
+            nonlocal transferred
+            i = offset
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                headers = {"Accept-Encoding": ACCEPT_ENCODING}
+                if revalidate and etags[path]:
+                    headers["If-None-Match"] = etags[path]
+                start = time.perf_counter()
+                status, size, _ = await fetch(client, path, headers)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] += 1
+                transferred += size
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = sorted(t * 1000 for t in latencies)
+    p99 = latencies_ms[int(len(latencies_ms) * 0.99) - 1]
+    print(
+        f"{len(latencies) / elapsed:.0f} req/s, "
+        f"{transferred / elapsed / 1e6:.1f} MB/s on the wire, "
+        f"{transferred / len(latencies) / 1e3:.1f} kB/request, "
+        f"p50={statistics.median(latencies_ms):.2f}ms p99={p99:.2f}ms, "
+        f"statuses={dict(statuses)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--root", default="static")
+    parser.add_argument("--fixture", action="store_true")
+    parser.add_argument("--url", default="http://127.0.0.1:10000")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--revalidate", action="store_true")
+    args = parser.parse_args()
+    if args.fixture:
+        write_fixture(args.root)
+    else:
+        paths = build_paths(args.root)
+        asyncio.run(
+            load(args.url, paths, args.seconds, args.concurrency, args.revalidate)
+        )
@@ -0,0 +1,208 @@
+"""
+Micro-benchmark suite for structure parsing and sequence validation, with
+stored baselines and regression thresholds.
+
+Each case runs a parser or validator on synthetic input: PDB and mmCIF of
+100, 1k and 10k residues, multi-chain structures, multi-sample Boltz-2
+outputs, and sequences up to MAX_SEQUENCE_LENGTH. The best time of each
+case is compared with `baselines.json`; a case slower than its baseline by
+more than `--threshold` is a regression and makes the run exit with 1.
+
+Timings depend on the machine and, on shared machines, on the minute:
+each case is therefore timed right after a fixed pure-Python calibration
+loop and stored as a multiple of it, which cancels out most of the
+difference between machines and runs. What remains is up to about 30%
+on a shared single-CPU machine, hence the 1.5x default threshold; a case
+over it is measured again before it counts. Absolute times are kept next
+to the units for reading. After an intended change, record new baselines with
+`--update` and commit them.
+
+Usage (from backend/):
+    python -m benchmarks.bench_suite                 # compare with baselines
+    python -m benchmarks.bench_suite -k mmcif        # only matching cases
+    python -m benchmarks.bench_suite --update        # record new baselines
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.synthetic import synthetic_mmcif, synthetic_pdb
+from protein_folding.boltz2.service import validate_boltz2_input
+from protein_folding.esmfold.service import validate_sequence
+from protein_folding.models import MAX_SEQUENCE_LENGTH
+from protein_folding.utils import (
+    calculate_mmcif_plddt,
+    calculate_plddt,
+    calculate_plddt_from_mmcif,
+    calculate_plddt_from_pdb,
+)
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+SIZES = (100, 1000, 10000)
+SAMPLES = 5
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+LIGAND_SMILES = "CC(=O)OC1=CC=CC=C1C(=O)O"
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def calibration() -> None:
+    """Fixed pure-Python work that tracks how fast this machine runs the suite."""
+    total = 0
+    for i in range(50_000):
+        total += i % 7
+    "".join(str(i) for i in range(5_000)).split("1")
+
+
+def random_sequence(length: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def cases() -> List[Case]:
+    """Build the inputs once and return the (name, call) pairs to time."""
+    result: List[Case] = []
+    for n in SIZES:
+        pdb = synthetic_pdb(n)
+        mmcif = synthetic_mmcif(n)
+        result += [
+            (f"plddt_from_pdb/{n}", lambda s=pdb: calculate_plddt_from_pdb(s)),
+            (f"plddt_from_mmcif/{n}", lambda s=mmcif: calculate_plddt_from_mmcif(s)),
+            (f"plddt/pdb/{n}", lambda s=pdb: calculate_plddt(s)),
+            (f"plddt/mmcif/{n}", lambda s=mmcif: calculate_plddt(s)),
+        ]
+
+    # Multi-chain: chains must stay apart, and the mmCIF has a ligand chain
+    pdb = synthetic_pdb(10000, n_chains=4)
+    mmcif = synthetic_mmcif(10000, n_chains=4, ligand_atoms=40)
+    result += [
+        ("plddt_from_pdb/4-chains/10000", lambda: calculate_plddt_from_pdb(pdb)),
+        ("plddt_from_mmcif/4-chains/10000", lambda: calculate_plddt_from_mmcif(mmcif)),
+        ("mmcif_plddt/4-chains/10000", lambda: calculate_mmcif_plddt(mmcif)),
+    ]
+
+    # Multi-sample: every diffusion sample of a Boltz-2 response is parsed
+    samples = [
+        synthetic_mmcif(1000, n_chains=2, ligand_atoms=20, seed=i)
+        for i in range(SAMPLES)
+    ]
+    result.append(
+        (
+            f"mmcif_plddt/{SAMPLES}-samples/1000",
+            lambda: [calculate_mmcif_plddt(s) for s in samples],
+        )
+    )
+
+    for n in SIZES:
+        sequence = random_sequence(n)
+        result += [
+            (f"validate_sequence/{n}", lambda s=sequence: validate_sequence(s)),
+            (
+                f"validate_boltz2_input/{n}",
+                lambda s=sequence: validate_boltz2_input(s, LIGAND_SMILES),
+            ),
+        ]
+    sequence = random_sequence(MAX_SEQUENCE_LENGTH).lower()
+    result.append(
+        (
+            f"validate_sequence/lowercase/{MAX_SEQUENCE_LENGTH}",
+            lambda: validate_sequence(sequence),
+        )
+    )
+    return result
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    """Best time of one call in seconds, looping fast calls for ~0.2 s per repeat."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """Best time of `fn` in seconds and in units of the calibration loop."""
+    calibration_seconds = best_time(calibration, repeat)
+    seconds = best_time(fn, repeat)
+    return seconds, seconds / calibration_seconds
+
+
+def load_baselines() -> Optional[Dict]:
+    if not BASELINES_PATH.exists():
+        return None
+    return json.loads(BASELINES_PATH.read_text())
+
+
+def main(pattern: Optional[str], repeat: int, threshold: float, update: bool) -> int:
+    selected = [(name, fn) for name, fn in cases() if not pattern or pattern in name]
+    baselines = load_baselines() or {"cases": {}}
+
+    # Case time in units of the calibration loop, and in seconds
+    measured: Dict[str, Dict[str, float]] = {}
+    regressions: List[str] = []
+    print(f"{'case':<40} {'ms':>10} {'units':>8} {'baseline':>8} {'ratio':>7}")
+    for name, fn in selected:
+        seconds, units = measure(fn, repeat)
+        baseline = baselines["cases"].get(name)
+        if update or baseline is None:
+            measured[name] = {"units": units, "seconds": seconds}
+            print(f"{name:<40} {seconds * 1000:>10.3f} {units:>8.4f} {'-':>8} {'-':>7}")
+            continue
+        if units / baseline["units"] > threshold:
+            # Confirm: a regression has to show up again, a noisy neighbour
+            # on the machine rarely does
+            seconds, units = min(
+                (seconds, units), measure(fn, repeat), key=lambda m: m[1]
+            )
+        measured[name] = {"units": units, "seconds": seconds}
+        ratio = units / baseline["units"]
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<40} {seconds * 1000:>10.3f} {units:>8.4f} "
+            f"{baseline['units']:>8.4f} {ratio:>7.2f}{flag}"
+        )
+
+    if update:
+        baselines["cases"].update(measured)
+        baselines["machine"] = (
+            f"{platform.python_implementation()} {platform.python_version()} "
+            f"{platform.machine()}"
+        )
+        baselines["cases"] = dict(sorted(baselines["cases"].items()))
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"wrote {len(measured)} baselines to {BASELINES_PATH.name}")
+        return 0
+
+    if not baselines["cases"]:
+        print("no baselines yet: record them with --update")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {threshold:.2f}x:")
+        for name in regressions:
+            print(f"  {name}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("-k", dest="pattern", help="Only run cases containing this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="Slowdown over the baseline counted as a regression",
+    )
+    parser.add_argument("--update", action="store_true", help="Record new baselines")
+    args = parser.parse_args()
+    sys.exit(main(args.pattern, args.repeat, args.threshold, args.update))
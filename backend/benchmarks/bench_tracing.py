@@ -0,0 +1,65 @@
+"""
+Per-request cost of tracing spans.
+
+Times a request-shaped trace (a root span plus the spans an uncached Boltz-2
+fold records: validate, cache lookup, rate limit, upstream, invoke, three
+polls, parse, serialize) with tracing disabled, enabled, and enabled with
+JSONL export.
+
+Usage (from backend/):
+    python -m benchmarks.bench_tracing
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+
+from protein_folding import tracing
+from protein_folding.tracing import span, start_trace
+
+
+def traced_request() -> None:
+    with start_trace("request", method="POST", path="/api/v1/protein_fold/boltz2"):
+        with span("validate", sequence_length=120):
+            pass
+        with span("cache.lookup", model="boltz2") as lookup:
+            lookup.set(hit=False)
+        with span("rate_limit", model="boltz2") as wait:
+            wait.set(wait_seconds=0.0)
+        with span("upstream", model="boltz2"):
+            with span("nvcf.invoke", service="boltz2") as invoke:
+                invoke.set(status=202)
+            for attempt in range(1, 4):
+                with span("nvcf.poll", attempt=attempt) as poll:
+                    poll.set(backoff_seconds=0.5, status=202)
+        with span("parse", format="mmcif"):
+            pass
+        with span("serialize", endpoint="boltz2") as serialize:
+            serialize.set(format="json", bytes=1331)
+
+
+def bench(number: int) -> float:
+    """Mean microseconds per traced request."""
+    return min(timeit.repeat(traced_request, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int) -> None:
+    print(f"{'mode':<22} {'us/request':>11}")
+    tracing.env.TRACING_ENABLED = False
+    print(f"{'disabled':<22} {bench(number):>11.2f}")
+
+    tracing.env.TRACING_ENABLED = True
+    tracing.recorder.export_path = None
+    print(f"{'enabled, ring buffer':<22} {bench(number):>11.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracing.recorder.export_path = os.path.join(tmp, "traces.jsonl")
+        print(f"{'enabled, JSONL export':<22} {bench(number // 10):>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.number)
@@ -0,0 +1,313 @@
+"""
+End-to-end load test of the app against the mock NVIDIA/NVCF upstream.
+
+Starts `benchmarks.mock_upstream` and then, for each worker count, the app
+under uvicorn with that many workers, both as subprocesses pointed at each
+other through NVIDIA_API_BASE_URL / NVCF_API_BASE_URL. A closed loop of
+`--concurrency` clients sends fold requests for `--duration` seconds, then
+throughput, latency percentiles and the memory of each worker are reported.
+
+Every request folds a new random sequence unless `--distinct` limits them,
+so by default the fold cache and coalescing never answer for the upstream.
+Rate limiting is turned off: it would measure the configured budget.
+Memory is read from /proc (Linux only): RSS at the end of the run and peak
+RSS (VmHWM) of each worker.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 32 \\
+        --mix esmfold=3,boltz2=1 --esmfold-latency lognormal:0.5:0.5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+MOCK_PORT = 8797
+APP_PORT = 8798
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+ENDPOINTS = {
+    "esmfold": "/api/v1/protein_fold/esmfold",
+    "boltz2": "/api/v1/protein_fold/boltz2",
+}
+
+
+@dataclass
+class Results:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    statuses: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+    @property
+    def errors(self) -> int:
+        return sum(n for status, n in self.statuses.items() if status != 200)
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def start(args: List[str], env: Dict[str, str], log: Path) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *args],
+        env={**os.environ, **env},
+        stdout=log.open("w"),
+        stderr=subprocess.STDOUT,
+        # Its own process group, so stopping it stops its workers too
+        start_new_session=True,
+    )
+
+
+def stop(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+def wait_ready(url: str, process: subprocess.Popen, log: Path, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{url} exited:\n{log.read_text()}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    sys.exit(f"{url} not ready after {timeout:g} s:\n{log.read_text()}")
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """RSS and peak RSS (VmHWM) of a process, in MB."""
+    status = Path(f"/proc/{pid}/status").read_text()
+    fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+    return {
+        "rss": int(fields["VmRSS"].split()[0]) / 1024,
+        "peak": int(fields["VmHWM"].split()[0]) / 1024,
+    }
+
+
+def worker_memory(master_pid: int) -> List[Dict[str, float]]:
+    """
+    Memory of each uvicorn worker: the master's spawned children, or the
+    master itself when it runs the app with a single worker.
+    """
+    workers = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            cmdline = (entry / "cmdline").read_bytes()
+        except OSError:
+            continue
+        # The parent pid is the 2nd field after the parenthesized command
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        # Skips multiprocessing's resource tracker, also a child
+        if ppid == master_pid and b"spawn_main" in cmdline:
+            workers.append(int(entry.name))
+    return [process_memory(pid) for pid in sorted(workers) or [master_pid]]
+
+
+def fold_body(model: str, residues: int, samples: int, rng: random.Random) -> dict:
+    sequence = "".join(rng.choice(AMINO_ACIDS) for _ in range(residues))
+    if model == "boltz2":
+        return {"sequence": sequence, "diffusion_samples": samples}
+    return {"sequence": sequence}
+
+
+async def run_load(
+    base_url: str,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: float,
+    residues: int,
+    samples: int,
+    distinct: Optional[int],
+    seed: int,
+) -> Results:
+    results = Results(latencies={model: [] for model in mix})
+    models = [model for model, weight in mix.items() for _ in range(weight)]
+    rng = random.Random(seed)
+    # A fixed pool of bodies when requests should repeat (cache hits)
+    pool = (
+        [fold_body(rng.choice(models), residues, samples, rng) for _ in range(distinct)]
+        if distinct
+        else None
+    )
+    limits = httpx.Limits(max_connections=concurrency)
+    deadline = time.monotonic() + duration
+
+    async def client(client: httpx.AsyncClient) -> None:
+        while time.monotonic() < deadline:
+            if pool is not None:
+                body = rng.choice(pool)
+                model = "boltz2" if "diffusion_samples" in body else "esmfold"
+            else:
+                model = rng.choice(models)
+                body = fold_body(model, residues, samples, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.post(ENDPOINTS[model], json=body)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            results.statuses[status] += 1
+            if status == 200:
+                results.latencies[model].append(elapsed)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=httpx.Timeout(600)
+    ) as http:
+        started = time.monotonic()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        results.seconds = time.monotonic() - started
+    return results
+
+
+def report(workers: int, results: Results, memory: List[Dict[str, float]]) -> None:
+    throughput = results.requests / results.seconds
+    print(
+        f"\nworkers={workers}  requests={results.requests}  "
+        f"errors={results.errors}  throughput={throughput:.1f} req/s"
+    )
+    if results.errors:
+        errors = {k: v for k, v in results.statuses.items() if k != 200}
+        print(f"  errors by status: {errors}")
+    for model, latencies in results.latencies.items():
+        if not latencies:
+            continue
+        ms = [t * 1000 for t in latencies]
+        print(
+            f"  {model:<8} n={len(ms):<6} p50={statistics.median(ms):8.1f}ms "
+            f"p95={percentile(ms, 0.95):8.1f}ms p99={percentile(ms, 0.99):8.1f}ms"
+        )
+    for i, m in enumerate(memory):
+        print(f"  worker {i}: rss={m['rss']:.1f} MB  peak={m['peak']:.1f} MB")
+
+
+def main(args: argparse.Namespace) -> None:
+    mix = {
+        model: int(weight)
+        for model, weight in (part.split("=") for part in args.mix.split(","))
+    }
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        sys.exit(f"Unknown models in --mix: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix="pomelo-load-") as tmp:
+        logs = Path(tmp)
+        mock_url = f"http://127.0.0.1:{MOCK_PORT}"
+        mock = start(
+            ["benchmarks.mock_upstream:app", "--port", str(MOCK_PORT)],
+            {
+                "MOCK_ESMFOLD_LATENCY": args.esmfold_latency,
+                "MOCK_BOLTZ2_LATENCY": args.boltz2_latency,
+                "MOCK_ERROR_RATE": str(args.error_rate),
+                "MOCK_POLL_ERROR_RATE": str(args.poll_error_rate),
+                "MOCK_POLL_HOLD_SECONDS": str(args.poll_hold),
+                "MOCK_PAYLOAD": args.payload,
+                "MOCK_SEED": str(args.seed),
+            },
+            logs / "mock.log",
+        )
+        try:
+            wait_ready(f"{mock_url}/mock/calls", mock, logs / "mock.log", 30)
+            print(
+                f"mix={args.mix} concurrency={args.concurrency} "
+                f"duration={args.duration:g}s residues={args.residues} "
+                f"payload={args.payload} esmfold={args.esmfold_latency} "
+                f"boltz2={args.boltz2_latency}"
+            )
+            for workers in args.workers:
+                httpx.post(f"{mock_url}/mock/reset")
+                data_dir = logs / f"data-{workers}"
+                log = logs / f"app-{workers}.log"
+                app = start(
+                    [
+                        "main:app",
+                        "--port",
+                        str(APP_PORT),
+                        "--workers",
+                        str(workers),
+                        "--log-level",
+                        "warning",
+                    ],
+                    {
+                        "NVIDIA_API_KEY": "mock",
+                        "NVIDIA_API_BASE_URL": mock_url,
+                        "NVCF_API_BASE_URL": mock_url,
+                        "DATA_DIR": str(data_dir),
+                        "RATE_LIMIT_ENABLED": "false",
+                        "NVCF_POLL_INITIAL_DELAY": "0.05",
+                        "NVCF_POLL_SECONDS": str(max(1, int(args.poll_hold))),
+                    },
+                    log,
+                )
+                try:
+                    app_url = f"http://127.0.0.1:{APP_PORT}"
+                    wait_ready(f"{app_url}/metrics", app, log, 60)
+                    results = asyncio.run(
+                        run_load(
+                            app_url,
+                            mix,
+                            args.concurrency,
+                            args.duration,
+                            args.residues,
+                            args.samples,
+                            args.distinct,
+                            args.seed,
+                        )
+                    )
+                    report(workers, results, worker_memory(app.pid))
+                finally:
+                    stop(app)
+            print(f"\nupstream calls: {httpx.get(f'{mock_url}/mock/calls').json()}")
+        finally:
+            stop(mock)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--mix", default="esmfold=3,boltz2=1")
+    parser.add_argument("--residues", type=int, default=300)
+    parser.add_argument("--samples", type=int, default=3, help="Boltz-2 samples")
+    parser.add_argument(
+        "--distinct", type=int, help="Only send this many distinct requests"
+    )
+    parser.add_argument("--esmfold-latency", default="lognormal:0.3:0.5")
+    parser.add_argument("--boltz2-latency", default="lognormal:2:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--poll-error-rate", type=float, default=0.0)
+    parser.add_argument("--poll-hold", type=float, default=1.0)
+    parser.add_argument("--payload", choices=["minimal", "full"], default="full")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
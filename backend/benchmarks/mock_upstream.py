@@ -0,0 +1,333 @@
+"""
+Local stand-in for the NVIDIA ESMFold / Boltz-2 endpoints used by the benchmarks.
+
+ESMFold answers synchronously, like health.api.nvidia.com does. Boltz-2
+follows the NVCF flow: the invocation answers 202 with an `nvcf-reqid`
+header, and /v2/nvcf/pexec/status/{id} answers 202 until the result is
+ready. Both requests can be held up to NVCF-POLL-SECONDS, as NVCF does.
+
+Behaviour is set from MOCK_* environment variables when the module is
+imported, and can be read or changed at runtime with GET / PUT /mock/config:
+
+    MOCK_ESMFOLD_LATENCY, MOCK_BOLTZ2_LATENCY   latency specs, see `Latency`
+    MOCK_ERROR_RATE        share of invocations answered with an error status
+    MOCK_ERROR_STATUSES    statuses to pick from, e.g. "429,500,503"
+    MOCK_HANG_RATE         share of invocations that never answer
+    MOCK_POLL_ERROR_RATE   share of status polls answered with a 503
+    MOCK_JOB_FAILURE_RATE  share of Boltz-2 jobs that end in a 500
+    MOCK_POLL_HOLD_SECONDS longest time a request is held (default 0)
+    MOCK_PAYLOAD           "minimal" (one CA per residue) or "full"
+    MOCK_SEED              seed for latencies and injected errors
+
+Run standalone with:
+    MOCK_BOLTZ2_LATENCY=lognormal:5:0.5 uvicorn benchmarks.mock_upstream:app --port 8787
+and point the app at it with NVIDIA_API_BASE_URL and NVCF_API_BASE_URL.
+"""
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Literal, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError, field_validator
+
+from benchmarks import synthetic
+
+# How often a hanging invocation checks whether its client gave up
+HANG_CHECK_SECONDS = 0.5
+
+
+@dataclass
+class Latency:
+    """
+    Latency distribution, written as "<kind>:<mean>[:<spread>]" in seconds.
+
+    - "fixed:2" (or just "2"): always 2 s
+    - "uniform:2:0.5": between 1.5 and 2.5 s
+    - "exponential:2": exponentially distributed with a mean of 2 s
+    - "lognormal:2:0.5": log-normal with a median of 2 s and sigma 0.5,
+      the long right tail of real queueing upstreams
+    """
+
+    kind: Literal["fixed", "uniform", "exponential", "lognormal"] = "fixed"
+    mean: float = 0.0
+    spread: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls("fixed", float(parts[0]))
+        kind = parts[0]
+        if kind not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        spread = float(parts[2]) if len(parts) > 2 else 0.0
+        return cls(kind, float(parts[1]), spread)  # type: ignore[arg-type]
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.kind == "uniform":
+            return max(
+                0.0, rng.uniform(self.mean - self.spread, self.mean + self.spread)
+            )
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.mean)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.mean), self.spread)
+        return self.mean
+
+
+class MockConfig(BaseModel):
+    """What the mock answers; fields match the MOCK_* environment variables."""
+
+    esmfold_latency: str = "0"
+    boltz2_latency: str = "0"
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 500, 503)
+    hang_rate: float = 0.0
+    poll_error_rate: float = 0.0
+    job_failure_rate: float = 0.0
+    poll_hold_seconds: float = 0.0
+    payload: Literal["minimal", "full"] = "minimal"
+    seed: Optional[int] = None
+
+    @field_validator("esmfold_latency", "boltz2_latency")
+    @classmethod
+    def check_latency(cls, value: str) -> str:
+        Latency.parse(value)
+        return value
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        values = {}
+        for field in cls.model_fields:
+            raw = os.environ.get(f"MOCK_{field.upper()}")
+            if raw is None:
+                continue
+            if field == "error_statuses":
+                values[field] = tuple(int(s) for s in raw.split(","))
+            else:
+                values[field] = raw
+        # Kept from when a single latency applied to both models
+        if "MOCK_LATENCY_SECONDS" in os.environ:
+            values.setdefault("esmfold_latency", os.environ["MOCK_LATENCY_SECONDS"])
+            values.setdefault("boltz2_latency", os.environ["MOCK_LATENCY_SECONDS"])
+        return cls(**values)
+
+
+config = MockConfig.from_env()
+rng = random.Random(config.seed)
+
+app = FastAPI()
+
+# Number of fold requests received, by model, of NVCF status polls, and of
+# injected faults
+calls = {"esmfold": 0, "boltz2": 0, "nvcf_status": 0, "injected_errors": 0}
+
+# NVCF request id -> (time at which the Boltz-2 result becomes available,
+# request body, whether the job fails)
+pending_tasks = {}
+
+
+def configure(**changes) -> MockConfig:
+    """Change the running mock's configuration, e.g. from an in-process benchmark."""
+    global config, rng
+    config = MockConfig(**{**config.model_dump(), **changes})
+    rng = random.Random(config.seed)
+    return config
+
+
+def synthetic_pdb(sequence: str) -> str:
+    """
+    Build a PDB for `sequence`: one CA atom per residue with a fixed pLDDT,
+    or 8 atoms per residue with varying pLDDT for the "full" payload.
+    """
+    if config.payload == "full":
+        return synthetic.synthetic_pdb(len(sequence))
+    lines = []
+    for i, _ in enumerate(sequence, start=1):
+        lines.append(
+            f"ATOM  {i:5d}  CA  ALA A{i:4d}    "
+            f"{i * 3.8:8.3f}{0.0:8.3f}{0.0:8.3f}{1.0:6.2f}{0.85:6.2f}           C"
+        )
+    lines.append("END")
+    return "\n".join(lines)
+
+
+def synthetic_mmcif(sequence: str, plddt: float = 85.0) -> str:
+    """Build a minimal mmCIF with one CA atom per residue and a fixed pLDDT."""
+    lines = [
+        "data_mock",
+        "loop_",
+        "_atom_site.group_PDB",
+        "_atom_site.id",
+        "_atom_site.label_atom_id",
+        "_atom_site.label_comp_id",
+        "_atom_site.label_asym_id",
+        "_atom_site.auth_asym_id",
+        "_atom_site.auth_seq_id",
+        "_atom_site.pdbx_PDB_ins_code",
+        "_atom_site.Cartn_x",
+        "_atom_site.Cartn_y",
+        "_atom_site.Cartn_z",
+        "_atom_site.B_iso_or_equiv",
+    ]
+    for i, _ in enumerate(sequence, start=1):
+        lines.append(f"ATOM {i} CA ALA A A {i} ? {i * 3.8:.3f} 0.000 0.000 {plddt:.2f}")
+    lines.append("#")
+    return "\n".join(lines)
+
+
+def boltz2_result(sequence: str, samples: int = 1, ligand: bool = False) -> dict:
+    """One structure per diffusion sample, with scores out of rank order."""
+    scores = [round(0.5 + 0.4 * (i * 7 % samples) / samples, 3) for i in range(samples)]
+    if config.payload == "full":
+        structures = [
+            synthetic.synthetic_mmcif(
+                len(sequence), ligand_atoms=20 if ligand else 0, seed=i
+            )
+            for i in range(samples)
+        ]
+    else:
+        structures = [synthetic_mmcif(sequence, 50 + 40 * s) for s in scores]
+    return {
+        "structures": [{"format": "mmcif", "structure": s} for s in structures],
+        "confidence_scores": scores,
+    }
+
+
+def hold_seconds(request: Request) -> float:
+    """How long NVCF may hold this request before answering 202."""
+    try:
+        requested = float(request.headers.get("nvcf-poll-seconds", "0"))
+    except ValueError:
+        requested = 0.0
+    return min(requested, config.poll_hold_seconds)
+
+
+async def inject_fault(request: Request) -> Optional[JSONResponse]:
+    """An error response or a hang for a share of invocations, else None."""
+    if config.hang_rate and rng.random() < config.hang_rate:
+        calls["injected_errors"] += 1
+        # Until the client times out and disconnects
+        while not await request.is_disconnected():
+            await asyncio.sleep(HANG_CHECK_SECONDS)
+        return JSONResponse({}, status_code=504)
+    if config.error_rate and rng.random() < config.error_rate:
+        calls["injected_errors"] += 1
+        status = rng.choice(config.error_statuses)
+        return JSONResponse({"detail": "Injected error"}, status_code=status)
+    return None
+
+
+async def boltz2_answer(task_id: str, hold: float):
+    """The result if ready within `hold` seconds, else a 202 to poll again."""
+    ready_at, body, fails = pending_tasks[task_id]
+    wait = ready_at - time.time()
+    if wait > 0:
+        if wait > hold:
+            await asyncio.sleep(hold)
+            return JSONResponse({}, status_code=202, headers={"nvcf-reqid": task_id})
+        await asyncio.sleep(wait)
+    del pending_tasks[task_id]
+    if fails:
+        calls["injected_errors"] += 1
+        return JSONResponse({"detail": "Injected job failure"}, status_code=500)
+    return boltz2_result(
+        body["polymers"][0]["sequence"],
+        body.get("diffusion_samples", 1),
+        ligand=bool(body.get("ligands")),
+    )
+
+
+@app.post("/v1/biology/nvidia/esmfold")
+async def esmfold(request: Request):
+    body = await request.json()
+    calls["esmfold"] += 1
+    fault = await inject_fault(request)
+    if fault is not None:
+        return fault
+    latency = Latency.parse(config.esmfold_latency).sample(rng)
+    if latency:
+        await asyncio.sleep(latency)
+    return {"pdbs": [synthetic_pdb(body["sequence"])]}
+
+
+@app.post("/v1/biology/mit/boltz2/predict")
+async def boltz2_predict(request: Request):
+    body = await request.json()
+    calls["boltz2"] += 1
+    fault = await inject_fault(request)
+    if fault is not None:
+        return fault
+    task_id = uuid.uuid4().hex
+    latency = Latency.parse(config.boltz2_latency).sample(rng)
+    fails = bool(config.job_failure_rate) and rng.random() < config.job_failure_rate
+    pending_tasks[task_id] = (time.time() + latency, body, fails)
+    return await boltz2_answer(task_id, hold_seconds(request))
+
+
+@app.get("/v2/nvcf/pexec/status/{task_id}")
+async def nvcf_status(task_id: str, request: Request):
+    calls["nvcf_status"] += 1
+    if task_id not in pending_tasks:
+        return JSONResponse({"detail": "Unknown request id"}, status_code=404)
+    if config.poll_error_rate and rng.random() < config.poll_error_rate:
+        calls["injected_errors"] += 1
+        return JSONResponse({"detail": "Injected poll error"}, status_code=503)
+    return await boltz2_answer(task_id, hold_seconds(request))
+
+
+@app.get("/mock/calls")
+async def get_calls():
+    return calls
+
+
+@app.get("/mock/config")
+async def get_config() -> MockConfig:
+    return config
+
+
+@app.put("/mock/config")
+async def put_config(changes: dict):
+    try:
+        return configure(**changes)
+    except (ValidationError, TypeError) as e:
+        return JSONResponse({"detail": str(e)}, status_code=422)
+
+
+@app.post("/mock/reset")
+async def reset():
+    for key in calls:
+        calls[key] = 0
+    pending_tasks.clear()
+    return calls
+
+
+class MockUpstreamServer:
+    """Run the mock upstream in a background thread for the duration of a benchmark."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8787):
+        self.url = f"http://{host}:{port}"
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "MockUpstreamServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
@@ -0,0 +1,110 @@
+"""Synthetic PDB and mmCIF structures for the parsing benchmarks."""
+
+import random
+from typing import List
+
+ATOMS_PER_RESIDUE = ("N", "CA", "C", "O", "CB", "CG", "CD", "NE")
+CHAIN_IDS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def synthetic_pdb(n_residues: int, n_chains: int = 1, seed: int = 0) -> str:
+    """
+    Build an ESMFold-style PDB with 8 atoms per residue and pLDDT in 0-1.
+
+    Args:
+        n_residues: Total number of residues, split evenly across chains
+        n_chains: Number of chains
+        seed: Random seed for coordinates and pLDDT values
+
+    Returns:
+        PDB format string
+    """
+    rng = random.Random(seed)
+    lines: List[str] = []
+    serial = 1
+    per_chain = max(1, n_residues // n_chains)
+    for chain in range(n_chains):
+        chain_id = CHAIN_IDS[chain % len(CHAIN_IDS)]
+        for res_seq in range(1, per_chain + 1):
+            plddt = rng.uniform(0.3, 0.98)
+            for name in ATOMS_PER_RESIDUE:
+                x, y, z = (rng.uniform(-50, 50) for _ in range(3))
+                lines.append(
+                    f"ATOM  {serial % 100000:5d} {name:<4} ALA {chain_id}"
+                    f"{res_seq % 10000:4d}    {x:8.3f}{y:8.3f}{z:8.3f}"
+                    f"{1.0:6.2f}{plddt:6.2f}           {name[0]}"
+                )
+                serial += 1
+        lines.append("TER")
+    lines.append("END")
+    return "\n".join(lines)
+
+
+MMCIF_ATOM_SITE_TAGS = (
+    "group_PDB",
+    "id",
+    "type_symbol",
+    "label_atom_id",
+    "label_alt_id",
+    "label_comp_id",
+    "label_seq_id",
+    "auth_seq_id",
+    "pdbx_PDB_ins_code",
+    "label_asym_id",
+    "Cartn_x",
+    "Cartn_y",
+    "Cartn_z",
+    "occupancy",
+    "label_entity_id",
+    "auth_asym_id",
+    "auth_comp_id",
+    "B_iso_or_equiv",
+    "pdbx_PDB_model_num",
+)
+
+
+def synthetic_mmcif(
+    n_residues: int, n_chains: int = 1, ligand_atoms: int = 0, seed: int = 0
+) -> str:
+    """
+    Build a Boltz-2-style mmCIF with 8 atoms per residue and pLDDT in 0-100.
+
+    Args:
+        n_residues: Total number of polymer residues, split evenly across chains
+        n_chains: Number of polymer chains
+        ligand_atoms: Atoms of a ligand in its own chain after the polymers
+        seed: Random seed for coordinates and pLDDT values
+
+    Returns:
+        mmCIF format string
+    """
+    rng = random.Random(seed)
+    lines = ["data_model", "#", "loop_"]
+    lines += [f"_atom_site.{tag}" for tag in MMCIF_ATOM_SITE_TAGS]
+    serial = 1
+
+    def atom(group, name, comp, label_seq, auth_seq, chain, entity, plddt):
+        nonlocal serial
+        x, y, z = (rng.uniform(-50, 50) for _ in range(3))
+        element = name.strip('"')[0]
+        lines.append(
+            f"{group:<6} {serial:<6} {element} {name:<5} . {comp} {label_seq:<5} "
+            f"{auth_seq:<5} ? {chain} {x:8.3f} {y:8.3f} {z:8.3f} 1 {entity} "
+            f"{chain} {comp} {plddt:6.2f} 1"
+        )
+        serial += 1
+
+    per_chain = max(1, n_residues // n_chains)
+    for chain in range(n_chains):
+        chain_id = CHAIN_IDS[chain % len(CHAIN_IDS)]
+        for res_seq in range(1, per_chain + 1):
+            plddt = rng.uniform(30, 98)
+            for name in ATOMS_PER_RESIDUE:
+                atom("ATOM", name, "ALA", res_seq, res_seq, chain_id, 1, plddt)
+    if ligand_atoms:
+        chain_id = CHAIN_IDS[n_chains % len(CHAIN_IDS)]
+        plddt = rng.uniform(30, 98)
+        for i in range(1, ligand_atoms + 1):
+            atom("HETATM", f'"C{i}\'"', "LIG", ".", 1, chain_id, 2, plddt)
+    lines += ["#", "loop_", "_atom_type.symbol", "C", "N", "O", "#"]
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,6 @@
 import logging
+from functools import lru_cache
+from typing import Literal, Optional
 from pydantic import ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,9 +12,176 @@ class EnvVars(BaseSettings):
     )
     DEBUG: bool = False
     NVIDIA_API_KEY: str
+    # Enables the admin endpoints (sent as the X-Admin-Key header) when set
+    ADMIN_API_KEY: Optional[str] = None
+    # Directory for state shared between uvicorn workers (caches, leases, ...)
+    DATA_DIR: str = "data"
 
+    # Application database (users, Boltz-2 jobs) in DATA_DIR, and how many
+    # connections each worker keeps open to it
+    DATABASE_FILE: str = "pomelo.db"
+    DATABASE_POOL_SIZE: int = 4
+    # Database the users were kept in, relative to the working directory,
+    # before DATA_DIR. Its Users are copied into DATABASE_FILE once, when
+    # that is migrated
+    LEGACY_DATABASE_FILE: Optional[str] = "database.db"
 
+    # Upstream API hosts: function invocations, and NVCF status polls. Point
+    # both at benchmarks.mock_upstream to run without spending NVIDIA quota
+    NVIDIA_API_BASE_URL: str = "https://health.api.nvidia.com"
+    NVCF_API_BASE_URL: str = "https://api.nvcf.nvidia.com"
+
+    # Shared upstream HTTP client pool
+    UPSTREAM_HTTP2: bool = False
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT: float = 10.0
+    ESMFOLD_TIMEOUT: float = 300.0
+    BOLTZ2_TIMEOUT: float = 400.0
+
+    # Resilience of upstream requests. Failed attempts that are safe to repeat
+    # (never sent, or idempotent) are retried after a jittered exponential
+    # backoff, UPSTREAM_RETRY_ATTEMPTS attempts in all
+    UPSTREAM_RETRY_ATTEMPTS: int = 3
+    UPSTREAM_RETRY_INITIAL_DELAY: float = 0.5
+    UPSTREAM_RETRY_MAX_DELAY: float = 5.0
+    UPSTREAM_RETRY_MULTIPLIER: float = 2.0
+    UPSTREAM_RETRY_JITTER: float = 0.5
+    # Hedged ESMFold requests: a second request once the first has run longer
+    # than the ESMFOLD_HEDGE_PERCENTILE of the latest ESMFOLD_HEDGE_WINDOW
+    # latencies in the worker. Costs a rate limit token when one is free
+    ESMFOLD_HEDGE_ENABLED: bool = False
+    ESMFOLD_HEDGE_PERCENTILE: float = 0.95
+    ESMFOLD_HEDGE_MIN_DELAY: float = 0.5
+    ESMFOLD_HEDGE_MIN_SAMPLES: int = 20
+    ESMFOLD_HEDGE_WINDOW: int = 200
+    # Per-endpoint circuit breakers, per worker: after CIRCUIT_FAILURE_THRESHOLD
+    # consecutive upstream failures, requests fail fast with a 503 for
+    # CIRCUIT_RESET_SECONDS, then CIRCUIT_HALF_OPEN_PROBES probes test upstream
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    CIRCUIT_HALF_OPEN_PROBES: int = 1
+    # Fair scheduling of upstream folds, per worker. Folds are costed from
+    # their size and parameters (a unit is roughly a second upstream) and
+    # start while the cost in flight fits the capacity of their lane: single
+    # ESMFold folds are interactive, Boltz-2 and ESMFold batches are batch.
+    # Within a lane, clients take turns by deficit round robin, each turn
+    # worth SCHEDULER_QUANTUM. Clients are told apart by address, or by the
+    # SCHEDULER_CLIENT_HEADER set by a trusted proxy. SCHEDULER_MAX_QUEUED_PER_CLIENT
+    # only caps clients identified by that header, as every client behind a
+    # proxy shares its address
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_INTERACTIVE_CAPACITY: float = 16.0
+    SCHEDULER_BATCH_CAPACITY: float = 400.0
+    SCHEDULER_QUANTUM: float = 10.0
+    SCHEDULER_MAX_QUEUED_PER_CLIENT: int = 200
+    SCHEDULER_CLIENT_HEADER: Optional[str] = None
+
+    # Polling of asynchronous NVCF invocations. NVCF holds each request for up
+    # to NVCF_POLL_SECONDS (max 300); answers that come back sooner are spaced
+    # by a jittered exponential backoff
+    NVCF_POLL_SECONDS: int = 300
+    NVCF_POLL_INITIAL_DELAY: float = 0.5
+    NVCF_POLL_MAX_DELAY: float = 5.0
+    NVCF_POLL_MULTIPLIER: float = 1.5
+    NVCF_POLL_JITTER: float = 0.2
+    NVCF_DEADLINE_SECONDS: float = 1800.0
+
+    # Upstream request budgets per model, shared by all workers. Requests
+    # queue for a token up to RATE_LIMIT_MAX_WAIT_SECONDS, then get a 429
+    RATE_LIMIT_ENABLED: bool = True
+    ESMFOLD_RATE_PER_MINUTE: float = 40.0
+    ESMFOLD_RATE_BURST: int = 10
+    BOLTZ2_RATE_PER_MINUTE: float = 40.0
+    BOLTZ2_RATE_BURST: int = 5
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 30.0
+    # How long every worker pauses a model after the upstream answers 429
+    RATE_LIMIT_UPSTREAM_BACKOFF_SECONDS: float = 10.0
+
+    # Compression of response bodies, negotiated from Accept-Encoding
+    RESPONSE_COMPRESSION_ENABLED: bool = True
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+
+    # Per-request tracing spans, viewable at /api/v1/debug/traces. Each worker
+    # keeps its latest TRACE_BUFFER_SIZE traces; TRACE_EXPORT_PATH, if set,
+    # also appends every trace to a JSONL file
+    TRACING_ENABLED: bool = False
+    TRACE_BUFFER_SIZE: int = 200
+    TRACE_EXPORT_PATH: Optional[str] = None
+
+    # Frontend build served by the backend in production
+    STATIC_DIR: str = "static"
+    # In-memory cache of small static files, per worker
+    STATIC_MEMORY_BYTES: int = 32 * 1024 * 1024
+    STATIC_MEMORY_MAX_FILE_BYTES: int = 512 * 1024
+
+    # CPU-heavy steps (parsing structures and FASTA uploads, serializing
+    # responses) run inline below OFFLOAD_MIN_BYTES of input, and above it on
+    # a per-worker pool of OFFLOAD_WORKERS threads or spawned processes.
+    # Processes parse in parallel on multi-core hosts but cost memory and
+    # pickling; serialization always uses threads
+    OFFLOAD_EXECUTOR: Literal["thread", "process"] = "thread"
+    OFFLOAD_WORKERS: int = 2
+    OFFLOAD_MIN_BYTES: int = 256 * 1024
+
+    # Event loop lag monitor. A heartbeat runs every LOOP_MONITOR_INTERVAL;
+    # stalls longer than LOOP_STALL_THRESHOLD_SECONDS are logged with the
+    # stack of the code blocking the loop
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.05
+    LOOP_STALL_THRESHOLD_SECONDS: float = 0.1
+
+    # Batch ESMFold
+    ESMFOLD_BATCH_MAX_RECORDS: int = 1000
+    ESMFOLD_BATCH_CONCURRENCY: int = 8
+    # FASTA uploads larger than this are rejected before they are parsed. The
+    # default fits ESMFOLD_BATCH_MAX_RECORDS records of the longest sequence
+    # with their headers and line breaks
+    ESMFOLD_FASTA_MAX_BYTES: int = 11 * 1024 * 1024
+
+    # Structure artifacts: gzip files named by their SHA-256 in ARTIFACT_DIR
+    # (relative to DATA_DIR), downloaded with Range and ETag support. Fold
+    # endpoints link to them instead of inlining structures with
+    # ?structure=url. Artifacts not stored again within
+    # ARTIFACT_RETENTION_SECONDS are removed
+    ARTIFACT_DIR: str = "artifacts"
+    ARTIFACT_RETENTION_SECONDS: int = 7 * 24 * 60 * 60
+
+    # Structure analysis: distance and contact maps are binned to at most
+    # ANALYSIS_MAX_MAP_SIZE cells per side. Results are kept in the fold cache.
+    # Map time grows with the square of the residues: structures with more
+    # than ANALYSIS_MAX_RESIDUES are rejected
+    ANALYSIS_MAX_MAP_SIZE: int = 2000
+    ANALYSIS_MAX_RESIDUES: int = 20000
+
+    # Fold result cache
+    FOLD_CACHE_ENABLED: bool = True
+    FOLD_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    FOLD_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    # Bounds how long a purge in one worker can be masked by another's memory tier
+    FOLD_CACHE_MEMORY_TTL_SECONDS: int = 300
+    # Cross-worker coalescing of identical in-flight folds
+    FOLD_LEASE_SECONDS: float = 30.0
+    FOLD_LEASE_POLL_INTERVAL: float = 0.5
+
+    # Background Boltz-2 jobs
+    BOLTZ2_MAX_CONCURRENT_JOBS: int = 8
+    JOB_RETENTION_SECONDS: int = 24 * 60 * 60
+    JOB_HEARTBEAT_SECONDS: float = 30.0
+    JOB_EVENTS_INTERVAL: float = 1.0
+
+
+@lru_cache(maxsize=None)
 def check_env_vars() -> EnvVars:
+    """
+    Load and validate the settings once per process.
+
+    Every module reads its configuration through this function at import
+    time, so caching it keeps startup to a single pass over the environment
+    and .env files.
+    """
     try:
         # Pydantic automatically validates and loads the environment variables
         return EnvVars()  # type: ignore
@@ -1,106 +1,170 @@
-import sqlite3
-from fastapi import FastAPI, Request
-from starlette.responses import FileResponse
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Query, Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 import time
 from config import check_env_vars
 from protein_folding.routers import router as protein_folding_router
+from protein_folding.http_client import start_client, close_client
+from protein_folding.cache import fold_cache
+from protein_folding.database import db
+from protein_folding.coalescing import fold_flight
+from protein_folding.jobs import boltz2_jobs
+from protein_folding.loop_monitor import loop_monitor
+from protein_folding.offload import offloader
+from protein_folding.ratelimit import upstream_limiter
+from protein_folding.compression import CompressionMiddleware
+from protein_folding.static_files import static_dir
+from protein_folding.scheduler import ClientMiddleware
+from protein_folding.tracing import TracingMiddleware, recorder
+from protein_folding.metrics import (
+    METRICS_MEDIA_TYPE,
+    MetricsMiddleware,
+    mark_worker_stopped,
+    render_metrics,
+)
 
 # Initialize environment variables
 env = check_env_vars()
 
-app = FastAPI()
+# Frontend build files, served without request logging
+STATIC_PATH_PREFIXES = ("/assets/", "/images/", "/favicon.ico")
+
+
+# Imported off the request path after startup: parsing structures needs NumPy
+WARM_UP_MODULES = ("protein_folding.structure", "protein_folding.analysis.compute")
+
+
+async def warm_up() -> None:
+    """Do the expensive one-off setup once the worker is already serving."""
+    # One pooled upstream client per worker, shared by all folding services
+    await start_client()
+    for module in WARM_UP_MODULES:
+        await asyncio.to_thread(importlib.import_module, module)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.migrate()
+    # Requests arriving before the warm-up finishes do the work themselves
+    warm_up_task = asyncio.create_task(warm_up())
+    if env.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    try:
+        yield
+    finally:
+        await loop_monitor.stop()
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+        await boltz2_jobs.shutdown()
+        await close_client()
+        fold_cache.close()
+        fold_flight.close()
+        upstream_limiter.close()
+        db.close()
+        offloader.close()
+        recorder.close()
+        mark_worker_stopped()
+
+
+app = FastAPI(lifespan=lifespan)
+
+if env.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=env.RESPONSE_COMPRESSION_MIN_BYTES
+    )
+if env.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+app.add_middleware(ClientMiddleware, header=env.SCHEDULER_CLIENT_HEADER)
+app.add_middleware(MetricsMiddleware)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    logger.info(f"Incoming Request: Method={request.method}, URL={request.url}")
+class RequestLoggingMiddleware:
+    """Log each request and its response, except for static frontend files."""
 
-    response = await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(STATIC_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.time()
+        query = scope["query_string"].decode("latin-1")
+        url = scope["path"] + (f"?{query}" if query else "")
+        logger.info(f"Incoming Request: Method={scope['method']}, URL={url}")
+
+        async def send_logged(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                process_time = time.time() - start_time
+                logger.info(
+                    f"Outgoing Response: Status={message['status']}, "
+                    f"ProcessTime={process_time:.4f}s"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_logged)
 
-    process_time = time.time() - start_time
-    logger.info(
-        f"Outgoing Response: Status={response.status_code}, ProcessTime={process_time:.4f}s"
-    )
-    return response
+
+# Added last so it is outermost and logs the time of the whole response
+app.add_middleware(RequestLoggingMiddleware)
 
 
 # Include routers
 app.include_router(protein_folding_router, prefix="/api/v1")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Aggregates the samples every uvicorn worker writes to the shared directory
+    return Response(render_metrics(), media_type=METRICS_MEDIA_TYPE)
+
+
 @app.get("/")
 @app.get("/app/{full_path:path}")
-async def read_app():
-    return FileResponse("static/index.html")
+async def read_app(request: Request):
+    return await static_dir.response(request, "index.html")
 
 
 # anytime we get /assets/*, we want to serve the static files in the assets folder
-# used in prod to serve react build
-@app.get("/assets/{file_path}")
-def static_assets(file_path: str):
-    return FileResponse(f"static/assets/{file_path}")
+# used in prod to serve react build. Vite content-hashes these file names
+@app.get("/assets/{file_path:path}")
+async def static_assets(request: Request, file_path: str):
+    return await static_dir.response(request, f"assets/{file_path}", immutable=True)
 
 
 # anytime we get /images/*, we want to serve the static files in the assets folder
 # used in prod to serve react build
-@app.get("/images/{file_path}")
-def static_images(file_path: str):
-    return FileResponse(f"static/images/{file_path}")
+@app.get("/images/{file_path:path}")
+async def static_images(request: Request, file_path: str):
+    return await static_dir.response(request, f"images/{file_path}")
 
 
 @app.get("/favicon.ico")
-def favicon():
-    return FileResponse("static/favicon.ico")
+async def favicon(request: Request):
+    return await static_dir.response(request, "favicon.ico")
 
 
 @app.get("/api/users")
-async def fetch_users():
-    # get users from db
-    conn = get_db_connection()
-    with conn:
-        users = conn.execute("SELECT * FROM Users").fetchall()
-        return {"users": users}
-
-
-conn = None
-
-
-def get_db_connection():
-    global conn
-    if conn is None:
-        conn = sqlite3.connect("database.db")
-    return conn
-
-
-def setup_dev_db():
-    conn = get_db_connection()
-    with conn:
-        conn.execute(
-            """
-                CREATE TABLE IF NOT EXISTS Users (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL UNIQUE
-            )
-        """
-        )
-
-        # Insert dummy data
-        users = [
-            ("Alice", "alice@example.com"),
-            ("Bob", "bob@example.com"),
-            ("Charlie", "charlie@example.com"),
-        ]
-
-        conn.executemany(
-            "INSERT OR IGNORE INTO Users (name, email) VALUES (?, ?)", users
-        )
-    print("Dev Database setup completed")
-
-
-setup_dev_db()
+async def fetch_users(
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[int] = Query(None, description="Return users after this id"),
+):
+    # Keyset pagination: the next page starts after the last id of this one
+    users, more = await db.fetch_page(
+        "SELECT id, name, email FROM Users WHERE id > ? ORDER BY id LIMIT ?",
+        (after or 0,),
+        limit,
+    )
+    return {
+        "users": [dict(user) for user in users],
+        "next_after": users[-1]["id"] if more else None,
+    }
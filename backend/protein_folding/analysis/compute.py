@@ -0,0 +1,299 @@
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from protein_folding.encoding import pack_analysis
+from protein_folding.exceptions import ProteinStructureValidationError
+from protein_folding.structure import Structure
+from protein_folding.utils import scale_plddt
+
+# AlphaFold's pLDDT confidence bands, by their lower bounds
+PLDDT_BANDS = ("very_low", "low", "confident", "very_high")
+PLDDT_BAND_EDGES = (50.0, 70.0, 90.0)
+# Residues below the "confident" band belong to low-confidence segments
+LOW_CONFIDENCE_THRESHOLD = PLDDT_BAND_EDGES[1]
+MIN_SEGMENT_LENGTH = 3
+
+# Residues are in contact when their C-alpha atoms are closer than this (in
+# Angstrom), unless they are this close in the sequence of one chain
+CONTACT_DISTANCE = 8.0
+CONTACT_MIN_SEPARATION = 3
+
+# Distance maps are uint8 in steps of DISTANCE_STEP Angstrom; 255 means at
+# least 255 steps
+DISTANCE_STEP = 0.5
+# Elements of the float64 distance block computed at a time (~16 MB)
+BLOCK_ELEMENTS = 1 << 21
+
+
+class Residues(NamedTuple):
+    """The C-alpha atom of every residue, in structure order."""
+
+    coords: np.ndarray
+    chain_ids: np.ndarray
+    res_seq: np.ndarray
+    plddt: np.ndarray
+
+
+def ca_residues(structure: Structure) -> Residues:
+    """
+    Select the first C-alpha atom of every residue, with the residue's pLDDT.
+
+    Ligands (HETATM records) are left out; pLDDT is NaN for residues without
+    B-factors.
+    """
+    starts = structure.residue_starts()
+    ca = np.flatnonzero((structure.atom_names == b"CA") & ~structure.hetero)
+    residue = np.searchsorted(starts, ca, side="right") - 1
+    # Alternate locations repeat the atom within its residue
+    residue, first = np.unique(residue, return_index=True)
+    ca = ca[first]
+    plddt = structure.residue_means(scale_plddt(structure.b_factors))[residue]
+    return Residues(
+        structure.coords[ca].astype(np.float64),
+        structure.chain_ids[ca],
+        structure.res_seq[ca],
+        plddt,
+    )
+
+
+def _number(value: float, digits: int = 3) -> Optional[float]:
+    """A JSON-safe rounded float, None for NaN."""
+    return None if math.isnan(value) else round(float(value), digits)
+
+
+def radius_of_gyration(coords: np.ndarray) -> Optional[float]:
+    """Root mean square distance of the atoms from their centroid, in Angstrom."""
+    if len(coords) == 0:
+        return None
+    centered = coords - coords.mean(axis=0)
+    return _number(np.sqrt(np.mean(np.einsum("ij,ij->i", centered, centered))))
+
+
+def plddt_summary(plddt: np.ndarray) -> Dict[str, Any]:
+    """Statistics and confidence band counts of per-residue pLDDT scores."""
+    scored = plddt[~np.isnan(plddt)]
+    counts = np.bincount(np.digitize(scored, PLDDT_BAND_EDGES), minlength=4)
+    if len(scored) == 0:
+        return {
+            "scored": 0,
+            "mean": None,
+            "median": None,
+            "min": None,
+            "max": None,
+            "bands": dict.fromkeys(PLDDT_BANDS, 0),
+        }
+    return {
+        "scored": len(scored),
+        "mean": _number(scored.mean()),
+        "median": _number(np.median(scored)),
+        "min": _number(scored.min()),
+        "max": _number(scored.max()),
+        "bands": dict(zip(PLDDT_BANDS, counts.tolist())),
+    }
+
+
+def low_confidence_segments(
+    residues: Residues,
+    threshold: float = LOW_CONFIDENCE_THRESHOLD,
+    min_length: int = MIN_SEGMENT_LENGTH,
+) -> List[Dict[str, Any]]:
+    """
+    Find runs of at least `min_length` consecutive residues of one chain
+    with pLDDT below `threshold`.
+
+    Returns:
+        One entry per segment, in structure order, with its chain, first
+        and last residue numbers, index of its first residue, length and
+        mean pLDDT
+    """
+    plddt = residues.plddt
+    if len(plddt) == 0:
+        return []
+    low = np.nan_to_num(plddt, nan=np.inf) < threshold
+    new_chain = np.concatenate(
+        ([True], residues.chain_ids[1:] != residues.chain_ids[:-1])
+    )
+    # Runs break at chain boundaries as well as at confident residues
+    starts = np.flatnonzero(low & (new_chain | ~np.concatenate(([False], low[:-1]))))
+    ends = (
+        np.flatnonzero(
+            low & (np.concatenate((new_chain[1:], [True])) | ~np.append(low[1:], False))
+        )
+        + 1
+    )
+    lengths = ends - starts
+    keep = lengths >= min_length
+    starts, ends, lengths = starts[keep], ends[keep], lengths[keep]
+    sums = np.concatenate(([0.0], np.cumsum(np.nan_to_num(plddt))))
+    means = (sums[ends] - sums[starts]) / lengths
+    return [
+        {
+            "chain_id": residues.chain_ids[start].decode(),
+            "start": int(residues.res_seq[start]),
+            "end": int(residues.res_seq[end - 1]),
+            "start_index": int(start),
+            "length": int(length),
+            "mean_plddt": _number(mean),
+        }
+        for start, end, length, mean in zip(
+            starts.tolist(), ends.tolist(), lengths.tolist(), means.tolist()
+        )
+    ]
+
+
+def distance_maps(
+    residues: Residues, max_size: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Compute C-alpha distance and contact maps, binned to at most `max_size`.
+
+    Squared distances come from the Gram matrix, a block of rows at a time,
+    so the full float matrix never exists. With more residues than `max_size`,
+    each map cell covers `bin_size` x `bin_size` residue pairs and holds
+    their minimum distance, and a contact if any pair is in contact.
+
+    Returns:
+        The uint8 distance map (see DISTANCE_STEP), the boolean contact map,
+        the contacts of each residue and the bin size
+    """
+    coords = residues.coords
+    n = len(coords)
+    bin_size = max(1, math.ceil(n / max_size))
+    size = math.ceil(n / bin_size)
+    squares = np.einsum("ij,ij->i", coords, coords)
+    chain_index = np.unique(residues.chain_ids, return_inverse=True)[1]
+    bins = np.arange(0, n, bin_size)
+    offsets = range(1 - CONTACT_MIN_SEPARATION, CONTACT_MIN_SEPARATION)
+
+    distances = np.empty((size, size), dtype=np.uint8)
+    contacts = np.empty((size, size), dtype=bool)
+    counts = np.empty(n, dtype=np.int32)
+    block_rows = max(bin_size, BLOCK_ELEMENTS // n // bin_size * bin_size)
+    for start in range(0, n, block_rows):
+        stop = min(n, start + block_rows)
+        squared = (
+            squares[start:stop, None]
+            + squares[None, :]
+            - 2 * (coords[start:stop] @ coords.T)
+        )
+        contact = squared < CONTACT_DISTANCE**2
+        # Sequence neighbours within a chain are not contacts: clear the
+        # diagonal band instead of masking the whole block
+        rows = np.arange(start, stop)
+        for offset in offsets:
+            columns = rows + offset
+            inside = (columns >= 0) & (columns < n)
+            row, column = rows[inside], columns[inside]
+            same_chain = chain_index[row] == chain_index[column]
+            contact[row[same_chain] - start, column[same_chain]] = False
+        counts[start:stop] = np.count_nonzero(contact, axis=1)
+
+        if bin_size > 1:
+            # Pool each bin x bin tile. Square roots are monotonic, so they
+            # are only taken of the pooled minima
+            row_bins = np.arange(0, stop - start, bin_size)
+            squared = np.minimum.reduceat(squared, row_bins, axis=0)
+            squared = np.minimum.reduceat(squared, bins, axis=1)
+            contact = np.logical_or.reduceat(contact, row_bins, axis=0)
+            contact = np.logical_or.reduceat(contact, bins, axis=1)
+
+        distance = np.sqrt(np.maximum(squared, 0.0))
+        cells = slice(start // bin_size, start // bin_size + len(distance))
+        distances[cells] = np.minimum(np.rint(distance / DISTANCE_STEP), 255)
+        contacts[cells] = contact
+    return distances, contacts, counts, bin_size
+
+
+def analyze_structure(
+    text: str, structure_format: str, max_map_size: int, max_residues: int
+) -> bytes:
+    """
+    Analyze a structure and encode the result as a packed analysis frame.
+
+    A plain module-level function, so it can run in a process pool.
+
+    The frame header holds the summary: residue count, radius of gyration,
+    pLDDT statistics and bands overall and per chain, low-confidence
+    segments, the contact count and the map layout. Its arrays are, for the
+    n residues and the maps of `size` x `size` cells:
+
+        distance_map    uint8   (size, size)          steps of DISTANCE_STEP
+        contact_map     uint8   (size, ceil(size/8))  rows of packed bits,
+                                                      most significant first
+        plddt           float32 (n,)                  NaN when absent
+        contact_counts  int32   (n,)
+        res_seq         int32   (n,)
+        chain_index     uint16  (n,)                  index into "chain_ids"
+
+    Args:
+        text: PDB or mmCIF text
+        structure_format: "pdb" or "mmcif"
+        max_map_size: Largest map size; larger structures get binned maps
+        max_residues: Most residues analyzed
+
+    Raises:
+        ProteinStructureValidationError: If the structure has no residue
+            with a C-alpha atom, more than `max_residues`, or C-alpha
+            coordinates that are not finite numbers
+    """
+    if structure_format == "pdb":
+        structure = Structure.from_pdb(text)
+    else:
+        structure = Structure.from_mmcif(text)
+    residues = ca_residues(structure)
+    if len(residues.coords) == 0:
+        raise ProteinStructureValidationError(
+            "The structure has no residues with a C-alpha atom"
+        )
+    if len(residues.coords) > max_residues:
+        raise ProteinStructureValidationError(
+            f"The structure has {len(residues.coords)} residues, more than "
+            f"the limit of {max_residues}"
+        )
+    if not np.isfinite(residues.coords).all():
+        raise ProteinStructureValidationError(
+            "The structure has C-alpha coordinates that are not numbers"
+        )
+
+    distances, contacts, counts, bin_size = distance_maps(residues, max_map_size)
+    chain_ids, chain_index = np.unique(residues.chain_ids, return_inverse=True)
+    chains = []
+    # Chains in file order
+    for index in np.unique(chain_index, return_index=True)[1]:
+        in_chain = chain_index == chain_index[index]
+        chains.append(
+            {
+                "chain_id": residues.chain_ids[index].decode(),
+                "residues": int(in_chain.sum()),
+                "radius_of_gyration": radius_of_gyration(residues.coords[in_chain]),
+                "plddt": plddt_summary(residues.plddt[in_chain]),
+            }
+        )
+
+    summary = {
+        "residues": len(residues.coords),
+        "radius_of_gyration": radius_of_gyration(residues.coords),
+        "plddt": plddt_summary(residues.plddt),
+        "chains": chains,
+        "low_confidence_segments": low_confidence_segments(residues),
+        "contacts": int(counts.sum()) // 2,
+        "chain_ids": [chain_id.decode() for chain_id in chain_ids],
+        "maps": {
+            "size": len(distances),
+            "bin_size": bin_size,
+            "distance_step": DISTANCE_STEP,
+            "contact_distance": CONTACT_DISTANCE,
+            "contact_min_separation": CONTACT_MIN_SEPARATION,
+        },
+    }
+    arrays = {
+        "distance_map": distances,
+        "contact_map": np.packbits(contacts, axis=1),
+        "plddt": residues.plddt.astype("<f4"),
+        "contact_counts": counts.astype("<i4"),
+        "res_seq": residues.res_seq.astype("<i4"),
+        "chain_index": chain_index.astype("<u2"),
+    }
+    return pack_analysis(summary, arrays)
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Literal, Optional
+
+from config import check_env_vars
+from protein_folding.artifacts import artifact_store
+from protein_folding.cache import fold_cache, make_cache_key
+from protein_folding.metrics import ANALYSIS_SECONDS
+from protein_folding.offload import offloader
+from protein_folding.tracing import span
+
+# Global configuration
+env = check_env_vars()
+
+StructureFormat = Literal["pdb", "mmcif"]
+
+# Bump when the analysis frame changes
+ANALYSIS_VERSION = 1
+
+# Artifact extensions by structure format
+ARTIFACT_FORMATS = {"pdb": "pdb", "cif": "mmcif"}
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _analysis_key(digest: str, structure_format: StructureFormat) -> str:
+    return make_cache_key(
+        "analysis",
+        digest=digest,
+        format=structure_format,
+        analysis_version=ANALYSIS_VERSION,
+        max_map_size=env.ANALYSIS_MAX_MAP_SIZE,
+    )
+
+
+async def _analyze(
+    digest: str,
+    structure_format: StructureFormat,
+    load_text: Callable[[], Awaitable[str]],
+) -> bytes:
+    key = _analysis_key(digest, structure_format)
+    if env.FOLD_CACHE_ENABLED:
+        frame = await fold_cache.get(key)
+        if frame is not None:
+            return frame
+
+    # Imported here: it needs NumPy, which is kept off the startup path
+    from protein_folding.analysis.compute import analyze_structure
+
+    text = await load_text()
+    with span("analyze", format=structure_format, bytes=len(text)):
+        with ANALYSIS_SECONDS.labels(structure_format).time():
+            frame = await offloader.run(
+                analyze_structure,
+                text,
+                structure_format,
+                env.ANALYSIS_MAX_MAP_SIZE,
+                env.ANALYSIS_MAX_RESIDUES,
+                size=len(text),
+            )
+    if env.FOLD_CACHE_ENABLED:
+        await fold_cache.set(key, "analysis", frame)
+    return frame
+
+
+async def analyze(text: str, structure_format: StructureFormat) -> bytes:
+    """
+    Analyze a structure once: results are cached by the structure's content.
+
+    Args:
+        text: PDB or mmCIF text
+        structure_format: "pdb" or "mmcif"
+
+    Returns:
+        The packed analysis frame, see `analyze_structure`
+
+    Raises:
+        ProteinStructureValidationError: If the structure has no residues,
+            too many, or unreadable coordinates
+    """
+
+    async def load_text() -> str:
+        return text
+
+    digest = await offloader.run(_digest, text, size=len(text), in_process=False)
+    return await _analyze(digest, structure_format, load_text)
+
+
+async def analyze_artifact(artifact_id: str) -> Optional[bytes]:
+    """
+    Analyze a stored structure artifact, only reading it on cache misses.
+
+    Returns:
+        The packed analysis frame, or None if there is no such artifact
+
+    Raises:
+        ProteinStructureValidationError: If the structure has no residues,
+            too many, or unreadable coordinates
+    """
+    artifact = await asyncio.to_thread(artifact_store.get, artifact_id)
+    if artifact is None:
+        return None
+
+    async def load_text() -> str:
+        return await asyncio.to_thread(artifact_store.read, artifact)
+
+    # Artifacts are named by the digest of their text
+    return await _analyze(
+        artifact.digest, ARTIFACT_FORMATS[artifact.extension], load_text
+    )
@@ -0,0 +1,284 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from config import check_env_vars
+from protein_folding.compression import negotiate_encoding
+from protein_folding.metrics import ARTIFACTS_STORED
+from protein_folding.models import EsmfoldResult
+from protein_folding.static_files import IMMUTABLE_CACHE_CONTROL, etag_matches
+from protein_folding.storage import data_path
+
+# Global configuration
+env = check_env_vars()
+
+# Artifact formats by file extension
+MEDIA_TYPES = {"pdb": "chemical/x-pdb", "cif": "chemical/x-mmcif"}
+ARTIFACT_ID = re.compile(r"^([0-9a-f]{64})\.(pdb|cif)$")
+
+# Written once per structure, read many times: compress well
+GZIP_LEVEL = 9
+CHUNK_SIZE = 64 * 1024
+# Expired artifacts are looked for at most this often per worker
+PRUNE_INTERVAL_SECONDS = 60 * 60
+
+
+class Artifact:
+    """A stored structure: its gzip file and the size of the structure text."""
+
+    def __init__(self, artifact_id: str, path: str, stat_result: os.stat_result):
+        self.id = artifact_id
+        self.digest, self.extension = artifact_id.split(".")
+        self.path = path
+        self.stat_result = stat_result
+        self.media_type = MEDIA_TYPES[self.extension]
+        # gzip ends with the uncompressed size modulo 2**32, ample for structures
+        with open(path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            (self.size,) = struct.unpack("<I", f.read(4))
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # The digest identifies the content; each coding needs its own validator
+        return f'"{self.digest}"' if encoding is None else f'"{self.digest}-{encoding}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header into (start, end), end exclusive.
+
+    Returns:
+        The range, or None if the header should be ignored (malformed or
+        several ranges), in which case the whole content is sent
+
+    Raises:
+        HTTPException: 416 if the range starts past the end of the content
+    """
+    units, _, ranges = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+        else:
+            start, end = max(0, size - int(last)), size
+    except ValueError:
+        return None
+    if start >= size or (first and last and end <= start):
+        raise HTTPException(
+            status_code=416, headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+async def _decompressed(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    """Stream `length` bytes of a gzip file's content from offset `start`."""
+    f = await asyncio.to_thread(gzip.open, path, "rb")
+    try:
+        # Seeking decompresses up to `start`, one buffer at a time
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class ArtifactStore:
+    """
+    Fold structures on local disk, as gzip files named by their SHA-256.
+
+    Storing a structure twice keeps one file, and artifact ids never change
+    meaning, so downloads are cacheable forever. The directory is shared by
+    all workers: files are written under a temporary name and renamed into
+    place. Artifacts not stored again for `retention_seconds` are removed.
+    """
+
+    def __init__(self, directory: str, retention_seconds: int):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self._pruned_at = 0.0
+        self._prune_lock = threading.Lock()
+
+    def _path(self, digest: str, extension: str) -> str:
+        # Fan out by prefix so no single directory grows huge
+        return os.path.join(self.directory, digest[:2], f"{digest}.{extension}.gz")
+
+    def put(self, content: str, extension: str) -> str:
+        """
+        Store a structure, blocking: call it from a worker thread.
+
+        Args:
+            content: Structure text
+            extension: "pdb" or "cif"
+
+        Returns:
+            The artifact id, "<sha256>.<extension>"
+        """
+        data = content.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, extension)
+        try:
+            # Storing it again counts as use for the retention period
+            os.utime(path)
+            ARTIFACTS_STORED.labels("existing").inc()
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            ARTIFACTS_STORED.labels("new").inc()
+            self._maybe_prune()
+        return f"{digest}.{extension}"
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        """Look up an artifact, blocking. Returns None for unknown or invalid ids."""
+        match = ARTIFACT_ID.match(artifact_id)
+        if match is None:
+            return None
+        path = self._path(*match.groups())
+        try:
+            return Artifact(artifact_id, path, os.stat(path))
+        except OSError:
+            return None
+
+    def read(self, artifact: Artifact) -> str:
+        """Read the structure text of an artifact, blocking."""
+        with gzip.open(artifact.path, "rt") as f:
+            return f.read()
+
+    def prune(self) -> int:
+        """Remove artifacts, and abandoned temporary files, past the retention."""
+        cutoff = time.time() - self.retention_seconds
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    # Removed by another worker's prune
+                    continue
+        return removed
+
+    def _maybe_prune(self) -> None:
+        with self._prune_lock:
+            if time.monotonic() - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+                return
+            self._pruned_at = time.monotonic()
+        removed = self.prune()
+        if removed:
+            logging.info(f"Removed {removed} expired artifacts")
+
+    def with_urls(
+        self, response: BaseModel, url_for: Callable[[str], str]
+    ) -> BaseModel:
+        """
+        Store the structures of a fold response, blocking.
+
+        Returns:
+            A copy of the response with artifact URLs in place of the
+            structure text ("pdb_url" or "mmcif_url")
+        """
+        results = []
+        for result in response.results:
+            if isinstance(result, EsmfoldResult):
+                update = {"pdb": None, "pdb_url": url_for(self.put(result.pdb, "pdb"))}
+            else:
+                url = url_for(self.put(result.mmcif_string, "cif"))
+                update = {"mmcif_string": None, "mmcif_url": url}
+            results.append(result.model_copy(update=update))
+        return response.model_copy(update={"results": results})
+
+    async def response(self, request: Request, artifact_id: str) -> Response:
+        """
+        Build the download response for an artifact.
+
+        Clients accepting gzip get the stored file as is, sent with sendfile
+        where the server supports it; others get it decompressed on the fly.
+        Both answer If-None-Match with 304 and a single Range with 206.
+
+        Raises:
+            HTTPException: 404 for unknown artifacts, 416 for ranges past
+                the end
+        """
+        artifact = await asyncio.to_thread(self.get, artifact_id)
+        if artifact is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+
+        encoding = "gzip" if _accepts_gzip(request) else None
+        etag = artifact.etag_for(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'inline; filename="{artifact.id}"',
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is not None:
+            # Ranges then apply to the gzip bytes, the selected representation
+            headers["Content-Encoding"] = encoding
+            return FileResponse(
+                artifact.path,
+                headers=headers,
+                media_type=artifact.media_type,
+                stat_result=artifact.stat_result,
+            )
+
+        start, end, status_code = 0, artifact.size, 200
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header is not None and (if_range is None or if_range == etag):
+            requested = parse_range(range_header, artifact.size)
+            if requested is not None:
+                start, end = requested
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end - 1}/{artifact.size}"
+        headers["Content-Length"] = str(end - start)
+        if request.method == "HEAD":
+            return Response(
+                status_code=status_code, headers=headers, media_type=artifact.media_type
+            )
+        return StreamingResponse(
+            _decompressed(artifact.path, start, end - start),
+            status_code=status_code,
+            headers=headers,
+            media_type=artifact.media_type,
+        )
+
+
+def _accepts_gzip(request: Request) -> bool:
+    accept_encoding = request.headers.get("accept-encoding", "")
+    return negotiate_encoding(accept_encoding, ("gzip",)) is not None
+
+
+artifact_store = ArtifactStore(
+    data_path(env.ARTIFACT_DIR), retention_seconds=env.ARTIFACT_RETENTION_SECONDS
+)
@@ -1,8 +1,17 @@
+import asyncio
 import logging
 import httpx
-import asyncio
-from typing import Dict, Any, Optional
-from protein_folding.models import Boltz2Result
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from protein_folding.models import Boltz2Response, Boltz2Result
+from protein_folding.cache import fold_cache, make_cache_key
+from protein_folding.coalescing import FoldResult, fold_flight, fold_once_result
+from protein_folding.metrics import PARSE_SECONDS, track_upstream
+from protein_folding.nvcf import ProgressCallback, call_nvcf
+from protein_folding.offload import offloader
+from protein_folding.scheduler import BATCH, boltz2_cost, fold_scheduler
+from protein_folding.tracing import span
+from protein_folding.utils import calculate_mmcif_plddt, normalize_sequence
 from config import check_env_vars
 from protein_folding.exceptions import (
     ProteinFoldingAPIError,
@@ -14,50 +23,78 @@ from protein_folding.exceptions import (
 # Global configuration
 env = check_env_vars()
 
-INVOKE_URL = "https://health.api.nvidia.com/v1/biology/mit/boltz2/predict"
-STATUS_URL = "https://api.nvcf.nvidia.com/v2/nvcf/pexec/status/{task_id}"
+INVOKE_URL = f"{env.NVIDIA_API_BASE_URL.rstrip('/')}/v1/biology/mit/boltz2/predict"
+STATUS_URL = f"{env.NVCF_API_BASE_URL.rstrip('/')}/v2/nvcf/pexec/status/{{task_id}}"
 
 HEADERS = {
     "Authorization": f"Bearer {env.NVIDIA_API_KEY}",
     "Content-Type": "application/json",
-    "NVCF-POLL-SECONDS": "300",
 }
 
 
-async def make_nvcf_call(data: Dict[str, Any]) -> Dict:
-    """Make a call to NVIDIA Cloud Functions with long-polling."""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            INVOKE_URL,
-            json=data,
-            headers=HEADERS,
-            timeout=400,
+class ProgressFanout:
+    """
+    Progress of coalesced Boltz-2 predictions, sent to every caller awaiting one.
+
+    A coalesced call runs with the callback of whichever caller started it,
+    so progress is instead published by cache key to the subscribers of that
+    key. A subscriber joining mid-flight gets the latest update at once.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[ProgressCallback]] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+
+    @asynccontextmanager
+    async def subscribe(
+        self, key: str, callback: Optional[ProgressCallback]
+    ) -> AsyncIterator[None]:
+        """Send the progress of the prediction `key` to `callback` in this block."""
+        if callback is None:
+            yield
+            return
+        self._subscribers.setdefault(key, []).append(callback)
+        try:
+            latest = self._latest.get(key)
+            if latest is not None:
+                await callback(latest)
+            yield
+        finally:
+            subscribers = self._subscribers[key]
+            subscribers.remove(callback)
+            if not subscribers:
+                del self._subscribers[key]
+
+    async def publish(self, key: str, update: Dict[str, Any]) -> None:
+        """Send an update to the subscribers of `key`; call `forget` when done."""
+        self._latest[key] = update
+        subscribers = self._subscribers.get(key, [])
+        results = await asyncio.gather(
+            *(callback(update) for callback in list(subscribers)),
+            return_exceptions=True,
         )
+        for result in results:
+            # One subscriber failing to record progress must not fail the fold
+            if isinstance(result, Exception):
+                logging.warning(f"Boltz-2 progress update failed: {result!r}")
 
-        if response.status_code == 202:
-            # Handle async processing
-            task_id = response.headers.get("nvcf-reqid")
-            while True:
-                status_response = await client.get(
-                    STATUS_URL.format(task_id=task_id),
-                    headers=HEADERS,
-                    timeout=400,
-                )
-                if status_response.status_code == 200:
-                    return status_response.json()
-                elif status_response.status_code in [400, 401, 404, 422, 500]:
-                    raise ProteinFoldingAPIError(
-                        f"Error while waiting for function: {status_response.text}",
-                        status_response.status_code,
-                    )
-                await asyncio.sleep(5)
-        elif response.status_code == 200:
-            return response.json()
-        else:
-            raise ProteinFoldingAPIError(
-                f"API error: {response.status_code} - {response.text}",
-                response.status_code,
-            )
+    def forget(self, key: str) -> None:
+        """Drop the latest update of a prediction that has stopped."""
+        self._latest.pop(key, None)
+
+
+boltz2_progress = ProgressFanout()
+
+
+async def make_nvcf_call(
+    data: Dict[str, Any], progress: Optional[ProgressCallback] = None
+) -> Dict:
+    """Make a call to NVIDIA Cloud Functions, polling until the result is ready."""
+    with span("upstream", model="boltz2"), track_upstream("boltz2"):
+        response_data, _ = await call_nvcf(
+            INVOKE_URL, STATUS_URL, data, HEADERS, "boltz2", progress=progress
+        )
+    return response_data
 
 
 def validate_boltz2_input(
@@ -72,27 +109,134 @@ def validate_boltz2_input(
     if not sequence or not sequence.strip():
         raise ProteinSequenceValidationError("Protein sequence cannot be empty")
 
-    valid_amino_acids = set("ACDEFGHIKLMNPQRSTVWY")
+    valid_amino_acids = frozenset("ACDEFGHIKLMNPQRSTVWY")
 
     sequence_upper = sequence.upper().strip()
 
-    if not all(aa in valid_amino_acids for aa in sequence_upper):
+    # Checked in C, not one character at a time in a generator
+    if not valid_amino_acids.issuperset(sequence_upper):
         raise ProteinSequenceValidationError("Invalid amino acid characters")
 
     if ligand_smiles and len(ligand_smiles) > 500:
         raise ProteinSequenceValidationError("Ligand SMILES too long")
 
 
+def boltz2_cache_key(
+    sequence: str,
+    ligand_smiles: Optional[str],
+    recycling_steps: int,
+    sampling_steps: int,
+    diffusion_samples: int,
+) -> str:
+    """Cache key of a validated, normalized Boltz-2 prediction."""
+    return make_cache_key(
+        "boltz2",
+        sequence=sequence,
+        ligand_smiles=ligand_smiles,
+        recycling_steps=recycling_steps,
+        sampling_steps=sampling_steps,
+        diffusion_samples=diffusion_samples,
+    )
+
+
 async def fold_boltz2(
     sequence: str,
     ligand_smiles: Optional[str] = None,
     recycling_steps: int = 1,
     sampling_steps: int = 50,
     diffusion_samples: int = 3,
-) -> Boltz2Result:
+    progress: Optional[ProgressCallback] = None,
+) -> Boltz2Response:
     """
     Call Boltz-2 API to process protein structure prediction.
 
+    Args:
+        sequence: Protein sequence
+        ligand_smiles: Optional SMILES notation for ligand
+        recycling_steps: Number of recycling steps (default: 1)
+        sampling_steps: Number of sampling steps (default: 50)
+        diffusion_samples: Number of samples to generate (default: 3)
+        progress: Optional coroutine receiving upstream progress updates
+
+    Returns:
+        Boltz2Response with one result per diffusion sample, best first
+
+    Raises:
+        ProteinSequenceValidationError: If input is invalid
+        ProteinFoldingAPIError: If API returns an error
+        ProteinFoldingTimeoutError: If request times out
+        ProteinFoldingConnectionError: If connection fails
+    """
+    fold = await fold_boltz2_result(
+        sequence,
+        ligand_smiles,
+        recycling_steps,
+        sampling_steps,
+        diffusion_samples,
+        progress,
+    )
+    return await fold.load()
+
+
+async def fold_boltz2_result(
+    sequence: str,
+    ligand_smiles: Optional[str] = None,
+    recycling_steps: int = 1,
+    sampling_steps: int = 50,
+    diffusion_samples: int = 3,
+    progress: Optional[ProgressCallback] = None,
+) -> FoldResult[Boltz2Response]:
+    """
+    Run a Boltz-2 prediction like `fold_boltz2`, keeping cache hits as JSON.
+
+    Raises:
+        The errors of `fold_boltz2`
+    """
+    with span("validate", sequence_length=len(sequence)):
+        validate_boltz2_input(sequence, ligand_smiles)
+    sequence = normalize_sequence(sequence)
+    ligand_smiles = ligand_smiles.strip() if ligand_smiles else None
+
+    cache_key = boltz2_cache_key(
+        sequence, ligand_smiles, recycling_steps, sampling_steps, diffusion_samples
+    )
+
+    async def compute() -> Boltz2Response:
+        response_data = await fetch_boltz2(
+            cache_key,
+            sequence,
+            ligand_smiles,
+            recycling_steps,
+            sampling_steps,
+            diffusion_samples,
+        )
+        try:
+            await boltz2_progress.publish(cache_key, {"stage": "parsing"})
+            results = [result async for result in parse_samples(response_data)]
+        finally:
+            boltz2_progress.forget(cache_key)
+        return Boltz2Response(results=sorted(results, key=lambda r: r.rank))
+
+    # Identical predictions share one call: progress goes to all of them
+    async with boltz2_progress.subscribe(cache_key, progress):
+        return await fold_once_result("boltz2", cache_key, compute, Boltz2Response)
+
+
+async def stream_boltz2(
+    sequence: str,
+    ligand_smiles: Optional[str] = None,
+    recycling_steps: int = 1,
+    sampling_steps: int = 50,
+    diffusion_samples: int = 3,
+) -> AsyncIterator[Boltz2Result]:
+    """
+    Run a Boltz-2 prediction and return its samples as they are parsed.
+
+    Validation and the upstream call happen before this returns, so their
+    errors are raised here; the iterator only parses. Cached predictions are
+    replayed best first, and a completed stream stores its prediction in the
+    cache for `fold_boltz2`.
+
     Args:
         sequence: Protein sequence
         ligand_smiles: Optional SMILES notation for ligand
@@ -101,7 +245,7 @@ async def fold_boltz2(
         diffusion_samples: Number of samples to generate (default: 3)
 
     Returns:
-        Boltz2Result containing predicted structure and metadata
+        Iterator over one Boltz2Result per sample, in parsing order
 
     Raises:
         ProteinSequenceValidationError: If input is invalid
@@ -109,8 +253,185 @@ async def fold_boltz2(
         ProteinFoldingTimeoutError: If request times out
         ProteinFoldingConnectionError: If connection fails
     """
-    validate_boltz2_input(sequence, ligand_smiles)
+    with span("validate", sequence_length=len(sequence)):
+        validate_boltz2_input(sequence, ligand_smiles)
+    sequence = normalize_sequence(sequence)
+    ligand_smiles = ligand_smiles.strip() if ligand_smiles else None
+
+    cache_key = boltz2_cache_key(
+        sequence, ligand_smiles, recycling_steps, sampling_steps, diffusion_samples
+    )
+    cached = None
+    if env.FOLD_CACHE_ENABLED:
+        with span("cache.lookup", model="boltz2") as lookup_span:
+            cached = await fold_cache.get(cache_key)
+            lookup_span.set(hit=cached is not None)
 
+    async def replay(response: Boltz2Response) -> AsyncIterator[Boltz2Result]:
+        for result in response.results:
+            yield result
+
+    if cached is not None:
+        return replay(
+            await offloader.run(
+                Boltz2Response.model_validate_json,
+                cached,
+                size=len(cached),
+                in_process=False,
+            )
+        )
+
+    response_data = await fetch_boltz2(
+        cache_key,
+        sequence,
+        ligand_smiles,
+        recycling_steps,
+        sampling_steps,
+        diffusion_samples,
+    )
+
+    async def parse_and_store() -> AsyncIterator[Boltz2Result]:
+        results = []
+        async for result in parse_samples(response_data):
+            results.append(result)
+            yield result
+        if env.FOLD_CACHE_ENABLED:
+            response = Boltz2Response(results=sorted(results, key=lambda r: r.rank))
+            fold = FoldResult(Boltz2Response, model=response)
+            await fold_cache.set(cache_key, "boltz2", await fold.dump())
+
+    return parse_and_store()
+
+
+def rank_samples(
+    response_data: Dict[str, Any],
+) -> List[Tuple[int, Optional[float], str]]:
+    """
+    Pair the structures of an upstream response with their confidence scores.
+
+    Returns:
+        (sample index, confidence score, mmCIF) per sample, highest
+        confidence first; samples without a score rank last
+
+    Raises:
+        ProteinFoldingAPIError: If the response contains no structure
+    """
+    structures = response_data.get("structures", [])
+    confidence_scores = response_data.get("confidence_scores", [])
+
+    if not structures:
+        raise ProteinFoldingAPIError("No structures returned", 500)
+
+    samples = []
+    for index, structure_data in enumerate(structures):
+        mmcif_string = structure_data.get("structure", "")
+        if env.DEBUG:
+            logging.debug(f"Structure {index} keys: {list(structure_data.keys())}")
+            logging.debug(f"Structure {index} format: {structure_data.get('format')}")
+        if not mmcif_string:
+            logging.warning(f"Boltz-2 sample {index} has no structure content")
+            continue
+        score = confidence_scores[index] if index < len(confidence_scores) else None
+        samples.append((index, score, mmcif_string))
+
+    if not samples:
+        raise ProteinFoldingAPIError("No structure content found in response", 500)
+
+    samples.sort(key=lambda sample: (sample[1] is None, -(sample[1] or 0.0)))
+    return samples
+
+
+async def parse_samples(response_data: Dict[str, Any]) -> AsyncIterator[Boltz2Result]:
+    """
+    Calculate the pLDDT of every sample in parallel, yielding each when done.
+
+    Closing the iterator cancels the samples not parsed yet.
+
+    Yields:
+        Boltz2Result per sample, in completion order, ranked by confidence
+    """
+    samples = rank_samples(response_data)
+    confidence_scores = response_data.get("confidence_scores", [])
+    # Offload all samples or none: they are similar in size
+    size = sum(len(mmcif_string) for _, _, mmcif_string in samples)
+
+    async def parse(
+        rank: int, index: int, score: Optional[float], mmcif_string: str
+    ) -> Boltz2Result:
+        # pLDDT from the mmCIF structure, overall and per chain
+        with span("parse", format="mmcif", sample=index):
+            with PARSE_SECONDS.labels("mmcif").time():
+                plddt, chain_plddt = await offloader.run(
+                    calculate_mmcif_plddt, mmcif_string, size=size
+                )
+        return Boltz2Result(
+            mmcif_string=mmcif_string,
+            sample_index=index,
+            rank=rank,
+            confidence_score=score,
+            plddt=plddt,
+            chain_plddt=chain_plddt,
+            confidence_scores=confidence_scores,
+        )
+
+    tasks = [
+        asyncio.create_task(parse(rank, *sample))
+        for rank, sample in enumerate(samples, 1)
+    ]
+    try:
+        for next_parsed in asyncio.as_completed(tasks):
+            yield await next_parsed
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def fetch_boltz2(
+    cache_key: str,
+    sequence: str,
+    ligand_smiles: Optional[str],
+    recycling_steps: int,
+    sampling_steps: int,
+    diffusion_samples: int,
+) -> Dict[str, Any]:
+    """
+    Run a validated, normalized Boltz-2 prediction against the upstream API.
+
+    Identical predictions in flight in this worker, streamed or not, share
+    one upstream call. Its progress is published to `boltz2_progress`.
+
+    Returns:
+        The upstream response, with all diffusion samples
+    """
+
+    async def progress(update: Dict[str, Any]) -> None:
+        await boltz2_progress.publish(cache_key, update)
+
+    async def call() -> Dict[str, Any]:
+        try:
+            return await call_boltz2(
+                sequence,
+                ligand_smiles,
+                recycling_steps,
+                sampling_steps,
+                diffusion_samples,
+                progress,
+            )
+        finally:
+            boltz2_progress.forget(cache_key)
+
+    return await fold_flight.do(f"{cache_key}:upstream", call)
+
+
+async def call_boltz2(
+    sequence: str,
+    ligand_smiles: Optional[str],
+    recycling_steps: int,
+    sampling_steps: int,
+    diffusion_samples: int,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """Make the upstream Boltz-2 request and return its raw response."""
     # Build ligands list if SMILES provided
     ligands_list = []
     if ligand_smiles:
@@ -140,42 +461,19 @@ async def fold_boltz2(
         "without_potentials": True,
     }
 
+    cost = boltz2_cost(
+        len(sequence), recycling_steps, sampling_steps, diffusion_samples
+    )
     try:
-        response_data = await make_nvcf_call(payload)
+        async with fold_scheduler.slot(BATCH, cost):
+            if progress is not None:
+                await progress({"stage": "submitting"})
+            response_data = await make_nvcf_call(payload, progress)
 
         if env.DEBUG:
             logging.debug(f"Boltz-2 API response: {response_data}")
 
-        # Extract and process results
-        structures = response_data.get("structures", [])
-        confidence_scores = response_data.get("confidence_scores", [])
-
-        if not structures:
-            raise ProteinFoldingAPIError("No structures returned", 500)
-
-        # Extract structure data
-        structure_data = structures[0]
-        mmcif_string = structure_data.get("structure", "")
-        structure_format = structure_data.get("format", "unknown")
-
-        if env.DEBUG:
-            logging.debug(f"Structure keys: {list(structure_data.keys())}")
-            logging.debug(f"Structure format: {structure_format}")
-            logging.debug(f"First few chars of structure: {mmcif_string[:100]}")
-
-        if not mmcif_string:
-            raise ProteinFoldingAPIError("No structure content found in response", 500)
-
-        # Calculate pLDDT from mmCIF structure
-        from protein_folding.utils import calculate_plddt
-
-        plddt_scores = calculate_plddt(mmcif_string)
-
-        return Boltz2Result(
-            mmcif_string=mmcif_string,
-            plddt=plddt_scores,
-            confidence_scores=confidence_scores,
-        )
+        return response_data
 
     except httpx.TimeoutException:
         raise ProteinFoldingTimeoutError("Boltz-2 API request timed out")
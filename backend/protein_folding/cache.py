@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import check_env_vars
+from protein_folding.storage import data_path, open_sqlite
+
+# Global configuration
+env = check_env_vars()
+
+# Bump when the shape of cached results changes
+CACHE_VERSION = 3
+
+# Expired disk rows are deleted every PRUNE_EVERY_SETS writes per worker, at
+# most PRUNE_BATCH_SIZE at a time so a prune never holds the write lock long
+PRUNE_EVERY_SETS = 256
+PRUNE_BATCH_SIZE = 1000
+
+
+def make_cache_key(model: str, **params: Any) -> str:
+    """
+    Build a content-addressed cache key for a fold.
+
+    Args:
+        model: Folding model name (e.g. "esmfold", "boltz2")
+        **params: Normalized sequence and every result-affecting parameter
+
+    Returns:
+        Hex SHA-256 digest of the canonical JSON encoding of the inputs
+    """
+    payload = json.dumps(
+        {"model": model, "version": CACHE_VERSION, **params},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryLRU:
+    """
+    In-process LRU of serialized results, evicted by total size in bytes.
+
+    Entries may carry a tag (e.g. the folding model) to delete them together.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Optional[str]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.time():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(
+        self, key: str, value: bytes, expires_at: float, tag: Optional[str] = None
+    ) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = (expires_at, value, tag)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def delete_tagged(self, tag: str) -> int:
+        keys = [key for key, entry in self._entries.items() if entry[2] == tag]
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self.size = 0
+        return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    zlib-compressed results in a SQLite file shared by all uvicorn workers.
+
+    Expired rows are skipped on read and deleted in batches when the file is
+    opened and every PRUNE_EVERY_SETS writes, so the file stays bounded by
+    the TTL without admin purges.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._sets = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fold_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS fold_cache_expires_at "
+                "ON fold_cache (expires_at)"
+            )
+            # Rows may have expired while no worker was running
+            self._prune_expired(self._conn)
+        return self._conn
+
+    def _prune_expired(self, conn: sqlite3.Connection) -> int:
+        """Delete a bounded batch of expired rows. Call with the lock held."""
+        cursor = conn.execute(
+            "DELETE FROM fold_cache WHERE rowid IN "
+            "(SELECT rowid FROM fold_cache WHERE expires_at <= ? LIMIT ?)",
+            (time.time(), PRUNE_BATCH_SIZE),
+        )
+        return cursor.rowcount
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str, float]]:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT value, model, expires_at FROM fold_cache WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        value, model, expires_at = row
+        if expires_at <= time.time():
+            return None
+        return zlib.decompress(value), model, expires_at
+
+    def set(self, key: str, model: str, value: bytes, expires_at: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO fold_cache (key, model, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, model, zlib.compress(value), expires_at),
+            )
+            self._sets += 1
+            if self._sets % PRUNE_EVERY_SETS == 0:
+                self._prune_expired(conn)
+
+    def purge(
+        self,
+        model: Optional[str] = None,
+        key: Optional[str] = None,
+        expired_only: bool = False,
+    ) -> int:
+        clauses, params = [], []
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        if key is not None:
+            clauses.append("key = ?")
+            params.append(key)
+        if expired_only:
+            clauses.append("expires_at <= ?")
+            params.append(time.time())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            cursor = self._connection().execute(
+                f"DELETE FROM fold_cache{where}", params
+            )
+        return cursor.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return (
+                self._connection()
+                .execute("SELECT COUNT(*) FROM fold_cache")
+                .fetchone()[0]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class FoldCache:
+    """
+    Two-tier cache of serialized fold results.
+
+    Lookups check the per-worker memory LRU first and fall back to the shared
+    on-disk tier, promoting disk hits into memory. Memory entries live at most
+    `memory_ttl_seconds` so purges made by other workers take effect. SQLite
+    access runs in a worker thread so it never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int,
+        disk_path: str,
+        ttl_seconds: int,
+        memory_ttl_seconds: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.memory_ttl_seconds = memory_ttl_seconds
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskCache(disk_path)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, record_stats: bool = True) -> Optional[bytes]:
+        """Return the serialized result for `key`, or None on a miss."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += record_stats
+            return value
+
+        entry = await asyncio.to_thread(self.disk.get, key)
+        if entry is None:
+            self.misses += record_stats
+            return None
+
+        self.disk_hits += record_stats
+        value, model, expires_at = entry
+        self.memory.set(key, value, self._memory_expiry(expires_at), model)
+        return value
+
+    async def set(self, key: str, model: str, value: bytes) -> None:
+        """Store a serialized result in both tiers."""
+        expires_at = time.time() + self.ttl_seconds
+        self.memory.set(key, value, self._memory_expiry(expires_at), model)
+        await asyncio.to_thread(self.disk.set, key, model, value, expires_at)
+
+    def _memory_expiry(self, expires_at: float) -> float:
+        return min(expires_at, time.time() + self.memory_ttl_seconds)
+
+    async def purge(
+        self,
+        model: Optional[str] = None,
+        key: Optional[str] = None,
+        expired_only: bool = False,
+    ) -> int:
+        """
+        Delete entries from the shared disk tier and this worker's memory tier.
+
+        Other workers drop their in-memory copies within `memory_ttl_seconds`.
+
+        Returns:
+            Number of disk entries removed
+        """
+        if key is not None:
+            self.memory.delete(key)
+        elif not expired_only and model is not None:
+            # Other models' hot entries stay
+            self.memory.delete_tagged(model)
+        elif not expired_only:
+            self.memory.clear()
+        return await asyncio.to_thread(self.disk.purge, model, key, expired_only)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this worker plus the size of both tiers."""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "memory_evictions": self.memory.evictions,
+            "disk_entries": await asyncio.to_thread(self.disk.count),
+        }
+
+    def close(self) -> None:
+        self.disk.close()
+
+
+fold_cache = FoldCache(
+    memory_bytes=env.FOLD_CACHE_MEMORY_BYTES,
+    disk_path=data_path("fold_cache.db"),
+    ttl_seconds=env.FOLD_CACHE_TTL_SECONDS,
+    memory_ttl_seconds=env.FOLD_CACHE_MEMORY_TTL_SECONDS,
+)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+
+from fastapi import Request
+
+from protein_folding.exceptions import ProteinFoldingCancelledError
+from protein_folding.metrics import CLIENT_DISCONNECTS
+
+T = TypeVar("T")
+
+
+def record_disconnect(request: Request) -> None:
+    """Log and count a request abandoned by its client."""
+    route = request.scope.get("route")
+    CLIENT_DISCONNECTS.labels(route.path if route else "other").inc()
+    logging.warning(
+        f"Client disconnected from {request.method} {request.url.path}, "
+        "cancelling upstream work"
+    )
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """
+    Return once the client of `request` disconnects.
+
+    Must only be awaited after the request body has been read, which FastAPI
+    has done by the time an endpoint runs.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await `work`, cancelling it if the client disconnects first.
+
+    Cancellation propagates through the fold: the upstream request or NVCF
+    polling stops and any concurrency slots it holds are released. Coalesced
+    upstream calls keep running while other requests still await them.
+
+    Args:
+        request: The request whose client is watched
+        work: The request's upstream work
+
+    Returns:
+        The result of `work`
+
+    Raises:
+        ProteinFoldingCancelledError: If the client disconnected first
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(wait_for_disconnect(request))
+    try:
+        await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnected = watcher.done()
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.wait((task,))
+
+    if disconnected and task.cancelled():
+        record_disconnect(request)
+        raise ProteinFoldingCancelledError(
+            "Client disconnected before the request finished"
+        )
+    return task.result()
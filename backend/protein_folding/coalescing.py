@@ -0,0 +1,390 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import pydantic_core
+from pydantic import BaseModel
+
+from config import check_env_vars
+from protein_folding.cache import fold_cache
+from protein_folding.encoding import structure_bytes
+from protein_folding.exceptions import (
+    ProteinFoldingCancelledError,
+    ProteinFoldingCircuitOpenError,
+    ProteinFoldingError,
+    ProteinFoldingRateLimitError,
+)
+from protein_folding.offload import offloader
+from protein_folding.storage import data_path, open_sqlite
+from protein_folding.tracing import span
+
+# Global configuration
+env = check_env_vars()
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+# Refusals decided by the leader's own worker, not by the upstream: followers
+# ask again instead of sharing them
+LOCAL_ERRORS = (
+    ProteinFoldingCancelledError,
+    ProteinFoldingCircuitOpenError,
+    ProteinFoldingRateLimitError,
+)
+
+
+class LeaseTable:
+    """
+    Expiring per-key leases in SQLite, used to elect one worker process per fold.
+
+    The holder renews its lease while the fold runs; a crashed worker's lease
+    simply expires and another worker takes over. A holder whose fold fails
+    records the error next to the lease, for the workers that were waiting.
+    """
+
+    def __init__(self, path: str, lease_seconds: float):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fold_leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fold_failures (
+                    key TEXT PRIMARY KEY,
+                    message TEXT NOT NULL,
+                    status_code INTEGER,
+                    failed_at REAL NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    def acquire(self, key: str) -> bool:
+        """Take the lease for `key` unless another owner holds an unexpired one."""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                """
+                INSERT INTO fold_leases (key, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE fold_leases.expires_at <= ?
+                """,
+                (key, self.owner, now + self.lease_seconds, now),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, key: str) -> None:
+        with self._lock:
+            self._connection().execute(
+                "UPDATE fold_leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                (time.time() + self.lease_seconds, key, self.owner),
+            )
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM fold_leases WHERE key = ? AND owner = ?",
+                (key, self.owner),
+            )
+
+    def record_failure(
+        self, key: str, message: str, status_code: Optional[int]
+    ) -> None:
+        """Publish the error a fold failed with, until the lease would expire."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM fold_failures WHERE failed_at <= ?",
+                (now - self.lease_seconds,),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO fold_failures "
+                "(key, message, status_code, failed_at) VALUES (?, ?, ?, ?)",
+                (key, message, status_code, now),
+            )
+
+    def failure_since(
+        self, key: str, since: float
+    ) -> Optional[Tuple[str, Optional[int]]]:
+        """The message and status of a failure of `key` at or after `since`."""
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT message, status_code FROM fold_failures "
+                    "WHERE key = ? AND failed_at >= ?",
+                    (key, since),
+                )
+                .fetchone()
+            )
+        return None if row is None else (row[0], row[1])
+
+    def is_held(self, key: str) -> bool:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute("SELECT expires_at FROM fold_leases WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return row is not None and row[0] > time.time()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Call:
+    """An in-flight coalesced call and the number of requests awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into a single execution.
+
+    Within a worker, callers share one task. Across workers, a lease elects a
+    leader; the others poll `lookup` (the shared cache) until the leader's
+    result appears. If the leader fails, they raise its error; if it gives up
+    without a result or an error, e.g. when cancelled, they retry as leader.
+    The shared task is only cancelled once every caller awaiting it is gone.
+    """
+
+    def __init__(self, leases: LeaseTable, poll_interval: float):
+        self.leases = leases
+        self.poll_interval = poll_interval
+        self._calls: Dict[str, _Call] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Optional[Callable[[], Awaitable[Optional[T]]]] = None,
+    ) -> T:
+        """
+        Run `fn` once for all concurrent callers using the same `key`.
+
+        Args:
+            key: Identity of the call, e.g. a fold cache key
+            fn: Coroutine function performing the work
+            lookup: Reads a result published by another worker; enables
+                cross-worker coalescing when given
+
+        Returns:
+            The result shared by every caller
+        """
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.create_task(self._run(key, fn, lookup))
+            call = _Call(task)
+            self._calls[key] = call
+            task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            logging.info(f"Coalescing request into in-flight call {key[:12]}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def _run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Optional[Callable[[], Awaitable[Optional[T]]]],
+    ) -> T:
+        if lookup is None:
+            return await fn()
+
+        while True:
+            waiting_since = time.time()
+            if await asyncio.to_thread(self.leases.acquire, key):
+                try:
+                    # Another worker may have published the result just before
+                    # releasing its lease
+                    result = await lookup()
+                    if result is not None:
+                        return result
+                    return await self._run_as_leader(key, fn)
+                except ProteinFoldingError as e:
+                    if not isinstance(e, LOCAL_ERRORS):
+                        await asyncio.to_thread(
+                            self.leases.record_failure, key, e.message, e.status_code
+                        )
+                    raise
+                finally:
+                    await asyncio.to_thread(self.leases.release, key)
+
+            logging.info(f"Waiting on another worker for call {key[:12]}")
+            while await asyncio.to_thread(self.leases.is_held, key):
+                await asyncio.sleep(self.poll_interval)
+                result = await lookup()
+                if result is not None:
+                    return result
+
+            result = await lookup()
+            if result is not None:
+                return result
+            # Running the fold again would most likely fail the same way
+            failure = await asyncio.to_thread(
+                self.leases.failure_since, key, waiting_since
+            )
+            if failure is not None:
+                raise ProteinFoldingError(*failure)
+            # The leader was cancelled or crashed without a result: take over
+
+    async def _run_as_leader(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(self.leases.lease_seconds / 3)
+                await asyncio.to_thread(self.leases.renew, key)
+
+        renewer = asyncio.create_task(keep_alive())
+        try:
+            return await fn()
+        finally:
+            renewer.cancel()
+
+    def close(self) -> None:
+        self.leases.close()
+
+
+fold_flight = SingleFlight(
+    LeaseTable(data_path("fold_leases.db"), lease_seconds=env.FOLD_LEASE_SECONDS),
+    poll_interval=env.FOLD_LEASE_POLL_INTERVAL,
+)
+
+
+class FoldResult(Generic[M]):
+    """
+    A fold result, held as its model, its JSON or both.
+
+    Cache hits only have the JSON. JSON clients get it as is instead of it
+    being validated into a model and serialized again; the model is built on
+    first use. Large results are converted on the offload threads.
+    """
+
+    def __init__(
+        self,
+        result_type: Type[M],
+        model: Optional[M] = None,
+        json: Optional[bytes] = None,
+    ):
+        self.result_type = result_type
+        self._model = model
+        self._json = json
+
+    async def load(self) -> M:
+        """The result as a model, validated from the JSON on first use."""
+        if self._model is None:
+            self._model = await offloader.run(
+                self.result_type.model_validate_json,
+                self._json,
+                size=len(self._json),
+                in_process=False,
+            )
+        return self._model
+
+    async def dump(self) -> bytes:
+        """The result's JSON, serialized from the model on first use."""
+        if self._json is None:
+            self._json = await offloader.run(
+                pydantic_core.to_json,
+                self._model,
+                size=structure_bytes(self._model),
+                in_process=False,
+            )
+        return self._json
+
+
+async def fold_once_result(
+    model: str,
+    key: str,
+    compute: Callable[[], Awaitable[M]],
+    result_type: Type[M],
+) -> FoldResult[M]:
+    """
+    Serve a fold from the cache, or compute it once for all identical requests.
+
+    Concurrent requests for the same key share one upstream call, including
+    requests handled by other uvicorn workers, which pick the result up from
+    the shared cache tier.
+
+    Args:
+        model: Folding model name, recorded with the cache entry
+        key: Cache key from `make_cache_key`
+        compute: Coroutine function performing the upstream fold
+        result_type: Pydantic model of the cached result
+
+    Returns:
+        The fold result, as JSON only when served from the cache
+    """
+
+    async def compute_result() -> FoldResult[M]:
+        return FoldResult(result_type, model=await compute())
+
+    if not env.FOLD_CACHE_ENABLED:
+        # Without the shared cache there is nothing to hand results between
+        # workers, so only coalesce within this worker
+        return await fold_flight.do(key, compute_result)
+
+    with span("cache.lookup", model=model) as lookup_span:
+        cached = await fold_cache.get(key)
+        lookup_span.set(hit=cached is not None)
+    if cached is not None:
+        return FoldResult(result_type, json=cached)
+
+    async def compute_and_store() -> FoldResult[M]:
+        result = await compute_result()
+        # Serialized once, for the cache and for JSON responses
+        await fold_cache.set(key, model, await result.dump())
+        return result
+
+    async def lookup() -> Optional[FoldResult[M]]:
+        value = await fold_cache.get(key, record_stats=False)
+        return None if value is None else FoldResult(result_type, json=value)
+
+    return await fold_flight.do(key, compute_and_store, lookup)
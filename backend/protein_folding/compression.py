@@ -0,0 +1,178 @@
+import asyncio
+import gzip
+import logging
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from protein_folding.encoding import ANALYSIS_MEDIA_TYPE, STRUCTURE_MEDIA_TYPE
+
+# Levels chosen for speed: fold responses are compressed on every request
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Bodies larger than this are compressed in a worker thread
+THREAD_THRESHOLD_BYTES = 64 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+    STRUCTURE_MEDIA_TYPE,
+    ANALYSIS_MEDIA_TYPE,
+)
+# Streamed incrementally to the client; buffering them would break streaming
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Content codings this server can produce, most preferred first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(
+    accept_encoding: str, offered: Optional[Tuple[str, ...]] = None
+) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    The client's q-values decide; ties go to the server preference order
+    zstd, br, gzip.
+
+    Args:
+        accept_encoding: Accept-Encoding header value, e.g. "gzip, br;q=0.9"
+        offered: Codings to choose from in preference order, by default
+            every coding this server can produce
+
+    Returns:
+        The chosen coding, or None to send the body uncompressed
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in offered or available_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the given content coding."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(headers: Headers) -> bool:
+    """Check whether a response with these headers may be compressed."""
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in STREAMING_TYPES:
+        return False
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    Compress complete response bodies with the best coding the client accepts.
+
+    Only responses sent in a single body message are compressed, which covers
+    every JSON and packed-structure response. Streamed responses (SSE, NDJSON,
+    files) pass through untouched so they keep flushing incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        logging.info(
+            f"Response compression enabled: {', '.join(available_encodings())}"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Hold the headers until the body shows whether to compress
+                start = message
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or not is_compressible(headers)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_THRESHOLD_BYTES:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            # The compressed bytes differ from those the validator describes
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
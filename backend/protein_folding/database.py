@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from config import check_env_vars
+from protein_folding.storage import data_path, open_sqlite
+
+# Global configuration
+env = check_env_vars()
+
+T = TypeVar("T")
+# A SQL statement, or a function run with the connection
+MigrationStep = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+def _copy_legacy_users(conn: sqlite3.Connection) -> None:
+    """Copy the Users of LEGACY_DATABASE_FILE, if it exists, keeping their ids."""
+    path = env.LEGACY_DATABASE_FILE
+    if not path or not os.path.isfile(path):
+        return
+    legacy = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        users = legacy.execute("SELECT id, name, email FROM Users").fetchall()
+    except sqlite3.DatabaseError as e:
+        logging.warning(f"Could not read users from {path}: {e}")
+        return
+    finally:
+        legacy.close()
+    copied = conn.executemany(
+        "INSERT OR IGNORE INTO Users (id, name, email) VALUES (?, ?, ?)", users
+    ).rowcount
+    logging.info(f"Copied {copied} users from {path}")
+
+
+# Schema versions, applied in order and tracked in PRAGMA user_version. Never
+# edit a released migration; append a new one instead
+MIGRATIONS: Tuple[Tuple[MigrationStep, ...], ...] = (
+    (
+        """
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE
+        )
+        """,
+    ),
+    (
+        """
+        CREATE TABLE IF NOT EXISTS boltz2_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            request TEXT NOT NULL,
+            progress TEXT NOT NULL DEFAULT '{}',
+            result TEXT,
+            error TEXT,
+            error_status_code INTEGER,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        # Retention cleanup deletes finished jobs by age
+        "CREATE INDEX IF NOT EXISTS boltz2_jobs_status_updated_at "
+        "ON boltz2_jobs (status, updated_at)",
+    ),
+    # Users were kept in the working directory before DATA_DIR existed
+    (_copy_legacy_users,),
+)
+
+
+class ConnectionPool:
+    """
+    A fixed set of SQLite connections, handed out one caller at a time.
+
+    sqlite3 keeps a cache of prepared statements per connection, so reusing
+    connections also reuses the compiled form of every parameterized query.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = open_sqlite(self.path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, opening it on first use, for the block."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                opened = len(self._opened) < self.size
+                if opened:
+                    conn = self._open()
+                    self._opened.append(conn)
+            if not opened:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+            self._idle = queue.LifoQueue()
+
+
+class Database:
+    """
+    Async access to the application database.
+
+    Queries run on a thread pool with one thread per pooled connection, so
+    they never block the event loop and never wait for a connection. Shared
+    by all uvicorn workers through the SQLite file in WAL mode.
+    """
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Run `fn` with a pooled connection on the database thread pool."""
+
+        def call() -> T:
+            with self.pool.connection() as conn:
+                return fn(conn)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool.size, thread_name_prefix="database"
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def transaction(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """
+        Run `fn` in a write transaction, committing if it returns.
+
+        BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        queue on the busy timeout instead of failing mid-transaction.
+        """
+
+        def call(conn: sqlite3.Connection) -> T:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+
+        return await self.run(call)
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """Execute one statement and return the number of rows it changed."""
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount)
+
+    async def fetch_one(
+        self, sql: str, params: Sequence[Any] = ()
+    ) -> Optional[sqlite3.Row]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetch_all(
+        self, sql: str, params: Sequence[Any] = ()
+    ) -> List[sqlite3.Row]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def fetch_page(
+        self, sql: str, params: Sequence[Any], limit: int
+    ) -> Tuple[List[sqlite3.Row], bool]:
+        """
+        Fetch up to `limit` rows of a keyset-paginated query.
+
+        `sql` must end with `LIMIT ?`; one row more than `limit` is requested
+        to learn whether another page follows.
+
+        Returns:
+            The rows and whether more rows follow
+        """
+        rows = await self.fetch_all(sql, (*params, limit + 1))
+        return rows[:limit], len(rows) > limit
+
+    async def migrate(self) -> int:
+        """
+        Apply pending migrations. Safe to call from every worker at startup.
+
+        Returns:
+            The schema version after migrating
+        """
+
+        def apply(conn: sqlite3.Connection) -> int:
+            # Re-read under the write lock: another worker may have migrated
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(MIGRATIONS[version:], version + 1):
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+                logging.info(f"Applied database migration {number}")
+            return max(version, len(MIGRATIONS))
+
+        return await self.transaction(apply)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.pool.close()
+
+
+db = Database(data_path(env.DATABASE_FILE), pool_size=env.DATABASE_POOL_SIZE)
@@ -0,0 +1,16 @@
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from config import check_env_vars
+
+# Global configuration
+env = check_env_vars()
+
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """Allow the request only if it carries the configured ADMIN_API_KEY."""
+    if not env.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if x_admin_key != env.ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid admin key")
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import base64
+import json
+import struct
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+import pydantic_core
+from pydantic import BaseModel
+
+from protein_folding.models import (
+    Boltz2Response,
+    Boltz2Result,
+    EsmfoldResponse,
+    EsmfoldResult,
+)
+
+# Content negotiation runs on every request and is imported by the
+# middlewares; NumPy is only imported once a frame is actually packed
+if TYPE_CHECKING:
+    import numpy as np
+
+    from protein_folding.structure import Structure
+
+# Clients send this in Accept to receive fold results as packed binary frames
+STRUCTURE_MEDIA_TYPE = "application/vnd.pomelo.structure"
+STRUCTURE_MAGIC = b"PMLS"
+STRUCTURE_FORMAT_VERSION = 1
+# Structure analyses (contact and distance maps, ...) use the same layout
+ANALYSIS_MEDIA_TYPE = "application/vnd.pomelo.analysis"
+ANALYSIS_MAGIC = b"PMLA"
+
+FRAME_HEADER = struct.Struct("<4sHHI")
+ALIGNMENT = 8
+
+# JSON encodings of pLDDT scores: a list of numbers, or base64 of
+# little-endian float32 values or of uint8 values quantized to 100/255 steps
+PlddtEncoding = Literal["list", "f32", "u8"]
+PLDDT_U8_SCALE = 255 / 100
+
+
+def accepts_media_type(accept: Optional[str], expected: str) -> bool:
+    """Check whether an Accept header explicitly asks for a media type."""
+    for media_range in (accept or "").split(","):
+        media_type, *params = media_range.split(";")
+        if media_type.strip().lower() != expected:
+            continue
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def accepts_packed_structures(accept: Optional[str]) -> bool:
+    """Check whether an Accept header explicitly asks for packed structures."""
+    return accepts_media_type(accept, STRUCTURE_MEDIA_TYPE)
+
+
+def structure_bytes(value: BaseModel) -> int:
+    """Size of the structure text in a fold result or response."""
+    if isinstance(value, EsmfoldResult):
+        return len(value.pdb)
+    if isinstance(value, Boltz2Result):
+        return len(value.mmcif_string)
+    if isinstance(value, (EsmfoldResponse, Boltz2Response)):
+        return sum(structure_bytes(result) for result in value.results)
+    return 0
+
+
+def encode_plddt(scores: List[float], encoding: PlddtEncoding) -> str:
+    """Encode pLDDT scores (0-100) compactly as base64 text."""
+    import numpy as np
+
+    values = np.asarray(scores, dtype="<f4")
+    if encoding == "u8":
+        values = np.clip(np.rint(values * PLDDT_U8_SCALE), 0, 255).astype(np.uint8)
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def decode_plddt(encoded: str, encoding: PlddtEncoding) -> List[float]:
+    """Decode `encode_plddt` output, the reference for client implementations."""
+    data = base64.b64decode(encoded)
+    if encoding == "f32":
+        return list(struct.unpack(f"<{len(data) // 4}f", data))
+    return [value / PLDDT_U8_SCALE for value in data]
+
+
+def fold_response_json(
+    response: BaseModel, plddt_encoding: PlddtEncoding = "list"
+) -> bytes:
+    """
+    Serialize a fold response to JSON bytes.
+
+    The response is trusted, so it is not validated again. With a compact
+    `plddt_encoding`, the "plddt" and "chain_plddt" values of every result are
+    base64 strings (see `encode_plddt`) and the response gets a top-level
+    "plddt_encoding" field naming the encoding.
+    """
+    if plddt_encoding == "list":
+        return pydantic_core.to_json(response)
+
+    # Dumping shares the structure strings with the model instead of copying
+    data = response.model_dump()
+    for result in data["results"]:
+        result["plddt"] = encode_plddt(result["plddt"], plddt_encoding)
+        if "chain_plddt" in result:
+            result["chain_plddt"] = {
+                chain_id: encode_plddt(scores, plddt_encoding)
+                for chain_id, scores in result["chain_plddt"].items()
+            }
+    data["plddt_encoding"] = plddt_encoding
+    return pydantic_core.to_json(data)
+
+
+def results_json(results: Sequence[bytes]) -> bytes:
+    """Assemble a {"results": [...]} response from serialized results."""
+    return b'{"results":[' + b",".join(results) + b"]}"
+
+
+def _text_matrix(values: np.ndarray) -> np.ndarray:
+    """View fixed-width byte strings as an (n, width) uint8 matrix."""
+    import numpy as np
+
+    width = max(values.dtype.itemsize, 1)
+    values = np.ascontiguousarray(values.astype(f"S{width}"))
+    return values.view(np.uint8).reshape(len(values), width)
+
+
+def _structure_arrays(structure: Structure) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """Chain ids and the arrays of the packed layout for one structure."""
+    import numpy as np
+
+    chains, chain_index = np.unique(structure.chain_ids, return_inverse=True)
+    arrays = {
+        "coords": structure.coords.astype("<f4"),
+        "b_factors": structure.b_factors.astype("<f4"),
+        "res_seq": structure.res_seq.astype("<i4"),
+        "chain_index": chain_index.astype("<u2"),
+        "hetero": structure.hetero.astype(np.uint8),
+        "atom_names": _text_matrix(structure.atom_names),
+        "res_names": _text_matrix(structure.res_names),
+        "ins_codes": _text_matrix(structure.ins_codes),
+    }
+    return [chain.decode() for chain in chains], arrays
+
+
+def _append_arrays(
+    arrays: Dict[str, np.ndarray], data: List[bytes], offset: int
+) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """
+    Append arrays to the data section of a frame being built.
+
+    Returns:
+        The arrays' {"dtype", "shape", "offset"} directory and the offset
+        following them
+    """
+    import numpy as np
+
+    directory = {}
+    for name, array in arrays.items():
+        directory[name] = {
+            "dtype": array.dtype.name,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        chunk = np.ascontiguousarray(array).tobytes()
+        padding = -len(chunk) % ALIGNMENT
+        data += [chunk, b"\0" * padding]
+        offset += len(chunk) + padding
+    return directory, offset
+
+
+def _frame(magic: bytes, header: Dict[str, Any], data: List[bytes]) -> bytes:
+    """Assemble a frame from its JSON header and data section."""
+    header_json = json.dumps(header, separators=(",", ":")).encode()
+    header_json += b"\0" * (-(FRAME_HEADER.size + len(header_json)) % ALIGNMENT)
+    prefix = FRAME_HEADER.pack(magic, STRUCTURE_FORMAT_VERSION, 0, len(header_json))
+    return b"".join([prefix, header_json, *data])
+
+
+def _unframe(frame: bytes, magic: bytes) -> Tuple[Dict[str, Any], int]:
+    """
+    Read the header of a frame.
+
+    Returns:
+        The header and the offset of the data section in `frame`
+
+    Raises:
+        ValueError: If `frame` is not a frame of this kind and version
+    """
+    frame_magic, version, _, header_length = FRAME_HEADER.unpack_from(frame)
+    if frame_magic != magic or version != STRUCTURE_FORMAT_VERSION:
+        raise ValueError("Not a packed frame of the expected kind and version")
+    data_start = FRAME_HEADER.size + header_length
+    header = json.loads(frame[FRAME_HEADER.size : data_start].rstrip(b"\0"))
+    return header, data_start
+
+
+def _view_arrays(
+    frame: bytes, data_start: int, directory: Dict[str, Dict[str, Any]]
+) -> Dict[str, np.ndarray]:
+    """View the arrays of a frame's directory as NumPy arrays, without copying."""
+    import numpy as np
+
+    arrays = {}
+    for name, spec in directory.items():
+        dtype = np.dtype(spec["dtype"]).newbyteorder("<")
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(
+            frame, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(spec["shape"])
+    return arrays
+
+
+def pack_structures(entries: Sequence[Tuple[Structure, Dict[str, Any]]]) -> bytes:
+    """
+    Encode structures and their metadata as one packed binary frame.
+
+    Frame layout, all integers little-endian:
+
+        0   4 bytes  magic "PMLS"
+        4   uint16   format version
+        6   uint16   reserved (0)
+        8   uint32   header length in bytes
+        12  header   UTF-8 JSON, zero-padded to a multiple of 8 bytes
+            data     arrays, each starting at a multiple of 8 bytes
+
+    The header holds a "results" list. Each entry has the result metadata
+    (pLDDT, confidence scores, ...), the atom count, the chain ids and an
+    "arrays" directory of {"dtype", "shape", "offset"}, with offsets relative
+    to the data section, so browsers can view each array as a typed array
+    without copying:
+
+        coords       float32 (atoms, 3)
+        b_factors    float32 (atoms,)
+        res_seq      int32   (atoms,)
+        chain_index  uint16  (atoms,)    index into "chains"
+        hetero       uint8   (atoms,)    1 for HETATM records
+        atom_names   uint8   (atoms, w)  NUL-padded ASCII
+        res_names    uint8   (atoms, w)  NUL-padded ASCII
+        ins_codes    uint8   (atoms, w)  NUL-padded ASCII
+
+    Args:
+        entries: (structure, JSON-serializable metadata) per result
+
+    Returns:
+        The packed frame
+    """
+    results = []
+    data: List[bytes] = []
+    offset = 0
+    for structure, metadata in entries:
+        chains, arrays = _structure_arrays(structure)
+        directory, offset = _append_arrays(arrays, data, offset)
+        results.append(
+            {**metadata, "atoms": len(structure), "chains": chains, "arrays": directory}
+        )
+    return _frame(STRUCTURE_MAGIC, {"results": results}, data)
+
+
+def unpack_structures(frame: bytes) -> List[Dict[str, Any]]:
+    """
+    Decode a packed frame, the reference for client implementations.
+
+    Returns:
+        One dict per result with its metadata plus each array as a NumPy view
+        of `frame`
+
+    Raises:
+        ValueError: If `frame` is not a packed structure frame of this version
+    """
+    header, data_start = _unframe(frame, STRUCTURE_MAGIC)
+    results = header["results"]
+    for result in results:
+        result.update(_view_arrays(frame, data_start, result.pop("arrays")))
+    return results
+
+
+def pack_analysis(summary: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> bytes:
+    """
+    Encode a structure analysis as a packed binary frame.
+
+    The layout is that of `pack_structures` with the magic "PMLA". The
+    header is the JSON summary plus an "arrays" directory of the arrays.
+    """
+    data: List[bytes] = []
+    directory, _ = _append_arrays(arrays, data, 0)
+    return _frame(ANALYSIS_MAGIC, {**summary, "arrays": directory}, data)
+
+
+def unpack_analysis(frame: bytes) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Decode a packed analysis frame, the reference for client implementations.
+
+    Returns:
+        The summary and each array as a NumPy view of `frame`
+
+    Raises:
+        ValueError: If `frame` is not a packed analysis frame of this version
+    """
+    header, data_start = _unframe(frame, ANALYSIS_MAGIC)
+    return header, _view_arrays(frame, data_start, header.pop("arrays"))
+
+
+def analysis_json(frame: bytes, include_arrays: bool = False) -> bytes:
+    """
+    Serialize a packed analysis frame as JSON: its summary and, if asked,
+    its arrays as {"dtype", "shape", "data"} with base64 little-endian data.
+    """
+    summary, arrays = unpack_analysis(frame)
+    if include_arrays:
+        summary["arrays"] = {
+            name: {
+                "dtype": array.dtype.name,
+                "shape": list(array.shape),
+                "data": base64.b64encode(array.tobytes()).decode("ascii"),
+            }
+            for name, array in arrays.items()
+        }
+    return pydantic_core.to_json(summary)
+
+
+def pack_esmfold_response(response: EsmfoldResponse) -> bytes:
+    """Encode ESMFold results as a packed frame, replacing the PDB text."""
+    from protein_folding.structure import Structure
+
+    return pack_structures(
+        [
+            (
+                Structure.from_pdb(result.pdb),
+                {"source_format": "pdb", **result.model_dump(exclude={"pdb"})},
+            )
+            for result in response.results
+        ]
+    )
+
+
+def pack_boltz2_response(response: Boltz2Response) -> bytes:
+    """Encode Boltz-2 results as a packed frame, replacing the mmCIF text."""
+    from protein_folding.structure import Structure
+
+    return pack_structures(
+        [
+            (
+                Structure.from_mmcif(result.mmcif_string),
+                {
+                    "source_format": "mmcif",
+                    **result.model_dump(exclude={"mmcif_string"}),
+                },
+            )
+            for result in response.results
+        ]
+    )
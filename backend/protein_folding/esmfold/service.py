@@ -1,9 +1,32 @@
+import asyncio
 import logging
 import httpx
-from protein_folding.models import EsmfoldResult
-from protein_folding.utils import calculate_plddt
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from protein_folding.models import (
+    EsmfoldBatchItem,
+    EsmfoldBatchRecord,
+    EsmfoldResult,
+    MAX_SEQUENCE_LENGTH,
+)
+from protein_folding.utils import calculate_plddt, normalize_sequence
+from protein_folding.http_client import get_client, get_timeout
+from protein_folding.cache import make_cache_key
+from protein_folding.coalescing import FoldResult, fold_once_result
+from protein_folding.metrics import PARSE_SECONDS, record_error, track_upstream
+from protein_folding.offload import offloader
+from protein_folding.ratelimit import upstream_limiter
+from protein_folding.resilience import upstream_resilience
+from protein_folding.scheduler import (
+    BATCH,
+    current_lane,
+    esmfold_cost,
+    fold_context,
+    fold_scheduler,
+)
+from protein_folding.tracing import span
 from config import check_env_vars
 from protein_folding.exceptions import (
+    ProteinFoldingError,
     ProteinFoldingAPIError,
     ProteinSequenceValidationError,
     ProteinFoldingTimeoutError,
@@ -13,7 +36,7 @@ from protein_folding.exceptions import (
 # Global configuration
 env = check_env_vars()
 
-INVOKE_URL = "https://health.api.nvidia.com/v1/biology/nvidia/esmfold"
+INVOKE_URL = f"{env.NVIDIA_API_BASE_URL.rstrip('/')}/v1/biology/nvidia/esmfold"
 HEADERS = {
     "Authorization": f"Bearer {env.NVIDIA_API_KEY}",
     "Accept": "application/json",
@@ -26,10 +49,11 @@ def validate_sequence(sequence: str) -> None:
         raise ProteinSequenceValidationError("Protein sequence cannot be empty")
 
     # Basic validation - only allow amino acid letters
-    valid_amino_acids = set("ACDEFGHIKLMNPQRSTVWY")
+    valid_amino_acids = frozenset("ACDEFGHIKLMNPQRSTVWY")
     sequence_upper = sequence.upper().strip()
 
-    if not all(aa in valid_amino_acids for aa in sequence_upper):
+    # Checked in C, not one character at a time in a generator
+    if not valid_amino_acids.issuperset(sequence_upper):
         raise ProteinSequenceValidationError(
             "Protein sequence contains invalid amino acid characters. "
             "Only standard 20 amino acids are allowed."
@@ -52,21 +76,55 @@ async def fold_with_esmfold(sequence: str) -> EsmfoldResult:
         ProteinFoldingTimeoutError: If request times out
         ProteinFoldingConnectionError: If connection fails
     """
-    validate_sequence(sequence)
+    fold = await fold_with_esmfold_result(sequence)
+    return await fold.load()
+
+
+async def fold_with_esmfold_result(sequence: str) -> FoldResult[EsmfoldResult]:
+    """
+    Fold a protein sequence like `fold_with_esmfold`, keeping cache hits as JSON.
 
-    payload = {"sequence": sequence.strip()}
+    Raises:
+        The errors of `fold_with_esmfold`
+    """
+    with span("validate", sequence_length=len(sequence)):
+        validate_sequence(sequence)
+    sequence = normalize_sequence(sequence)
+
+    return await fold_once_result(
+        "esmfold",
+        make_cache_key("esmfold", sequence=sequence),
+        lambda: call_esmfold(sequence),
+        EsmfoldResult,
+    )
+
+
+async def call_esmfold(sequence: str) -> EsmfoldResult:
+    """Fold a validated, normalized sequence with the upstream ESMFold API."""
+    payload = {"sequence": sequence}
+
+    async def attempt(max_wait: Optional[float] = None) -> httpx.Response:
+        async with upstream_limiter.acquire("esmfold", max_wait=max_wait):
+            with span("upstream", model="esmfold") as upstream_span:
+                with track_upstream("esmfold"):
+                    response = await get_client().post(
+                        INVOKE_URL,
+                        headers=HEADERS,
+                        json=payload,
+                        timeout=get_timeout("esmfold"),
+                    )
+                    upstream_span.set(status=response.status_code)
+                    response.raise_for_status()
+                return response
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                INVOKE_URL,
-                headers=HEADERS,
-                json=payload,
-                timeout=300.0,  # 5 minute timeout for protein folding
+        # Folding is a pure function of the sequence: safe to repeat, and a
+        # hedged request only takes a rate limit token that is free now
+        async with fold_scheduler.slot(current_lane(), esmfold_cost(len(sequence))):
+            response = await upstream_resilience.call(
+                "esmfold", attempt, idempotent=True, hedge=lambda: attempt(max_wait=0)
             )
-
-            response.raise_for_status()
-            response_body = response.json()
+        response_body = response.json()
 
         if env.DEBUG:
             logging.debug(f"ESMFold API response: {response_body}")
@@ -76,7 +134,10 @@ async def fold_with_esmfold(sequence: str) -> EsmfoldResult:
 
         # Extract PDB string and calculate pLDDT scores
         pdb_string = response_body["pdbs"][0]
-        plddt_scores = calculate_plddt(pdb_string)
+        with span("parse", format="pdb"), PARSE_SECONDS.labels("pdb").time():
+            plddt_scores = await offloader.run(
+                calculate_plddt, pdb_string, size=len(pdb_string)
+            )
 
         # Return EsmfoldResult
         return EsmfoldResult(pdb=pdb_string, plddt=plddt_scores)
@@ -98,3 +159,70 @@ async def fold_with_esmfold(sequence: str) -> EsmfoldResult:
         )
     except httpx.RequestError as e:
         raise ProteinFoldingAPIError(f"Request failed: {str(e)}", 500)
+
+
+async def fold_batch_with_esmfold(
+    records: List[EsmfoldBatchRecord],
+) -> AsyncIterator[EsmfoldBatchItem]:
+    """
+    Fold a batch of sequences, yielding each result as soon as it completes.
+
+    Identical sequences are folded once and at most ESMFOLD_BATCH_CONCURRENCY
+    folds run upstream at a time, scheduled in the batch lane. Errors are
+    reported per record and never abort the batch. Closing the iterator
+    cancels the remaining folds.
+
+    Args:
+        records: Sequences to fold
+
+    Yields:
+        EsmfoldBatchItem for every record, in completion order
+    """
+    groups: Dict[str, List[Tuple[int, EsmfoldBatchRecord]]] = {}
+    for index, record in enumerate(records):
+        try:
+            validate_sequence(record.sequence)
+            # FASTA uploads bypass the request model's length limit
+            if len(record.sequence) > MAX_SEQUENCE_LENGTH:
+                raise ProteinSequenceValidationError(
+                    f"Protein sequence exceeds {MAX_SEQUENCE_LENGTH} residues"
+                )
+        except ProteinSequenceValidationError as e:
+            yield EsmfoldBatchItem(
+                index=index, id=record.id, error=e.message, status_code=e.status_code
+            )
+            continue
+        sequence = normalize_sequence(record.sequence)
+        groups.setdefault(sequence, []).append((index, record))
+
+    slots = asyncio.Semaphore(env.ESMFOLD_BATCH_CONCURRENCY)
+
+    async def fold_group(sequence: str) -> Tuple[str, Dict[str, Any]]:
+        async with slots:
+            # Each task has its own context: the lane only applies to its fold
+            with fold_context(lane=BATCH):
+                try:
+                    return sequence, {"result": await fold_with_esmfold(sequence)}
+                except ProteinFoldingError as e:
+                    logging.error(f"Protein folding error in batch: {e.message}")
+                    record_error(e)
+                    return sequence, {"error": e.message, "status_code": e.status_code}
+                except Exception as e:
+                    logging.error(
+                        f"Unexpected error in batch protein folding: {str(e)}"
+                    )
+                    record_error(e)
+                    return sequence, {
+                        "error": "An unexpected error occurred during protein folding",
+                        "status_code": 500,
+                    }
+
+    tasks = [asyncio.create_task(fold_group(sequence)) for sequence in groups]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            sequence, outcome = await completed
+            for index, record in groups[sequence]:
+                yield EsmfoldBatchItem(index=index, id=record.id, **outcome)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,6 +1,10 @@
+import math
+
 from fastapi import HTTPException
 from typing import Any, Dict, Optional
 
+from protein_folding.metrics import record_error
+
 
 class ProteinFoldingError(Exception):
     """Base exception for protein folding API errors."""
@@ -31,6 +35,13 @@ class ProteinSequenceValidationError(ProteinFoldingError):
         super().__init__(message, 400)
 
 
+class ProteinStructureValidationError(ProteinFoldingError):
+    """Exception raised when a structure to analyze has no usable residues."""
+
+    def __init__(self, message: str):
+        super().__init__(message, 400)
+
+
 class ProteinFoldingTimeoutError(ProteinFoldingError):
     """Exception raised when protein folding API request times out."""
 
@@ -45,7 +56,37 @@ class ProteinFoldingConnectionError(ProteinFoldingError):
         super().__init__(message, 503)
 
 
+class ProteinFoldingRateLimitError(ProteinFoldingError):
+    """Exception raised when the upstream request budget is exhausted."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+
+class ProteinFoldingCircuitOpenError(ProteinFoldingError):
+    """Exception raised when calls to a failing upstream are suspended."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, 503)
+        self.retry_after = retry_after
+
+
+class ProteinFoldingCancelledError(ProteinFoldingError):
+    """Exception raised when a protein folding request is cancelled before it ends."""
+
+    def __init__(self, message: str = "Protein folding request was cancelled"):
+        # 499: the client closed the request
+        super().__init__(message, 499)
+
+
 def handle_protein_folding_exception(error: ProteinFoldingError) -> HTTPException:
     """Convert protein folding exceptions to FastAPI HTTPException."""
+    record_error(error)
     status_code = error.status_code or 500
-    return HTTPException(status_code=status_code, detail=error.message)
+    headers = None
+    if isinstance(
+        error, (ProteinFoldingRateLimitError, ProteinFoldingCircuitOpenError)
+    ):
+        headers = {"Retry-After": str(math.ceil(error.retry_after))}
+    return HTTPException(status_code=status_code, detail=error.message, headers=headers)
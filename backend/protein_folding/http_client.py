@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+from config import check_env_vars
+
+# Global configuration
+env = check_env_vars()
+
+SERVICE_TIMEOUTS = {
+    "esmfold": env.ESMFOLD_TIMEOUT,
+    "boltz2": env.BOLTZ2_TIMEOUT,
+}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """Check whether the optional `h2` package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_client() -> httpx.AsyncClient:
+    """Build the pooled upstream client from the environment configuration."""
+    http2 = env.UPSTREAM_HTTP2
+    if http2 and not _http2_available():
+        logging.warning("UPSTREAM_HTTP2 is enabled but `h2` is not installed")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=env.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=env.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=env.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=limits,
+        timeout=httpx.Timeout(
+            env.ESMFOLD_TIMEOUT, connect=env.UPSTREAM_CONNECT_TIMEOUT
+        ),
+    )
+
+
+async def start_client() -> httpx.AsyncClient:
+    """
+    Create the shared upstream client. Called from the app lifespan.
+
+    Loading the CA bundle for the SSL context takes about 100 ms of CPU, so
+    the client is built on a thread instead of blocking the event loop.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        client = await asyncio.to_thread(build_client)
+        if _client is None or _client.is_closed:
+            _client = client
+        else:
+            # A request built one through get_client in the meantime
+            await client.aclose()
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared upstream client and release pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the shared upstream client.
+
+    The client is normally created by the app lifespan; it is built lazily
+    here so the services also work when used outside of the app (scripts,
+    benchmarks).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_client()
+    return _client
+
+
+def get_timeout(service: str) -> httpx.Timeout:
+    """Return the request timeout for an upstream folding service."""
+    return httpx.Timeout(
+        SERVICE_TIMEOUTS[service], connect=env.UPSTREAM_CONNECT_TIMEOUT
+    )
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from config import check_env_vars
+from protein_folding.boltz2.service import fold_boltz2, validate_boltz2_input
+from protein_folding.database import Database, db
+from protein_folding.encoding import structure_bytes
+from protein_folding.exceptions import ProteinFoldingError
+from protein_folding.metrics import record_error
+from protein_folding.models import Boltz2JobResponse, Boltz2Request, Boltz2Response
+from protein_folding.offload import offloader
+from protein_folding.tracing import start_trace
+
+# Global configuration
+env = check_env_vars()
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+# A queued or running job whose worker stopped heartbeating is reported as lost
+STALE_AFTER_SECONDS = env.JOB_HEARTBEAT_SECONDS * 4
+
+
+class JobStore:
+    """Boltz-2 job records in the shared database, readable from any uvicorn worker."""
+
+    def __init__(self, db: Database, retention_seconds: int):
+        self.db = db
+        self.retention_seconds = retention_seconds
+
+    async def create(self, request: Boltz2Request) -> Boltz2JobResponse:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "DELETE FROM boltz2_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*TERMINAL_STATUSES, now - self.retention_seconds),
+            )
+            conn.execute(
+                "INSERT INTO boltz2_jobs (id, status, request, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, request.model_dump_json(), now, now),
+            )
+
+        await self.db.transaction(insert)
+        return Boltz2JobResponse(
+            job_id=job_id, status="queued", created_at=now, updated_at=now
+        )
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        await self.db.execute(
+            f"UPDATE boltz2_jobs SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id),
+        )
+
+    async def get(
+        self, job_id: str, include_result: bool = True
+    ) -> Optional[Boltz2JobResponse]:
+        fetched = await self._fetch(job_id, include_result)
+        if fetched is None:
+            return None
+        job, result = fetched
+        if result:
+            job.result = await offloader.run(
+                Boltz2Response.model_validate_json,
+                result,
+                size=len(result),
+                in_process=False,
+            )
+        return job
+
+    async def get_json(self, job_id: str) -> Optional[bytes]:
+        """The job as JSON, with the stored result copied in without parsing it."""
+        fetched = await self._fetch(job_id, include_result=True)
+        if fetched is None:
+            return None
+        job, result = fetched
+        envelope = job.model_dump_json(exclude={"result"}).encode()
+        if not result:
+            return envelope[:-1] + b',"result":null}'
+        return envelope[:-1] + b',"result":' + result.encode() + b"}"
+
+    async def _fetch(
+        self, job_id: str, include_result: bool
+    ) -> Optional[Tuple[Boltz2JobResponse, Optional[str]]]:
+        """The job without its result, and the result's stored JSON."""
+        result_column = "result" if include_result else "NULL"
+        row = await self.db.fetch_one(
+            "SELECT id, status, progress, "
+            f"{result_column}, error, error_status_code, created_at, updated_at "
+            "FROM boltz2_jobs WHERE id = ?",
+            (job_id,),
+        )
+        if row is None:
+            return None
+
+        job = Boltz2JobResponse(
+            job_id=row[0],
+            status=row[1],
+            progress=json.loads(row[2]),
+            error=row[4],
+            error_status_code=row[5],
+            created_at=row[6],
+            updated_at=row[7],
+        )
+        if (
+            job.status not in TERMINAL_STATUSES
+            and job.updated_at < time.time() - STALE_AFTER_SECONDS
+        ):
+            job.status = "failed"
+            job.error = "Job was lost: the worker running it stopped responding"
+            job.error_status_code = 500
+        return job, row[3]
+
+
+class Boltz2JobRunner:
+    """
+    Runs submitted Boltz-2 jobs as background tasks on the submitting worker.
+
+    The task owns the upstream call and NVCF polling and writes progress to
+    the job store, so the HTTP request that submitted the job returns at once.
+    """
+
+    def __init__(self, store: JobStore, max_concurrent: int):
+        self.store = store
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, request: Boltz2Request) -> Boltz2JobResponse:
+        """
+        Validate and enqueue a Boltz-2 job.
+
+        Raises:
+            ProteinSequenceValidationError: If input is invalid
+        """
+        validate_boltz2_input(request.sequence, request.ligand_smiles)
+        job = await self.store.create(request)
+
+        task = asyncio.create_task(self._run_traced(job.job_id, request))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    async def get(
+        self, job_id: str, include_result: bool = True
+    ) -> Optional[Boltz2JobResponse]:
+        return await self.store.get(job_id, include_result)
+
+    async def get_json(self, job_id: str) -> Optional[bytes]:
+        return await self.store.get_json(job_id)
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        await self.store.update(job_id, **fields)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(env.JOB_HEARTBEAT_SECONDS)
+            await self._update(job_id)
+
+    async def _run_traced(self, job_id: str, request: Boltz2Request) -> None:
+        # Jobs outlive the request that submitted them, so they get their own
+        # trace instead of adding spans to a trace that was already recorded
+        with start_trace("boltz2_job", job_id=job_id):
+            await self._run(job_id, request)
+
+    async def _run(self, job_id: str, request: Boltz2Request) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            async with self._slots:
+                await self._update(
+                    job_id, status="running", progress={"stage": "starting"}
+                )
+                result = await fold_boltz2(
+                    request.sequence,
+                    request.ligand_smiles,
+                    request.recycling_steps,
+                    request.sampling_steps,
+                    request.diffusion_samples,
+                    progress=lambda update: self._update(job_id, progress=update),
+                )
+        except ProteinFoldingError as e:
+            logging.error(f"Boltz-2 job {job_id} error: {e.message}")
+            record_error(e)
+            await self._update(
+                job_id,
+                status="failed",
+                error=e.message,
+                error_status_code=e.status_code or 500,
+            )
+        except asyncio.CancelledError:
+            logging.warning(f"Boltz-2 job {job_id} cancelled")
+            await self._update(
+                job_id,
+                status="failed",
+                error="Job was cancelled because the server shut down",
+                error_status_code=503,
+            )
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error in Boltz-2 job {job_id}: {str(e)}")
+            record_error(e)
+            await self._update(
+                job_id,
+                status="failed",
+                error="An unexpected error occurred during Boltz-2 processing",
+                error_status_code=500,
+            )
+        else:
+            await self._update(
+                job_id,
+                status="succeeded",
+                progress={"stage": "done"},
+                result=await offloader.run(
+                    result.model_dump_json,
+                    size=structure_bytes(result),
+                    in_process=False,
+                ),
+            )
+        finally:
+            heartbeat.cancel()
+
+    async def events(self, job_id: str) -> AsyncIterator[str]:
+        """
+        Yield Server-Sent Events with the job status whenever it changes.
+
+        Events omit the result; fetch it from the job endpoint once the job
+        reaches a terminal status. The stream ends at that point.
+        """
+        last_update = None
+        while True:
+            job = await self.get(job_id, include_result=False)
+            if job is None:
+                return
+            if job.updated_at != last_update:
+                last_update = job.updated_at
+                yield f"data: {job.model_dump_json(exclude={'result'})}\n\n"
+            if job.status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(env.JOB_EVENTS_INTERVAL)
+
+    async def shutdown(self) -> None:
+        """Cancel this worker's running jobs, marking them as failed."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+boltz2_jobs = Boltz2JobRunner(
+    JobStore(db, retention_seconds=env.JOB_RETENTION_SECONDS),
+    max_concurrent=env.BOLTZ2_MAX_CONCURRENT_JOBS,
+)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional, Tuple
+
+from config import check_env_vars
+from protein_folding.metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_STALLS
+
+# Global configuration
+env = check_env_vars()
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    Detect event loop stalls and report the code causing them.
+
+    A heartbeat coroutine wakes up every `interval` seconds and records how
+    late it ran. A watchdog thread checks the time of the last heartbeat:
+    once the loop has been blocked for `threshold` seconds it captures the
+    stack of the loop's thread, i.e. the code blocking it. The stall is
+    logged with that stack when the loop resumes and its duration is known.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._last_beat = 0.0
+        # (heartbeat the stall followed, formatted stack of the loop thread)
+        self._stall_stack: Optional[Tuple[float, str]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop. Called from the app lifespan."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            previous, self._last_beat = self._last_beat, now
+            lag = max(now - previous - self.interval, 0.0)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if lag < self.threshold:
+                continue
+
+            EVENT_LOOP_STALLS.inc()
+            stall_stack, self._stall_stack = self._stall_stack, None
+            if stall_stack is not None and stall_stack[0] == previous:
+                logger.warning(
+                    f"Event loop blocked for {lag * 1000:.0f} ms in:\n"
+                    f"{stall_stack[1]}"
+                )
+            else:
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            beat = self._last_beat
+            if time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            if self._stall_stack is not None and self._stall_stack[0] == beat:
+                # Already captured for this stall
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._stall_stack = (beat, "".join(traceback.format_stack(frame)))
+
+
+loop_monitor = LoopMonitor(env.LOOP_MONITOR_INTERVAL, env.LOOP_STALL_THRESHOLD_SECONDS)
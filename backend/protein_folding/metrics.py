@@ -0,0 +1,238 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from protein_folding.storage import data_path
+
+# prometheus_client picks its value storage when first imported: with a
+# multiprocess directory set, every uvicorn worker writes its samples to
+# memory-mapped files there and /metrics aggregates all of them. `invoke serve`
+# empties the directory before starting the workers
+MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", data_path("prometheus")
+)
+os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send  # noqa: E402
+
+METRICS_MEDIA_TYPE = CONTENT_TYPE_LATEST
+
+# Upstream folds run from about a second (ESMFold) to many minutes (Boltz-2)
+UPSTREAM_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# In-process CPU work: parsing and serializing structures
+CPU_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HTTP_REQUESTS = Counter(
+    "pomelo_http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "pomelo_http_request_duration_seconds",
+    "Time from receiving a request to sending the end of its response",
+    ["method", "route"],
+    buckets=REQUEST_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "pomelo_http_requests_in_progress",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum",
+)
+SERIALIZATION_SECONDS = Histogram(
+    "pomelo_response_serialization_seconds",
+    "Time spent encoding fold responses; compare with the request duration",
+    ["endpoint", "format"],
+    buckets=CPU_BUCKETS,
+)
+ERRORS = Counter(
+    "pomelo_errors_total",
+    "Errors reported to clients, by exception class",
+    ["exception"],
+)
+CLIENT_DISCONNECTS = Counter(
+    "pomelo_client_disconnects_total",
+    "Requests abandoned by their client before the response",
+    ["route"],
+)
+
+UPSTREAM_SECONDS = Histogram(
+    "pomelo_upstream_duration_seconds",
+    "Upstream fold latency, including NVCF polling",
+    ["model", "outcome"],
+    buckets=UPSTREAM_BUCKETS,
+)
+UPSTREAM_IN_PROGRESS = Gauge(
+    "pomelo_upstream_in_progress",
+    "Upstream folds in flight",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+NVCF_POLLS = Histogram(
+    "pomelo_nvcf_polls",
+    "NVCF status polls per call",
+    ["model"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+NVCF_WAIT_SECONDS = Histogram(
+    "pomelo_nvcf_wait_seconds",
+    "Time an NVCF call slept between polls",
+    ["model"],
+    buckets=UPSTREAM_BUCKETS,
+)
+NVCF_TRANSIENT_ERRORS = Counter(
+    "pomelo_nvcf_transient_errors_total",
+    "NVCF status polls that failed and were retried",
+    ["model"],
+)
+UPSTREAM_RETRIES = Counter(
+    "pomelo_upstream_retries_total",
+    "Upstream requests repeated after a transient failure, by failure",
+    ["endpoint", "reason"],
+)
+UPSTREAM_HEDGES = Counter(
+    "pomelo_upstream_hedges_total",
+    "Hedged upstream requests: sent, won (answered first) or skipped (no token)",
+    ["endpoint", "outcome"],
+)
+CIRCUIT_STATE = Gauge(
+    "pomelo_circuit_state",
+    "Circuit breaker state of the worst worker: 0 closed, 1 half-open, 2 open",
+    ["endpoint"],
+    multiprocess_mode="livemax",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "pomelo_circuit_transitions_total",
+    "Circuit breaker state changes, by new state",
+    ["endpoint", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "pomelo_circuit_rejections_total",
+    "Requests refused without calling upstream while the circuit was open",
+    ["endpoint"],
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "pomelo_scheduler_wait_seconds",
+    "Time folds waited for their turn in the scheduler, by lane",
+    ["lane"],
+    buckets=REQUEST_BUCKETS,
+)
+SCHEDULER_QUEUED = Gauge(
+    "pomelo_scheduler_queued",
+    "Folds waiting for their turn in the scheduler, by lane",
+    ["lane"],
+    multiprocess_mode="livesum",
+)
+SCHEDULER_COST_IN_FLIGHT = Gauge(
+    "pomelo_scheduler_cost_in_flight",
+    "Estimated cost of the folds running upstream, by lane",
+    ["lane"],
+    multiprocess_mode="livesum",
+)
+SCHEDULER_REJECTED = Counter(
+    "pomelo_scheduler_rejected_total",
+    "Folds refused because their client had too many queued, by lane",
+    ["lane"],
+)
+ARTIFACTS_STORED = Counter(
+    "pomelo_artifacts_stored_total",
+    "Structures stored as artifacts: new files, or existing ones reused",
+    ["outcome"],
+)
+ANALYSIS_SECONDS = Histogram(
+    "pomelo_structure_analysis_seconds",
+    "Time spent analyzing structures missing from the cache, by format",
+    ["format"],
+    buckets=REQUEST_BUCKETS,
+)
+PARSE_SECONDS = Histogram(
+    "pomelo_structure_parse_seconds",
+    "Time to parse a structure and compute its pLDDT",
+    ["format"],
+    buckets=CPU_BUCKETS,
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "pomelo_event_loop_lag_seconds",
+    "How late the event loop ran the lag monitor's heartbeat",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_STALLS = Counter(
+    "pomelo_event_loop_stalls_total",
+    "Heartbeats late by more than LOOP_STALL_THRESHOLD_SECONDS",
+)
+
+
+def mark_worker_stopped() -> None:
+    """Drop this worker's live gauges. Called from the app lifespan."""
+    multiprocess.mark_process_dead(os.getpid(), MULTIPROC_DIR)
+
+
+def render_metrics() -> bytes:
+    """Metrics of every worker in the Prometheus text format."""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, MULTIPROC_DIR)
+    return generate_latest(registry)
+
+
+def record_error(error: Exception) -> None:
+    ERRORS.labels(type(error).__name__).inc()
+
+
+@contextmanager
+def track_upstream(model: str) -> Iterator[None]:
+    """Time an upstream fold and count it as in flight while it runs."""
+    outcome = "error"
+    UPSTREAM_IN_PROGRESS.labels(model).inc()
+    start = time.perf_counter()
+    try:
+        yield
+        outcome = "success"
+    finally:
+        UPSTREAM_IN_PROGRESS.labels(model).dec()
+        UPSTREAM_SECONDS.labels(model, outcome).observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """Count and time HTTP requests by route template and status code."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            # Routing stores the matched route in the scope; label by its
+            # template so ids in paths do not create new series
+            route = scope.get("route")
+            path = getattr(route, "path", "other")
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
+            HTTP_REQUEST_SECONDS.labels(method, path).observe(
+                time.perf_counter() - start
+            )
@@ -1,6 +1,12 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
+# Longest sequence accepted by the folding endpoints
+MAX_SEQUENCE_LENGTH = 10000
+# Longest structure text accepted by the analysis endpoint: 16 MB of ASCII,
+# room for ANALYSIS_MAX_RESIDUES residues of an all-atom PDB
+MAX_STRUCTURE_LENGTH = 16 * 1024 * 1024
+
 
 class EsmfoldRequest(BaseModel):
     """Request model for ESMFold protein folding."""
@@ -9,14 +15,35 @@ class EsmfoldRequest(BaseModel):
         ...,
         description="Protein sequence using single-letter amino acid codes",
         min_length=1,
-        max_length=10000,  # Reasonable limit for ESMFold
+        max_length=MAX_SEQUENCE_LENGTH,  # Reasonable limit for ESMFold
+    )
+
+
+class EsmfoldBatchRecord(EsmfoldRequest):
+    """A single sequence of an ESMFold batch."""
+
+    id: Optional[str] = Field(
+        None, description="Record identifier, e.g. the FASTA header", max_length=200
+    )
+
+
+class EsmfoldBatchRequest(BaseModel):
+    """Request model for batch ESMFold protein folding."""
+
+    records: List[EsmfoldBatchRecord] = Field(
+        ..., description="Sequences to fold", min_length=1
     )
 
 
 class EsmfoldResult(BaseModel):
     """Model for ESMFold API response data."""
 
-    pdb: str = Field(..., description="List of PDB structures")
+    pdb: Optional[str] = Field(
+        ..., description="PDB structure, null when sent as an artifact URL"
+    )
+    pdb_url: Optional[str] = Field(
+        None, description="URL of the PDB structure artifact, see ?structure=url"
+    )
     plddt: List[float] = Field(
         ..., description="Predicted Local Distance Difference Test (pLDDT) scores"
     )
@@ -28,6 +55,20 @@ class EsmfoldResponse(BaseModel):
     results: List[EsmfoldResult] = Field(..., description="ESMFold Results")
 
 
+class EsmfoldBatchItem(BaseModel):
+    """One NDJSON line of a streamed ESMFold batch response."""
+
+    index: int = Field(..., description="Position of the record in the request")
+    id: Optional[str] = Field(None, description="Record identifier")
+    result: Optional[EsmfoldResult] = Field(
+        None, description="ESMFold result if the record folded successfully"
+    )
+    error: Optional[str] = Field(None, description="Error message for the record")
+    status_code: Optional[int] = Field(
+        None, description="HTTP status code describing the record's error"
+    )
+
+
 class Boltz2Request(BaseModel):
     """Request model for Boltz-2."""
 
@@ -35,7 +76,7 @@ class Boltz2Request(BaseModel):
         ...,
         description="Protein sequence using single-letter amino acid codes",
         min_length=1,
-        max_length=10000,
+        max_length=MAX_SEQUENCE_LENGTH,
     )
 
     ligand_smiles: Optional[str] = Field(
@@ -56,14 +97,35 @@ class Boltz2Request(BaseModel):
 
 
 class Boltz2Result(BaseModel):
-    """Model for Boltz-2 API response data."""
+    """Model for Boltz-2 API response data: one diffusion sample."""
+
+    mmcif_string: Optional[str] = Field(
+        ..., description="mmCIF structure string, null when sent as an artifact URL"
+    )
+    mmcif_url: Optional[str] = Field(
+        None, description="URL of the mmCIF structure artifact, see ?structure=url"
+    )
 
-    mmcif_string: str = Field(..., description="mmCIF structure string")
+    sample_index: int = Field(
+        0, description="Position of the sample in the upstream response"
+    )
+
+    rank: int = Field(
+        1, description="Rank of the sample by confidence score, 1 being the best"
+    )
+
+    confidence_score: Optional[float] = Field(
+        None, description="Confidence score of this sample"
+    )
 
     plddt: List[float] = Field(
         ..., description="Predicted Local Distance Difference Test (pLDDT) scores"
     )
 
+    chain_plddt: Dict[str, List[float]] = Field(
+        default_factory=dict, description="Per-residue pLDDT scores of each chain"
+    )
+
     confidence_scores: List[float] = Field(
         ..., description="Overall confidence scores for each structure"
     )
@@ -72,4 +134,211 @@ class Boltz2Result(BaseModel):
 class Boltz2Response(BaseModel):
     """Response model for Boltz-2."""
 
-    results: List[Boltz2Result] = Field(..., description="Boltz-2 Results")
+    results: List[Boltz2Result] = Field(
+        ..., description="Boltz-2 Results, one per diffusion sample, best first"
+    )
+
+
+class Boltz2StreamItem(BaseModel):
+    """One NDJSON line of a streamed Boltz-2 response."""
+
+    result: Optional[Boltz2Result] = Field(
+        None, description="A diffusion sample, sent as soon as it is parsed"
+    )
+    error: Optional[str] = Field(None, description="Error message ending the stream")
+    status_code: Optional[int] = Field(
+        None, description="HTTP status code describing the error"
+    )
+
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class Boltz2JobResponse(BaseModel):
+    """Status of a background Boltz-2 job."""
+
+    job_id: str = Field(..., description="Job identifier")
+    status: JobStatus = Field(..., description="Job status")
+    created_at: float = Field(..., description="Submission time (Unix seconds)")
+    updated_at: float = Field(..., description="Last update time (Unix seconds)")
+    progress: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Latest upstream progress, e.g. stage and poll count",
+    )
+    result: Optional[Boltz2Response] = Field(
+        None, description="Boltz-2 results once the job has succeeded"
+    )
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    error_status_code: Optional[int] = Field(
+        None, description="HTTP status code describing the failure"
+    )
+
+
+class StructureAnalysisRequest(BaseModel):
+    """Request model for analyzing a structure."""
+
+    structure: str = Field(
+        ...,
+        description="PDB or mmCIF text",
+        min_length=1,
+        max_length=MAX_STRUCTURE_LENGTH,
+    )
+    format: Literal["pdb", "mmcif"] = Field("pdb", description="Structure format")
+
+
+class PlddtSummary(BaseModel):
+    """Statistics of per-residue pLDDT scores."""
+
+    scored: int = Field(..., description="Residues with a pLDDT score")
+    mean: Optional[float] = Field(None, description="Mean pLDDT")
+    median: Optional[float] = Field(None, description="Median pLDDT")
+    min: Optional[float] = Field(None, description="Lowest pLDDT")
+    max: Optional[float] = Field(None, description="Highest pLDDT")
+    bands: Dict[str, int] = Field(
+        ...,
+        description=(
+            "Residues per confidence band: very_low (<50), low (50-70), "
+            "confident (70-90) and very_high (>=90)"
+        ),
+    )
+
+
+class ChainAnalysis(BaseModel):
+    """Analysis of one chain."""
+
+    chain_id: str = Field(..., description="Chain identifier")
+    residues: int = Field(..., description="Residues with a C-alpha atom")
+    radius_of_gyration: Optional[float] = Field(
+        None, description="C-alpha radius of gyration in Angstrom"
+    )
+    plddt: PlddtSummary = Field(..., description="pLDDT statistics of the chain")
+
+
+class LowConfidenceSegment(BaseModel):
+    """A run of consecutive residues of one chain with pLDDT below 70."""
+
+    chain_id: str = Field(..., description="Chain identifier")
+    start: int = Field(..., description="Residue number of the first residue")
+    end: int = Field(..., description="Residue number of the last residue")
+    start_index: int = Field(..., description="Index of the first residue")
+    length: int = Field(..., description="Number of residues")
+    mean_plddt: Optional[float] = Field(None, description="Mean pLDDT")
+
+
+class AnalysisMaps(BaseModel):
+    """Layout of the distance and contact maps."""
+
+    size: int = Field(..., description="Cells per side of each map")
+    bin_size: int = Field(..., description="Residues per cell along each side")
+    distance_step: float = Field(
+        ..., description="Angstrom per distance map unit; 255 means at least 255"
+    )
+    contact_distance: float = Field(
+        ..., description="C-alpha distance in Angstrom below which residues touch"
+    )
+    contact_min_separation: int = Field(
+        ..., description="Residues of one chain closer in sequence are no contact"
+    )
+
+
+class EncodedArray(BaseModel):
+    """A NumPy array as base64 of its little-endian bytes."""
+
+    dtype: str = Field(..., description="NumPy dtype name, e.g. uint8")
+    shape: List[int] = Field(..., description="Array shape")
+    data: str = Field(..., description="Base64 of the array bytes, row-major")
+
+
+class StructureAnalysisResponse(BaseModel):
+    """Vectorized analysis of a structure, computed once per structure."""
+
+    residues: int = Field(..., description="Residues with a C-alpha atom")
+    radius_of_gyration: Optional[float] = Field(
+        None, description="C-alpha radius of gyration in Angstrom"
+    )
+    plddt: PlddtSummary = Field(..., description="pLDDT statistics")
+    chains: List[ChainAnalysis] = Field(..., description="Chains in file order")
+    low_confidence_segments: List[LowConfidenceSegment] = Field(
+        ..., description="Segments of at least 3 residues with pLDDT below 70"
+    )
+    contacts: int = Field(..., description="Residue pairs in contact")
+    chain_ids: List[str] = Field(..., description="Chains indexed by chain_index")
+    maps: AnalysisMaps = Field(..., description="Layout of the maps")
+    arrays: Optional[Dict[str, EncodedArray]] = Field(
+        None,
+        description=(
+            "With ?arrays=true: distance_map, contact_map (rows of packed "
+            "bits), plddt, contact_counts, res_seq and chain_index"
+        ),
+    )
+
+
+class CacheStatsResponse(BaseModel):
+    """Fold cache counters for the serving worker."""
+
+    memory_hits: int = Field(..., description="Hits served from the memory tier")
+    disk_hits: int = Field(..., description="Hits served from the disk tier")
+    misses: int = Field(..., description="Lookups not found in either tier")
+    memory_entries: int = Field(..., description="Entries in the memory tier")
+    memory_bytes: int = Field(..., description="Bytes held by the memory tier")
+    memory_evictions: int = Field(..., description="Size-based memory evictions")
+    disk_entries: int = Field(..., description="Entries in the shared disk tier")
+
+
+class CachePurgeResponse(BaseModel):
+    """Response model for purging fold cache entries."""
+
+    purged: int = Field(..., description="Number of disk entries removed")
+
+
+class QuotaBudget(BaseModel):
+    """Upstream request budget of one model, shared by all workers."""
+
+    rate_per_minute: float = Field(
+        ..., description="Sustained upstream requests per minute"
+    )
+    burst: int = Field(..., description="Requests that may be sent back to back")
+    available: float = Field(..., description="Requests that can be sent right now")
+    backlog: float = Field(
+        ...,
+        description="Tokens owed to queued requests, or to a pause after an "
+        "upstream 429",
+    )
+    max_wait_seconds: float = Field(
+        ..., description="Longest a request queues before being rejected with a 429"
+    )
+    granted: int = Field(..., description="Requests granted a token")
+    rejected: int = Field(..., description="Requests rejected with a 429")
+
+
+class QuotaResponse(BaseModel):
+    """Response model for upstream quota usage."""
+
+    enabled: bool = Field(..., description="Whether upstream rate limiting is on")
+    budgets: Dict[str, QuotaBudget] = Field(..., description="Budgets by model")
+
+
+class TraceSpan(BaseModel):
+    """One timed step of a request trace."""
+
+    name: str = Field(..., description="Step name, e.g. upstream or nvcf.poll")
+    span_id: str = Field(..., description="Span identifier")
+    parent_id: Optional[str] = Field(None, description="Enclosing span, if any")
+    start: float = Field(..., description="Start time (Unix seconds)")
+    duration_ms: Optional[float] = Field(
+        None, description="Duration in milliseconds; null while still running"
+    )
+    attributes: Dict[str, Any] = Field(
+        default_factory=dict, description="Details of the step"
+    )
+    error: Optional[str] = Field(None, description="Exception class if it failed")
+
+
+class TraceResponse(BaseModel):
+    """A recorded request trace."""
+
+    trace_id: str = Field(..., description="Trace identifier, sent as X-Trace-Id")
+    name: str = Field(..., description="Root span name")
+    start: float = Field(..., description="Start time (Unix seconds)")
+    duration_ms: Optional[float] = Field(None, description="Total duration")
+    spans: List[TraceSpan] = Field(..., description="Spans in start order")
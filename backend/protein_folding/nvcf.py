@@ -0,0 +1,344 @@
+import asyncio
+import io
+import json
+import logging
+import random
+import time
+import zipfile
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+import httpx
+
+from config import check_env_vars
+from protein_folding.exceptions import (
+    ProteinFoldingAPIError,
+    ProteinFoldingCancelledError,
+    ProteinFoldingTimeoutError,
+)
+from protein_folding.http_client import get_client, get_timeout
+from protein_folding.metrics import (
+    NVCF_POLLS,
+    NVCF_TRANSIENT_ERRORS,
+    NVCF_WAIT_SECONDS,
+)
+from protein_folding.ratelimit import upstream_limiter
+from protein_folding.resilience import upstream_resilience
+from protein_folding.tracing import span
+
+# Global configuration
+env = check_env_vars()
+
+# NVCF holds a request for at most this long before answering 202
+MAX_POLL_SECONDS = 300
+# Extra read time allowed on top of the long-poll hold
+LONG_POLL_GRACE_SECONDS = 30.0
+
+# Poll responses worth retrying until the deadline; anything else not 200,
+# 202 or 302 fails the call
+TRANSIENT_STATUSES = (408, 429, 502, 503, 504)
+
+# Receives progress updates such as {"stage": "polling", "poll_count": 3}
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class PollPolicy:
+    """Timing of NVCF status polls: long-poll hold, backoff and deadline."""
+
+    def __init__(
+        self,
+        poll_seconds: int,
+        initial_delay: float,
+        max_delay: float,
+        multiplier: float,
+        jitter: float,
+        deadline_seconds: float,
+    ):
+        self.poll_seconds = max(0, min(poll_seconds, MAX_POLL_SECONDS))
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline_seconds = deadline_seconds
+
+    @classmethod
+    def from_env(cls) -> "PollPolicy":
+        return cls(
+            poll_seconds=env.NVCF_POLL_SECONDS,
+            initial_delay=env.NVCF_POLL_INITIAL_DELAY,
+            max_delay=env.NVCF_POLL_MAX_DELAY,
+            multiplier=env.NVCF_POLL_MULTIPLIER,
+            jitter=env.NVCF_POLL_JITTER,
+            deadline_seconds=env.NVCF_DEADLINE_SECONDS,
+        )
+
+    def delay(self, attempt: int) -> float:
+        """
+        Minimum spacing between the start of poll `attempt` and the next one.
+
+        Grows exponentially from `initial_delay` up to `max_delay`, and is
+        shortened by up to `jitter` (a fraction) so that jobs submitted
+        together do not poll in lockstep.
+        """
+        delay = min(self.max_delay, self.initial_delay * self.multiplier**attempt)
+        return delay * (1 - self.jitter * random.random())
+
+
+class PollStats:
+    """Per-call polling metrics, reported with progress updates and logged."""
+
+    def __init__(self):
+        self.request_id: Optional[str] = None
+        self.polls = 0
+        self.transient_errors = 0
+        # Time spent sleeping between polls, not waiting on responses
+        self.wait_seconds = 0.0
+        self.percent_complete: Optional[float] = None
+        self._started = time.monotonic()
+        self.elapsed_seconds = 0.0
+
+    def tick(self) -> None:
+        self.elapsed_seconds = time.monotonic() - self._started
+
+    def as_progress(self) -> Dict[str, Any]:
+        progress = {
+            "stage": "polling",
+            "poll_count": self.polls,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+        if self.percent_complete is not None:
+            progress["percent_complete"] = self.percent_complete
+        return progress
+
+    def __repr__(self) -> str:
+        return (
+            f"PollStats(request_id={self.request_id!r}, polls={self.polls}, "
+            f"transient_errors={self.transient_errors}, "
+            f"wait_seconds={self.wait_seconds:.2f}, "
+            f"elapsed_seconds={self.elapsed_seconds:.2f})"
+        )
+
+
+async def _unless_cancelled(
+    awaitable: Awaitable[Any], cancel: Optional[asyncio.Event]
+) -> Any:
+    """Await `awaitable`, abandoning it as soon as `cancel` is set."""
+    if cancel is None:
+        return await awaitable
+    if cancel.is_set():
+        raise ProteinFoldingCancelledError()
+
+    task = asyncio.ensure_future(awaitable)
+    cancelled = asyncio.ensure_future(cancel.wait())
+    try:
+        await asyncio.wait((task, cancelled), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        cancelled.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.wait((task,))
+    if task.cancelled():
+        raise ProteinFoldingCancelledError()
+    return task.result()
+
+
+async def _sleep(seconds: float, cancel: Optional[asyncio.Event]) -> None:
+    if cancel is None:
+        await asyncio.sleep(seconds)
+        return
+    try:
+        await asyncio.wait_for(cancel.wait(), timeout=seconds)
+    except TimeoutError:
+        return
+    raise ProteinFoldingCancelledError()
+
+
+def _percent_complete(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["nvcf-percent-complete"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _decode_result(body: bytes) -> Dict[str, Any]:
+    """Parse a redirected NVCF result, which may be JSON or a zip holding it."""
+    if body.startswith(b"PK"):
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            names = [name for name in archive.namelist() if not name.endswith("/")]
+            if not names:
+                raise ValueError("Empty result archive")
+            body = archive.read(names[0])
+    return json.loads(body)
+
+
+async def _redirected_result(
+    client: httpx.AsyncClient, response: httpx.Response, service: str
+) -> Dict[str, Any]:
+    """Download a large result NVCF answered with a 302 to a presigned URL."""
+    location = response.headers.get("location")
+    if not location:
+        raise ProteinFoldingAPIError("NVCF redirect without a location", 502)
+    # The URL is presigned, so the API key is not sent to another host
+    result = await client.get(location, timeout=get_timeout(service))
+    result.raise_for_status()
+    try:
+        return await asyncio.to_thread(_decode_result, result.content)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise ProteinFoldingAPIError(f"Unreadable NVCF result: {e}", 502)
+
+
+async def call_nvcf(
+    invoke_url: str,
+    status_url: str,
+    payload: Dict[str, Any],
+    headers: Mapping[str, str],
+    service: str,
+    policy: Optional[PollPolicy] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[asyncio.Event] = None,
+) -> Tuple[Dict[str, Any], PollStats]:
+    """
+    Invoke an NVIDIA Cloud Function and poll until its result is ready.
+
+    Every request asks NVCF to hold it for up to `policy.poll_seconds`
+    (NVCF-POLL-SECONDS) before answering 202, so results are normally picked
+    up as soon as they exist. When NVCF answers sooner, the next poll waits
+    out a jittered exponential backoff measured from the start of the
+    previous request. 302 responses are followed to the presigned result.
+
+    Args:
+        invoke_url: Function invocation URL
+        status_url: Status URL with a `{task_id}` placeholder
+        payload: JSON request body
+        headers: Request headers, including authorization
+        service: Upstream service name, for timeouts, messages, its rate
+            limit and its circuit breaker
+        policy: Polling policy, from the environment by default
+        progress: Optional coroutine receiving polling updates
+        cancel: Optional event; setting it stops the call between or during
+            requests
+
+    Returns:
+        The JSON result and the polling metrics of the call
+
+    Raises:
+        ProteinFoldingAPIError: If NVCF answers with a non-transient error
+        ProteinFoldingTimeoutError: If no result arrives within the deadline
+        ProteinFoldingCancelledError: If `cancel` is set before a result arrives
+        ProteinFoldingCircuitOpenError: If the service's circuit is open
+        ProteinFoldingRateLimitError: If no rate limit token frees up for an
+            invocation attempt
+        httpx.HTTPError: If the invocation request itself fails, after retries
+    """
+    policy = policy or PollPolicy.from_env()
+    stats = PollStats()
+    client = get_client()
+    headers = {**headers, "NVCF-POLL-SECONDS": str(policy.poll_seconds)}
+    poll_timeout = httpx.Timeout(
+        policy.poll_seconds + LONG_POLL_GRACE_SECONDS,
+        connect=env.UPSTREAM_CONNECT_TIMEOUT,
+    )
+
+    try:
+        async with asyncio.timeout(policy.deadline_seconds):
+            poll_started = time.monotonic()
+
+            async def invoke() -> httpx.Response:
+                # Every attempt takes a token; polls of the job it starts do not
+                async with upstream_limiter.acquire(service):
+                    with span("nvcf.invoke", service=service) as invoke_span:
+                        response = await client.post(
+                            invoke_url,
+                            json=payload,
+                            headers=headers,
+                            timeout=get_timeout(service),
+                        )
+                        invoke_span.set(status=response.status_code)
+                    if response.status_code in (200, 202, 302) or (
+                        "nvcf-reqid" in response.headers
+                    ):
+                        return response
+                    # Not accepted: raised here so that the resilience layer
+                    # can retry it and an upstream 429 drains the rate limit;
+                    # an invocation creates a job, so it is only repeated when
+                    # NVCF cannot have started one
+                    raise ProteinFoldingAPIError(
+                        f"{service} API error: "
+                        f"{response.status_code} - {response.text}",
+                        response.status_code,
+                    )
+
+            response = await _unless_cancelled(
+                upstream_resilience.call(service, invoke, idempotent=False), cancel
+            )
+            stats.request_id = response.headers.get("nvcf-reqid")
+
+            while True:
+                stats.tick()
+                if response is not None:
+                    status = response.status_code
+                    if status == 200:
+                        return response.json(), stats
+                    if status == 302:
+                        result = await _unless_cancelled(
+                            _redirected_result(client, response, service), cancel
+                        )
+                        return result, stats
+                    if status == 202:
+                        stats.request_id = (
+                            response.headers.get("nvcf-reqid") or stats.request_id
+                        )
+                        stats.percent_complete = _percent_complete(response)
+                    elif status in TRANSIENT_STATUSES and stats.request_id:
+                        stats.transient_errors += 1
+                    else:
+                        raise ProteinFoldingAPIError(
+                            f"{service} API error: {status} - {response.text}", status
+                        )
+                if not stats.request_id:
+                    raise ProteinFoldingAPIError(
+                        f"{service} API accepted the request without an id", 502
+                    )
+
+                if progress is not None:
+                    await progress(stats.as_progress())
+
+                with span("nvcf.poll", attempt=stats.polls + 1) as poll_span:
+                    # Time NVCF held the last request counts toward the backoff
+                    delay = policy.delay(stats.polls) - (
+                        time.monotonic() - poll_started
+                    )
+                    if delay > 0:
+                        await _sleep(delay, cancel)
+                        stats.wait_seconds += delay
+                        poll_span.set(backoff_seconds=round(delay, 3))
+
+                    poll_started = time.monotonic()
+                    stats.polls += 1
+                    try:
+                        response = await _unless_cancelled(
+                            client.get(
+                                status_url.format(task_id=stats.request_id),
+                                headers=headers,
+                                timeout=poll_timeout,
+                            ),
+                            cancel,
+                        )
+                        poll_span.set(status=response.status_code)
+                    except (httpx.TimeoutException, httpx.NetworkError) as e:
+                        # The job keeps running upstream; try again after a backoff
+                        logging.warning(f"{service} status poll failed: {e!r}")
+                        stats.transient_errors += 1
+                        poll_span.set(transient_error=type(e).__name__)
+                        response = None
+    except TimeoutError:
+        stats.tick()
+        raise ProteinFoldingTimeoutError(
+            f"{service} did not finish within {policy.deadline_seconds:g} seconds"
+        )
+    finally:
+        stats.tick()
+        logging.info(f"{service} NVCF call finished: {stats}")
+        NVCF_POLLS.labels(service).observe(stats.polls)
+        NVCF_WAIT_SECONDS.labels(service).observe(stats.wait_seconds)
+        NVCF_TRANSIENT_ERRORS.labels(service).inc(stats.transient_errors)
@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Literal, Optional, TypeVar
+
+from config import check_env_vars
+
+# Global configuration
+env = check_env_vars()
+
+T = TypeVar("T")
+
+
+class Offloader:
+    """
+    Run CPU-heavy steps off the event loop once their input is large.
+
+    Below `min_bytes` of input a step runs inline: handing it to another
+    thread would cost more than it saves. Above, it runs on a pool of
+    `workers` threads or processes. Processes parse in parallel instead of
+    taking turns on the GIL, but their arguments and results are pickled;
+    they are started on first use with "spawn", as forking a uvicorn worker
+    would copy the locks of its running threads.
+    """
+
+    def __init__(
+        self, kind: Literal["thread", "process"], workers: int, min_bytes: int
+    ):
+        self.kind = kind
+        self.workers = workers
+        self.min_bytes = min_bytes
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self, in_process: bool) -> Executor:
+        if in_process and self.kind == "process":
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="offload"
+            )
+        return self._threads
+
+    async def run(
+        self, fn: Callable[..., T], *args: Any, size: int, in_process: bool = True
+    ) -> T:
+        """
+        Call `fn(*args)`, offloading it if `size` reaches the threshold.
+
+        Args:
+            fn: The CPU-bound function; for processes, a picklable module-level
+                function with picklable arguments and result
+            size: Size of the input in bytes, e.g. the length of a structure
+            in_process: Whether a process pool may run `fn`. Pass False when
+                moving the arguments to another process costs about as much
+                as the work itself
+
+        Returns:
+            The result of `fn`
+        """
+        if size < self.min_bytes:
+            return fn(*args)
+
+        executor = self._executor(in_process)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory): start a new pool
+            # for the next call instead of failing every call from now on
+            if self._processes is executor:
+                self._processes = None
+                executor.shutdown(wait=False)
+            raise
+
+    def close(self) -> None:
+        for executor in (self._threads, self._processes):
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+
+
+offloader = Offloader(env.OFFLOAD_EXECUTOR, env.OFFLOAD_WORKERS, env.OFFLOAD_MIN_BYTES)
@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+
+from config import check_env_vars
+from protein_folding.exceptions import (
+    ProteinFoldingAPIError,
+    ProteinFoldingRateLimitError,
+)
+from protein_folding.storage import data_path, open_sqlite
+from protein_folding.tracing import span
+
+# Global configuration
+env = check_env_vars()
+
+
+def _upstream_status(error: Exception) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    return getattr(error, "status_code", None)
+
+
+class Budget:
+    """A token bucket: `rate_per_minute` refill, holding at most `burst` tokens."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+
+    @property
+    def rate(self) -> float:
+        return self.rate_per_minute / 60
+
+
+class TokenBuckets:
+    """
+    Token buckets in SQLite, shared by every uvicorn worker process.
+
+    A caller that finds the bucket empty reserves the next token ahead of
+    time: the token count goes negative and the caller sleeps until it would
+    have refilled. Waiters are therefore served in order across workers
+    without polling, and a reservation is only refused when its wait would
+    exceed the maximum.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    granted INTEGER NOT NULL DEFAULT 0,
+                    rejected INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold this process's lock and a SQLite write lock for the block."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _refilled(
+        self, conn: sqlite3.Connection, name: str, budget: Budget, now: float
+    ) -> float:
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, budget.burst, now),
+            )
+            return budget.burst
+        tokens, updated_at = row
+        return min(budget.burst, tokens + max(0.0, now - updated_at) * budget.rate)
+
+    def reserve(self, name: str, budget: Budget, max_wait: float) -> Optional[float]:
+        """
+        Take a token from bucket `name`, possibly one that refills later.
+
+        Returns:
+            Seconds to wait before using the token, or None if that wait would
+            exceed `max_wait` (no token is taken then)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            tokens = self._refilled(conn, name, budget, now) - 1
+            wait = max(0.0, -tokens / budget.rate) if budget.rate > 0 else None
+            if wait is None or wait > max_wait:
+                conn.execute(
+                    "UPDATE rate_buckets SET rejected = rejected + 1 WHERE name = ?",
+                    (name,),
+                )
+                return None
+            conn.execute(
+                "UPDATE rate_buckets "
+                "SET tokens = ?, updated_at = ?, granted = granted + 1 "
+                "WHERE name = ?",
+                (tokens, now, name),
+            )
+            return wait
+
+    def refund(self, name: str, budget: Budget) -> None:
+        """Return an unused token, e.g. when its caller gave up waiting."""
+        now = time.time()
+        with self._transaction() as conn:
+            tokens = min(budget.burst, self._refilled(conn, name, budget, now) + 1)
+            conn.execute(
+                "UPDATE rate_buckets "
+                "SET tokens = ?, updated_at = ?, granted = granted - 1 "
+                "WHERE name = ?",
+                (tokens, now, name),
+            )
+
+    def drain(self, name: str, budget: Budget, seconds: float) -> None:
+        """Empty bucket `name` so that no token is available for `seconds`."""
+        now = time.time()
+        with self._transaction() as conn:
+            tokens = min(
+                self._refilled(conn, name, budget, now), -seconds * budget.rate
+            )
+            conn.execute(
+                "UPDATE rate_buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+                (tokens, now, name),
+            )
+
+    def usage(self, name: str, budget: Budget) -> Dict[str, float]:
+        """Current tokens and counters of bucket `name`, without taking a token."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT tokens, updated_at, granted, rejected FROM rate_buckets "
+                "WHERE name = ?",
+                (name,),
+            ).fetchone()
+        if row is None:
+            return {"tokens": budget.burst, "granted": 0, "rejected": 0}
+        tokens, updated_at, granted, rejected = row
+        tokens = min(budget.burst, tokens + max(0.0, now - updated_at) * budget.rate)
+        return {"tokens": tokens, "granted": granted, "rejected": rejected}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class UpstreamRateLimiter:
+    """
+    Per-model request budgets for the upstream NVIDIA API, shared by all workers.
+
+    Callers queue for up to `max_wait` seconds before being turned away with a
+    429. An upstream 429 empties the model's bucket for
+    RATE_LIMIT_UPSTREAM_BACKOFF_SECONDS, so every worker backs off together
+    instead of each running into the limit on its own.
+    """
+
+    def __init__(
+        self,
+        buckets: TokenBuckets,
+        budgets: Dict[str, Budget],
+        max_wait: float,
+        enabled: bool = True,
+    ):
+        self.buckets = buckets
+        self.budgets = budgets
+        self.max_wait = max_wait
+        self.enabled = enabled
+
+    @asynccontextmanager
+    async def acquire(
+        self, model: str, max_wait: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """
+        Wait for a request token for `model`, then run the body.
+
+        Args:
+            model: Upstream model name
+            max_wait: Longest wait for a token, the limiter's by default
+
+        Raises:
+            ProteinFoldingRateLimitError: If no token frees up within the
+                maximum wait
+        """
+        if not self.enabled:
+            yield
+            return
+
+        budget = self.budgets[model]
+        with span("rate_limit", model=model) as wait_span:
+            if max_wait is None:
+                max_wait = self.max_wait
+            reservation = asyncio.ensure_future(
+                asyncio.to_thread(self.buckets.reserve, model, budget, max_wait)
+            )
+            try:
+                wait = await asyncio.shield(reservation)
+                if wait is None:
+                    retry_after = await self.retry_after(model)
+                    logging.warning(
+                        f"{model} rate limit reached, retry in {retry_after:.1f}s"
+                    )
+                    raise ProteinFoldingRateLimitError(
+                        f"{model} is at its request limit, please retry later",
+                        retry_after,
+                    )
+                wait_span.set(wait_seconds=round(wait, 3))
+                if wait > 0:
+                    logging.info(
+                        f"Queued {model} request for {wait:.2f}s by the rate limit"
+                    )
+                    await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Also when cancelled while the token was being taken
+                await asyncio.shield(self._refund(reservation, model, budget))
+                raise
+
+        try:
+            yield
+        except (ProteinFoldingAPIError, httpx.HTTPStatusError) as e:
+            if _upstream_status(e) == 429:
+                backoff = env.RATE_LIMIT_UPSTREAM_BACKOFF_SECONDS
+                logging.warning(f"Upstream rate limited {model}, pausing {backoff}s")
+                await asyncio.to_thread(self.buckets.drain, model, budget, backoff)
+            raise
+
+    async def _refund(
+        self, reservation: "asyncio.Future[Optional[float]]", model: str, budget: Budget
+    ) -> None:
+        """Return the token `reservation` took, if it took one."""
+        if await reservation is not None:
+            await asyncio.to_thread(self.buckets.refund, model, budget)
+
+    async def retry_after(self, model: str) -> float:
+        """Seconds until a request for `model` would be served without a 429."""
+        budget = self.budgets[model]
+        usage = await asyncio.to_thread(self.buckets.usage, model, budget)
+        if budget.rate <= 0:
+            return self.max_wait
+        # The token for a new caller refills (1 - tokens) / rate from now
+        return max(0.0, (1 - usage["tokens"]) / budget.rate - self.max_wait)
+
+    async def usage(self) -> Dict[str, Dict[str, float]]:
+        """Quota usage per model."""
+        usage = {}
+        for model, budget in self.budgets.items():
+            bucket = await asyncio.to_thread(self.buckets.usage, model, budget)
+            tokens = bucket["tokens"]
+            usage[model] = {
+                "rate_per_minute": budget.rate_per_minute,
+                "burst": budget.burst,
+                "available": max(0.0, tokens),
+                "backlog": max(0.0, -tokens),
+                "max_wait_seconds": self.max_wait,
+                "granted": bucket["granted"],
+                "rejected": bucket["rejected"],
+            }
+        return usage
+
+    def close(self) -> None:
+        self.buckets.close()
+
+
+upstream_limiter = UpstreamRateLimiter(
+    TokenBuckets(data_path("rate_limits.db")),
+    {
+        "esmfold": Budget(env.ESMFOLD_RATE_PER_MINUTE, env.ESMFOLD_RATE_BURST),
+        "boltz2": Budget(env.BOLTZ2_RATE_PER_MINUTE, env.BOLTZ2_RATE_BURST),
+    },
+    max_wait=env.RATE_LIMIT_MAX_WAIT_SECONDS,
+    enabled=env.RATE_LIMIT_ENABLED,
+)
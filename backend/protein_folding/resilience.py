@@ -0,0 +1,417 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+
+from config import check_env_vars
+from protein_folding.exceptions import (
+    ProteinFoldingAPIError,
+    ProteinFoldingCircuitOpenError,
+    ProteinFoldingRateLimitError,
+)
+from protein_folding.metrics import (
+    CIRCUIT_REJECTIONS,
+    CIRCUIT_STATE,
+    CIRCUIT_TRANSITIONS,
+    UPSTREAM_HEDGES,
+    UPSTREAM_RETRIES,
+)
+
+# Global configuration
+env = check_env_vars()
+
+T = TypeVar("T")
+Attempt = Callable[[], Awaitable[T]]
+
+# Upstream statuses that mean the request was not processed: a gateway or
+# an overloaded replica turned it away
+RETRYABLE_STATUSES = (502, 503, 504)
+# Of those, the one after which a request that is not idempotent (e.g. an
+# NVCF invocation creating a job) is known not to have run
+UNPROCESSED_STATUSES = (503,)
+
+# Failures before the request was sent: always safe to repeat
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# Failures after the request was sent, e.g. a connection reset by the
+# upstream: only safe to repeat when the request is idempotent
+MAYBE_SENT_ERRORS = (httpx.ReadError, httpx.WriteError, httpx.RemoteProtocolError)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _status(error: BaseException) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    if isinstance(error, ProteinFoldingAPIError):
+        return error.status_code
+    return None
+
+
+def retry_reason(error: BaseException, idempotent: bool) -> Optional[str]:
+    """Why a failed attempt may be repeated, or None if it may not."""
+    if isinstance(error, NOT_SENT_ERRORS):
+        return "connect"
+    if isinstance(error, MAYBE_SENT_ERRORS):
+        return "connection" if idempotent else None
+    status = _status(error)
+    if status in (RETRYABLE_STATUSES if idempotent else UNPROCESSED_STATUSES):
+        return str(status)
+    # Timeouts already used the whole request budget; a hedged request is the
+    # remedy for slow replicas
+    return None
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether `error` says the upstream is unhealthy, as opposed to the request."""
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError)):
+        # A local pool running out of connections says nothing about upstream
+        return not isinstance(error, httpx.PoolTimeout)
+    status = _status(error)
+    return status is not None and status >= 500 and status != 501
+
+
+class RetryPolicy:
+    """Number of attempts per upstream request and the backoff between them."""
+
+    def __init__(
+        self,
+        attempts: int,
+        initial_delay: float,
+        max_delay: float,
+        multiplier: float,
+        jitter: float,
+    ):
+        self.attempts = max(1, attempts)
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            attempts=env.UPSTREAM_RETRY_ATTEMPTS,
+            initial_delay=env.UPSTREAM_RETRY_INITIAL_DELAY,
+            max_delay=env.UPSTREAM_RETRY_MAX_DELAY,
+            multiplier=env.UPSTREAM_RETRY_MULTIPLIER,
+            jitter=env.UPSTREAM_RETRY_JITTER,
+        )
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """
+        Wait before retry number `retry` (0 for the first).
+
+        Grows exponentially up to `max_delay` and is shortened by up to
+        `jitter` (a fraction), so that requests failed by the same outage do
+        not come back together. A Retry-After from the upstream is honoured
+        up to `max_delay`.
+        """
+        delay = min(self.max_delay, self.initial_delay * self.multiplier**retry)
+        delay *= 1 - self.jitter * random.random()
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream endpoint is down.
+
+    After `failure_threshold` consecutive upstream failures the circuit
+    opens and calls are refused for `reset_seconds`. It then turns half-open
+    and lets `half_open_probes` calls through: a success closes it, a
+    failure opens it again. Each worker keeps its own breakers.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        failure_threshold: int,
+        reset_seconds: float,
+        half_open_probes: int,
+        enabled: bool = True,
+    ):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.enabled = enabled
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probes = 0
+        CIRCUIT_STATE.labels(endpoint).set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+        logging.warning(f"Circuit for {self.endpoint} is now {state}")
+        self.state = state
+        CIRCUIT_STATE.labels(self.endpoint).set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.endpoint, state).inc()
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through."""
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def acquire(self) -> bool:
+        """Whether a call may go upstream now; a True must be followed by a record."""
+        if not self.enabled or self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.retry_after > 0:
+                return False
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+        if self._probes >= self.half_open_probes:
+            return False
+        self._probes += 1
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state == HALF_OPEN:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def release(self) -> None:
+        """End a call that says nothing about upstream health, e.g. a 4xx."""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+
+class LatencyWindow:
+    """Latencies of the latest successful requests, for hedging delays."""
+
+    def __init__(self, size: int):
+        self._latencies: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def percentile(self, q: float) -> float:
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class HedgePolicy:
+    """
+    When to send a second, hedged request: once the first has run longer
+    than the `percentile` of recent latencies, and never before
+    `min_samples` latencies are known or sooner than `min_delay`.
+    """
+
+    def __init__(
+        self, percentile: float, min_delay: float, min_samples: int, window: int
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow(window)
+
+    def delay(self) -> Optional[float]:
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+
+class UpstreamResilience:
+    """
+    Retries, hedged requests and circuit breakers for upstream endpoints.
+
+    An attempt is a coroutine function making one upstream request and
+    raising httpx errors, or ProteinFoldingAPIError, when it fails. Failed
+    attempts are repeated after a jittered backoff when that is safe: a
+    request that was never sent always, one that may have run upstream only
+    if the caller marks it idempotent.
+    """
+
+    def __init__(
+        self,
+        retry: RetryPolicy,
+        breakers: Dict[str, CircuitBreaker],
+        hedges: Dict[str, HedgePolicy],
+    ):
+        self.retry = retry
+        self.breakers = breakers
+        self.hedges = hedges
+
+    async def call(
+        self,
+        endpoint: str,
+        attempt: Attempt[T],
+        idempotent: bool,
+        hedge: Optional[Attempt[T]] = None,
+    ) -> T:
+        """
+        Run `attempt` against `endpoint`, retrying and hedging it.
+
+        Args:
+            endpoint: Upstream endpoint name, e.g. "esmfold"
+            attempt: Makes one upstream request
+            idempotent: Whether repeating a request that reached the upstream
+                is harmless
+            hedge: Makes the hedged request, if the endpoint hedges; it should
+                give up rather than wait for a rate limit token
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            ProteinFoldingCircuitOpenError: If the endpoint's circuit is open
+        """
+        breaker = self.breakers[endpoint]
+        if not breaker.acquire():
+            CIRCUIT_REJECTIONS.labels(endpoint).inc()
+            raise ProteinFoldingCircuitOpenError(
+                f"{endpoint} is unavailable, please retry later",
+                breaker.retry_after,
+            )
+
+        retry = 0
+        while True:
+            try:
+                return await self._attempt(endpoint, breaker, attempt, hedge)
+            except Exception as e:
+                reason = retry_reason(e, idempotent)
+                if reason is None or retry + 1 >= self.retry.attempts:
+                    raise
+                delay = self.retry.delay(retry, _retry_after(e))
+                logging.warning(
+                    f"{endpoint} attempt {retry + 1} failed ({e!r}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                # The circuit may have opened meanwhile: report the failure
+                if not breaker.acquire():
+                    raise
+                UPSTREAM_RETRIES.labels(endpoint, reason).inc()
+                retry += 1
+
+    async def _attempt(
+        self,
+        endpoint: str,
+        breaker: CircuitBreaker,
+        attempt: Attempt[T],
+        hedge: Optional[Attempt[T]],
+    ) -> T:
+        """One attempt, possibly hedged, recorded in the breaker."""
+        policy = self.hedges.get(endpoint)
+        started = time.monotonic()
+        try:
+            if policy is not None and hedge is not None:
+                result = await self._hedged(endpoint, policy, attempt, hedge)
+            else:
+                result = await attempt()
+        except (ProteinFoldingRateLimitError, asyncio.CancelledError):
+            breaker.release()
+            raise
+        except Exception as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        breaker.record_success()
+        if policy is not None:
+            policy.latencies.add(time.monotonic() - started)
+        return result
+
+    async def _hedged(
+        self,
+        endpoint: str,
+        policy: HedgePolicy,
+        attempt: Attempt[T],
+        hedge: Attempt[T],
+    ) -> T:
+        """
+        Run `attempt`, and `hedge` as well if it is slow; the first success wins.
+        """
+        delay = policy.delay()
+        primary = asyncio.ensure_future(attempt())
+        if delay is None:
+            return await primary
+        secondary: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait((primary,), timeout=delay)
+            if done:
+                return primary.result()
+
+            UPSTREAM_HEDGES.labels(endpoint, "sent").inc()
+            secondary = asyncio.ensure_future(hedge())
+            pending = {primary, secondary}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            UPSTREAM_HEDGES.labels(endpoint, "won").inc()
+                        return task.result()
+                    if task is secondary and isinstance(
+                        task.exception(), ProteinFoldingRateLimitError
+                    ):
+                        # No token free for the hedge: keep waiting on the first
+                        UPSTREAM_HEDGES.labels(endpoint, "skipped").inc()
+                        continue
+                    error = error or task.exception()
+            # Both failed; report the first request's error if it has one
+            raise primary.exception() or error
+        finally:
+            for task in (primary, secondary):
+                if task is not None and not task.done():
+                    task.cancel()
+                    await asyncio.wait((task,))
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            return float(error.response.headers["retry-after"])
+        except (KeyError, ValueError):
+            return None
+    return None
+
+
+def _breaker(endpoint: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        endpoint,
+        failure_threshold=env.CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=env.CIRCUIT_RESET_SECONDS,
+        half_open_probes=env.CIRCUIT_HALF_OPEN_PROBES,
+        enabled=env.CIRCUIT_BREAKER_ENABLED,
+    )
+
+
+upstream_resilience = UpstreamResilience(
+    RetryPolicy.from_env(),
+    {"esmfold": _breaker("esmfold"), "boltz2": _breaker("boltz2")},
+    (
+        {
+            "esmfold": HedgePolicy(
+                env.ESMFOLD_HEDGE_PERCENTILE,
+                env.ESMFOLD_HEDGE_MIN_DELAY,
+                env.ESMFOLD_HEDGE_MIN_SAMPLES,
+                env.ESMFOLD_HEDGE_WINDOW,
+            )
+        }
+        if env.ESMFOLD_HEDGE_ENABLED
+        else {}
+    ),
+)
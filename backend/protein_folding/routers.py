@@ -1,84 +1,706 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
+import time
+from typing import Awaitable, Callable, List, Literal, Optional, Union
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 
 from protein_folding.models import (
     EsmfoldResponse,
     EsmfoldRequest,
+    EsmfoldBatchRecord,
+    EsmfoldBatchRequest,
     Boltz2Response,
     Boltz2Request,
+    Boltz2StreamItem,
+    Boltz2JobResponse,
+    CacheStatsResponse,
+    CachePurgeResponse,
+    QuotaResponse,
+    StructureAnalysisRequest,
+    StructureAnalysisResponse,
+    TraceResponse,
+)
+from protein_folding.esmfold.service import (
+    fold_with_esmfold_result,
+    fold_batch_with_esmfold,
+)
+from protein_folding.utils import parse_fasta
+from protein_folding.artifacts import artifact_store
+from protein_folding.analysis.service import analyze, analyze_artifact
+from config import check_env_vars
+from protein_folding.boltz2.service import fold_boltz2_result, stream_boltz2
+from protein_folding.cache import fold_cache
+from protein_folding.jobs import boltz2_jobs
+from protein_folding.ratelimit import upstream_limiter
+from protein_folding.dependencies import require_admin
+from protein_folding.cancellation import cancel_on_disconnect, record_disconnect
+from protein_folding.metrics import SERIALIZATION_SECONDS, record_error
+from protein_folding.offload import offloader
+from protein_folding.tracing import recorder, span
+from protein_folding.encoding import (
+    ANALYSIS_MEDIA_TYPE,
+    STRUCTURE_MEDIA_TYPE,
+    PlddtEncoding,
+    accepts_media_type,
+    accepts_packed_structures,
+    analysis_json,
+    fold_response_json,
+    pack_boltz2_response,
+    pack_esmfold_response,
+    results_json,
+    structure_bytes,
 )
-from protein_folding.esmfold.service import fold_with_esmfold
-from protein_folding.boltz2.service import fold_boltz2
 from protein_folding.exceptions import (
+    ProteinFoldingCancelledError,
     ProteinFoldingError,
+    ProteinSequenceValidationError,
     handle_protein_folding_exception,
 )
 
+# Global configuration
+env = check_env_vars()
 
 router = APIRouter()
 
+# FASTA uploads are read in pieces of this many bytes, up to ESMFOLD_FASTA_MAX_BYTES
+FASTA_CHUNK_SIZE = 64 * 1024
+
+# Opt-in compact pLDDT scores in JSON fold responses, see `encode_plddt`
+PLDDT_ENCODING_QUERY = Query(
+    "list",
+    description=(
+        "pLDDT encoding in JSON responses: a list of numbers, or base64 of "
+        "little-endian float32 (f32) or of uint8 in steps of 100/255 (u8)"
+    ),
+)
+
+# Structures inline in JSON fold responses, or stored as artifacts and linked
+StructureDelivery = Literal["inline", "url"]
+STRUCTURE_QUERY = Query(
+    "inline",
+    description=(
+        "Structures in JSON responses: inline text, or the URL of a stored "
+        "artifact (pdb_url / mmcif_url) to download with Range and ETag support"
+    ),
+)
+
+# Documents the optional binary response of the analysis endpoints
+PACKED_ANALYSIS_RESPONSES = {
+    200: {
+        "content": {ANALYSIS_MEDIA_TYPE: {}},
+        "description": "JSON, or a packed binary frame when requested via Accept",
+    }
+}
+ANALYSIS_ARRAYS_QUERY = Query(
+    False, description="Include the maps and per-residue arrays, base64, in JSON"
+)
+
+# Documents the optional binary response of the fold endpoints
+PACKED_STRUCTURE_RESPONSES = {
+    200: {
+        "content": {STRUCTURE_MEDIA_TYPE: {}},
+        "description": "JSON, or a packed binary frame when requested via Accept",
+    }
+}
+
+
+async def encode_fold_response(
+    endpoint: str,
+    load_response: Callable[[], Awaitable[BaseModel]],
+    dump_response: Callable[[], Awaitable[bytes]],
+    accept: Optional[str],
+    plddt_encoding: PlddtEncoding,
+    pack: Callable[[BaseModel], bytes],
+    structure: StructureDelivery = "inline",
+    artifact_url: Optional[Callable[[str], str]] = None,
+) -> Response:
+    """
+    Encode a fold response as JSON, or as a packed frame if `accept` asks for it.
+
+    The response is returned directly, bypassing FastAPI's validation and
+    serialization of the `response_model`. Plain JSON comes from
+    `dump_response`, so cached results are sent as stored; the other
+    encodings need the model from `load_response`. With `structure` "url",
+    JSON responses link to the structures, stored as artifacts and located
+    by `artifact_url`. Large responses are encoded on the offload threads.
+    The encoding time is recorded per endpoint and format.
+    """
+    start = time.perf_counter()
+    with span("serialize", endpoint=endpoint) as serialize_span:
+        if accepts_packed_structures(accept):
+            response = await load_response()
+            frame = await offloader.run(
+                pack, response, size=structure_bytes(response), in_process=False
+            )
+            encoded = Response(frame, media_type=STRUCTURE_MEDIA_TYPE)
+            encoding = "packed"
+        elif structure == "url":
+            response = await load_response()
+            # Hashing and writing files: always off the event loop
+            body = await asyncio.to_thread(
+                artifact_response_json, response, artifact_url, plddt_encoding
+            )
+            encoded = Response(body, media_type="application/json")
+            encoding = f"json-{plddt_encoding}-url"
+        elif plddt_encoding != "list":
+            response = await load_response()
+            body = await offloader.run(
+                fold_response_json,
+                response,
+                plddt_encoding,
+                size=structure_bytes(response),
+                in_process=False,
+            )
+            encoded = Response(body, media_type="application/json")
+            encoding = f"json-{plddt_encoding}"
+        else:
+            encoded = Response(await dump_response(), media_type="application/json")
+            encoding = "json"
+        serialize_span.set(format=encoding, bytes=len(encoded.body))
+    SERIALIZATION_SECONDS.labels(endpoint, encoding).observe(
+        time.perf_counter() - start
+    )
+    return encoded
+
+
+def artifact_response_json(
+    response: BaseModel,
+    artifact_url: Callable[[str], str],
+    plddt_encoding: PlddtEncoding,
+) -> bytes:
+    """Store the structures of a fold response and serialize it with their URLs."""
+    return fold_response_json(
+        artifact_store.with_urls(response, artifact_url), plddt_encoding
+    )
+
+
+def artifact_url_for(request: Request) -> Callable[[str], str]:
+    """Build the download URLs of artifacts for clients of `request`."""
+
+    def artifact_url(artifact_id: str) -> str:
+        return str(request.url_for("download_artifact", artifact_id=artifact_id))
+
+    return artifact_url
+
 
-@router.post("/protein_fold/esmfold", response_model=EsmfoldResponse)
+@router.post(
+    "/protein_fold/esmfold",
+    response_model=EsmfoldResponse,
+    responses=PACKED_STRUCTURE_RESPONSES,
+)
 async def fold_protein_esmfold(
     request: EsmfoldRequest,
-) -> EsmfoldResponse:
+    http_request: Request,
+    accept: Optional[str] = Header(None),
+    plddt_encoding: PlddtEncoding = PLDDT_ENCODING_QUERY,
+    structure: StructureDelivery = STRUCTURE_QUERY,
+) -> Union[EsmfoldResponse, Response]:
     """
     Fold a protein sequence using NVIDIA ESMFold.
 
+    The upstream call is cancelled if the client disconnects before it ends.
+
     Args:
         request: Request containing protein sequence
+        http_request: The underlying HTTP request, watched for disconnects
+        accept: Accept header; `application/vnd.pomelo.structure` selects the
+            packed binary encoding
+        plddt_encoding: "f32" or "u8" for compact base64 pLDDT scores in JSON
+        structure: "url" to link to the PDB artifact instead of inlining it
 
     Returns:
-        EsmfoldResponse with folding results
+        EsmfoldResponse with folding results, or its packed encoding
 
     Raises:
         HTTPException: For various error conditions
     """
     try:
-        fold_result = await fold_with_esmfold(request.sequence)
-        return EsmfoldResponse(results=[fold_result])
+        fold = await cancel_on_disconnect(
+            http_request, fold_with_esmfold_result(request.sequence)
+        )
+
+        async def load_response() -> EsmfoldResponse:
+            return EsmfoldResponse(results=[await fold.load()])
+
+        async def dump_response() -> bytes:
+            return results_json([await fold.dump()])
+
+        return await encode_fold_response(
+            "esmfold",
+            load_response,
+            dump_response,
+            accept,
+            plddt_encoding,
+            pack_esmfold_response,
+            structure,
+            artifact_url_for(http_request),
+        )
+    except ProteinFoldingCancelledError as e:
+        raise handle_protein_folding_exception(e)
     except ProteinFoldingError as e:
         logging.error(f"Protein folding error: {e.message}")
         raise handle_protein_folding_exception(e)
     except Exception as e:
         logging.error(f"Unexpected error in protein folding: {str(e)}")
+        record_error(e)
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred during protein folding",
         )
 
 
-@router.post("/protein_fold/boltz2", response_model=Boltz2Response)
+def stream_esmfold_batch(
+    http_request: Request, records: List[EsmfoldBatchRecord]
+) -> StreamingResponse:
+    """
+    Stream batch results as NDJSON, one EsmfoldBatchItem per line.
+
+    The response stops, cancelling the remaining folds, when the client
+    disconnects.
+    """
+    if len(records) > env.ESMFOLD_BATCH_MAX_RECORDS:
+        raise handle_protein_folding_exception(
+            ProteinSequenceValidationError(
+                f"Batch exceeds the limit of {env.ESMFOLD_BATCH_MAX_RECORDS} records"
+            )
+        )
+
+    async def lines():
+        try:
+            async for item in fold_batch_with_esmfold(records):
+                yield item.model_dump_json() + "\n"
+        except asyncio.CancelledError:
+            # Starlette cancels the stream when the client disconnects
+            record_disconnect(http_request)
+            raise
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/protein_fold/esmfold/batch")
+async def fold_protein_esmfold_batch(
+    request: EsmfoldBatchRequest, http_request: Request
+) -> StreamingResponse:
+    """
+    Fold a batch of protein sequences using NVIDIA ESMFold.
+
+    Args:
+        request: Request containing the sequences to fold
+        http_request: The underlying HTTP request, watched for disconnects
+
+    Returns:
+        NDJSON stream with one EsmfoldBatchItem per record, in completion order
+
+    Raises:
+        HTTPException: If the batch is too large
+    """
+    return stream_esmfold_batch(http_request, request.records)
+
+
+@router.post("/protein_fold/esmfold/batch/fasta")
+async def fold_protein_esmfold_fasta(
+    file: UploadFile, http_request: Request
+) -> StreamingResponse:
+    """
+    Fold every record of an uploaded multi-record FASTA file using NVIDIA ESMFold.
+
+    Args:
+        file: FASTA file upload
+        http_request: The underlying HTTP request, watched for disconnects
+
+    Returns:
+        NDJSON stream with one EsmfoldBatchItem per record, in completion order
+
+    Raises:
+        HTTPException: If the file is too large, is not valid FASTA or holds
+            too many records
+    """
+    chunks: List[bytes] = []
+    size = 0
+    while chunk := await file.read(FASTA_CHUNK_SIZE):
+        size += len(chunk)
+        if size > env.ESMFOLD_FASTA_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"FASTA file exceeds {env.ESMFOLD_FASTA_MAX_BYTES} bytes",
+            )
+        chunks.append(chunk)
+    try:
+        fasta = b"".join(chunks).decode()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="FASTA file must be text")
+
+    records = [
+        EsmfoldBatchRecord.model_construct(id=record_id[:200], sequence=sequence)
+        for record_id, sequence in await offloader.run(
+            parse_fasta, fasta, size=len(fasta)
+        )
+    ]
+    if not records:
+        raise HTTPException(status_code=400, detail="No FASTA records found")
+    return stream_esmfold_batch(http_request, records)
+
+
+@router.post(
+    "/protein_fold/boltz2",
+    response_model=Boltz2Response,
+    responses=PACKED_STRUCTURE_RESPONSES,
+)
 async def fold_protein_boltz2(
     request: Boltz2Request,
-) -> Boltz2Response:
+    http_request: Request,
+    accept: Optional[str] = Header(None),
+    plddt_encoding: PlddtEncoding = PLDDT_ENCODING_QUERY,
+    structure: StructureDelivery = STRUCTURE_QUERY,
+) -> Union[Boltz2Response, Response]:
     """
     Process protein structure prediction using Boltz-2.
 
+    The upstream call and NVCF polling are cancelled if the client disconnects
+    before they end.
+
+    Args:
+        request: Request containing protein sequence and optional ligand information
+        http_request: The underlying HTTP request, watched for disconnects
+        accept: Accept header; `application/vnd.pomelo.structure` selects the
+            packed binary encoding
+        plddt_encoding: "f32" or "u8" for compact base64 pLDDT scores in JSON
+        structure: "url" to link to the mmCIF artifacts instead of inlining them
+
+    Returns:
+        Boltz2Response with one result per diffusion sample, best first, or
+        its packed encoding
+
+    Raises:
+        HTTPException: For various error conditions
+    """
+    try:
+        fold = await cancel_on_disconnect(
+            http_request,
+            fold_boltz2_result(
+                request.sequence,
+                request.ligand_smiles,
+                request.recycling_steps,
+                request.sampling_steps,
+                request.diffusion_samples,
+            ),
+        )
+        return await encode_fold_response(
+            "boltz2",
+            fold.load,
+            fold.dump,
+            accept,
+            plddt_encoding,
+            pack_boltz2_response,
+            structure,
+            artifact_url_for(http_request),
+        )
+    except ProteinFoldingCancelledError as e:
+        raise handle_protein_folding_exception(e)
+    except ProteinFoldingError as e:
+        logging.error(f"Boltz-2 error: {e.message}")
+        raise handle_protein_folding_exception(e)
+    except Exception as e:
+        logging.error(f"Unexpected error in Boltz-2: {str(e)}")
+        record_error(e)
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred during Boltz-2 processing",
+        )
+
+
+@router.post("/protein_fold/boltz2/stream")
+async def stream_protein_boltz2(
+    request: Boltz2Request, http_request: Request
+) -> StreamingResponse:
+    """
+    Run a Boltz-2 prediction and stream its samples as they are parsed.
+
+    Errors before the upstream prediction completes are returned as HTTP
+    errors, like for the non-streaming endpoint.
+
     Args:
         request: Request containing protein sequence and optional ligand information
+        http_request: The underlying HTTP request, watched for disconnects
 
     Returns:
-        Boltz2Response with prediction results
+        NDJSON stream with one Boltz2StreamItem per diffusion sample, in
+        parsing order; each result carries its rank
 
     Raises:
         HTTPException: For various error conditions
     """
     try:
-        fold_result = await fold_boltz2(
-            request.sequence,
-            request.ligand_smiles,
-            request.recycling_steps,
-            request.sampling_steps,
-            request.diffusion_samples,
+        samples = await cancel_on_disconnect(
+            http_request,
+            stream_boltz2(
+                request.sequence,
+                request.ligand_smiles,
+                request.recycling_steps,
+                request.sampling_steps,
+                request.diffusion_samples,
+            ),
         )
-        return Boltz2Response(results=[fold_result])
+    except ProteinFoldingCancelledError as e:
+        raise handle_protein_folding_exception(e)
     except ProteinFoldingError as e:
         logging.error(f"Boltz-2 error: {e.message}")
         raise handle_protein_folding_exception(e)
     except Exception as e:
         logging.error(f"Unexpected error in Boltz-2: {str(e)}")
+        record_error(e)
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred during Boltz-2 processing",
         )
+
+    async def lines():
+        try:
+            async for result in samples:
+                yield Boltz2StreamItem(result=result).model_dump_json() + "\n"
+        except asyncio.CancelledError:
+            # Starlette cancels the stream when the client disconnects
+            record_disconnect(http_request)
+            raise
+        except Exception as e:
+            # The status line is sent: report the error in the stream instead
+            logging.error(f"Unexpected error parsing Boltz-2 samples: {str(e)}")
+            record_error(e)
+            yield Boltz2StreamItem(
+                error="An unexpected error occurred during Boltz-2 processing",
+                status_code=500,
+            ).model_dump_json() + "\n"
+        finally:
+            await samples.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/protein_fold/boltz2/jobs", response_model=Boltz2JobResponse, status_code=202
+)
+async def submit_boltz2_job(request: Boltz2Request) -> Boltz2JobResponse:
+    """
+    Submit a Boltz-2 prediction to run in the background.
+
+    Args:
+        request: Request containing protein sequence and optional ligand information
+
+    Returns:
+        Boltz2JobResponse with the queued job id
+
+    Raises:
+        HTTPException: If the input is invalid
+    """
+    try:
+        return await boltz2_jobs.submit(request)
+    except ProteinFoldingError as e:
+        logging.error(f"Boltz-2 job submission error: {e.message}")
+        raise handle_protein_folding_exception(e)
+
+
+@router.get("/protein_fold/boltz2/jobs/{job_id}", response_model=Boltz2JobResponse)
+async def get_boltz2_job(job_id: str) -> Response:
+    """Return the status of a Boltz-2 job, including results once it succeeded."""
+    # Sent as stored, without validating and re-serializing the result
+    body = await boltz2_jobs.get_json(job_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Response(body, media_type="application/json")
+
+
+@router.get("/protein_fold/boltz2/jobs/{job_id}/events")
+async def stream_boltz2_job_events(job_id: str) -> StreamingResponse:
+    """Stream Boltz-2 job status changes as Server-Sent Events."""
+    if await boltz2_jobs.get(job_id, include_result=False) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        boltz2_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.api_route(
+    "/artifacts/{artifact_id}", methods=["GET", "HEAD"], name="download_artifact"
+)
+async def download_artifact(artifact_id: str, request: Request) -> Response:
+    """
+    Download a stored structure by the id in its fold result's artifact URL.
+
+    Artifacts never change, so responses are cacheable for a year. Clients
+    accepting gzip receive the stored compressed file; Range requests and
+    If-None-Match are supported either way.
+    """
+    return await artifact_store.response(request, artifact_id)
+
+
+async def encode_analysis_response(
+    frame: bytes, accept: Optional[str], include_arrays: bool
+) -> Response:
+    """Send an analysis frame as is if `accept` asks for it, as JSON otherwise."""
+    start = time.perf_counter()
+    if accepts_media_type(accept, ANALYSIS_MEDIA_TYPE):
+        encoded = Response(frame, media_type=ANALYSIS_MEDIA_TYPE)
+        encoding = "packed"
+    else:
+        body = await offloader.run(
+            analysis_json, frame, include_arrays, size=len(frame), in_process=False
+        )
+        encoded = Response(body, media_type="application/json")
+        encoding = "json-arrays" if include_arrays else "json"
+    SERIALIZATION_SECONDS.labels("analysis", encoding).observe(
+        time.perf_counter() - start
+    )
+    return encoded
+
+
+@router.post(
+    "/analysis",
+    response_model=StructureAnalysisResponse,
+    responses=PACKED_ANALYSIS_RESPONSES,
+)
+async def analyze_structure(
+    request: StructureAnalysisRequest,
+    accept: Optional[str] = Header(None),
+    arrays: bool = ANALYSIS_ARRAYS_QUERY,
+) -> Response:
+    """
+    Analyze a PDB or mmCIF structure: C-alpha distance and contact maps,
+    radius of gyration, pLDDT summaries and low-confidence segments.
+
+    Results are cached by the structure's content, so analyzing it again is
+    a cache lookup.
+
+    Args:
+        request: Request containing the structure text and its format
+        accept: Accept header; `application/vnd.pomelo.analysis` selects the
+            packed binary encoding, with the maps as typed arrays
+        arrays: Whether JSON includes the maps and per-residue arrays
+
+    Returns:
+        StructureAnalysisResponse, or its packed encoding
+
+    Raises:
+        HTTPException: 400 if the structure has no residues, more than
+            ANALYSIS_MAX_RESIDUES or unreadable coordinates; 422 if it is
+            longer than MAX_STRUCTURE_LENGTH
+    """
+    try:
+        frame = await analyze(request.structure, request.format)
+    except ProteinFoldingError as e:
+        logging.error(f"Structure analysis error: {e.message}")
+        raise handle_protein_folding_exception(e)
+    return await encode_analysis_response(frame, accept, arrays)
+
+
+@router.get(
+    "/artifacts/{artifact_id}/analysis",
+    response_model=StructureAnalysisResponse,
+    responses=PACKED_ANALYSIS_RESPONSES,
+)
+async def analyze_structure_artifact(
+    artifact_id: str,
+    accept: Optional[str] = Header(None),
+    arrays: bool = ANALYSIS_ARRAYS_QUERY,
+) -> Response:
+    """
+    Analyze a stored structure artifact, like POST /analysis.
+
+    Raises:
+        HTTPException: 404 for unknown artifacts, 400 if the structure has
+            no residues, too many or unreadable coordinates
+    """
+    try:
+        frame = await analyze_artifact(artifact_id)
+    except ProteinFoldingError as e:
+        logging.error(f"Structure analysis error: {e.message}")
+        raise handle_protein_folding_exception(e)
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return await encode_analysis_response(frame, accept, arrays)
+
+
+@router.get("/protein_fold/quota", response_model=QuotaResponse)
+async def get_upstream_quota() -> QuotaResponse:
+    """Return the upstream request budget of each model and how much is in use."""
+    return QuotaResponse(
+        enabled=upstream_limiter.enabled, budgets=await upstream_limiter.usage()
+    )
+
+
+@router.get(
+    "/protein_fold/cache",
+    response_model=CacheStatsResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def get_fold_cache_stats() -> CacheStatsResponse:
+    """Return fold cache hit/miss counters and tier sizes."""
+    return CacheStatsResponse(**await fold_cache.stats())
+
+
+@router.delete(
+    "/protein_fold/cache",
+    response_model=CachePurgeResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def purge_fold_cache(
+    model: Optional[Literal["esmfold", "boltz2", "analysis"]] = None,
+    key: Optional[str] = None,
+    expired_only: bool = False,
+) -> CachePurgeResponse:
+    """
+    Purge fold cache entries.
+
+    Args:
+        model: Only purge results of this model, or structure analyses
+        key: Only purge the entry with this cache key
+        expired_only: Only purge entries past their TTL
+
+    Returns:
+        CachePurgeResponse with the number of entries removed
+    """
+    purged = await fold_cache.purge(model=model, key=key, expired_only=expired_only)
+    return CachePurgeResponse(purged=purged)
+
+
+@router.get(
+    "/debug/traces",
+    response_model=List[TraceResponse],
+    dependencies=[Depends(require_admin)],
+)
+async def list_traces(limit: int = Query(20, ge=1, le=1000)) -> List[TraceResponse]:
+    """
+    Return the latest request traces recorded by the serving worker.
+
+    Each uvicorn worker keeps its own traces; set TRACE_EXPORT_PATH to collect
+    the traces of all workers in one JSONL file.
+    """
+    if not env.TRACING_ENABLED:
+        raise HTTPException(status_code=404, detail="Tracing is disabled")
+    return [TraceResponse(**trace) for trace in recorder.recent(limit)]
+
+
+@router.get(
+    "/debug/traces/{trace_id}",
+    response_model=TraceResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def get_trace(trace_id: str) -> TraceResponse:
+    """Return one trace by the id sent in its response's X-Trace-Id header."""
+    trace = recorder.get(trace_id) if env.TRACING_ENABLED else None
+    if trace is None:
+        raise HTTPException(
+            status_code=404, detail="Trace not found in this worker's buffer"
+        )
+    return TraceResponse(**trace)
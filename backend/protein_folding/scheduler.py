@@ -0,0 +1,314 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import check_env_vars
+from protein_folding.exceptions import ProteinFoldingRateLimitError
+from protein_folding.metrics import (
+    SCHEDULER_COST_IN_FLIGHT,
+    SCHEDULER_QUEUED,
+    SCHEDULER_REJECTED,
+    SCHEDULER_WAIT_SECONDS,
+)
+from protein_folding.tracing import span
+
+# Global configuration
+env = check_env_vars()
+
+# Quick single ESMFold folds, and everything that may take minutes: Boltz-2
+# predictions and ESMFold batches
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Cost units are roughly seconds of upstream time. Boltz-2's trunk grows
+# with the square of the sequence length and runs once per recycling step;
+# its diffusion module grows linearly and runs per sample and step. Scaled
+# so that a 256-residue prediction with default parameters costs 40
+BOLTZ2_REFERENCE_LENGTH = 256
+BOLTZ2_REFERENCE_STEPS = 50
+BOLTZ2_COST_SCALE = 10.0
+
+# Suggested wait for a client whose queue is full
+QUEUE_FULL_RETRY_AFTER = 10.0
+
+_current_client: ContextVar[str] = ContextVar("fold_client", default="anonymous")
+# Whether the client id comes from a trusted proxy rather than an address
+_client_trusted: ContextVar[bool] = ContextVar("fold_client_trusted", default=False)
+_current_lane: ContextVar[str] = ContextVar("fold_lane", default=INTERACTIVE)
+
+
+def esmfold_cost(length: int) -> float:
+    """Estimated cost of folding a sequence of `length` residues with ESMFold."""
+    return 1 + length / 1000
+
+
+def boltz2_cost(
+    length: int, recycling_steps: int, sampling_steps: int, diffusion_samples: int
+) -> float:
+    """Estimated cost of a Boltz-2 prediction, from its size and parameters."""
+    size = length / BOLTZ2_REFERENCE_LENGTH
+    trunk = recycling_steps * size**2
+    diffusion = diffusion_samples * sampling_steps / BOLTZ2_REFERENCE_STEPS * size
+    return BOLTZ2_COST_SCALE * (trunk + diffusion)
+
+
+def current_lane() -> str:
+    return _current_lane.get()
+
+
+@contextmanager
+def fold_context(
+    client: Optional[str] = None, lane: Optional[str] = None, trusted: bool = False
+) -> Iterator[None]:
+    """
+    Schedule the folds started in this block for `client`, in `lane`.
+
+    Only a `trusted` client id, one set by a trusted proxy, has its queued
+    folds capped: an address may be shared by every client behind a proxy.
+    """
+    tokens = []
+    if client is not None:
+        tokens.append((_current_client, _current_client.set(client)))
+        tokens.append((_client_trusted, _client_trusted.set(trusted)))
+    if lane is not None:
+        tokens.append((_current_lane, _current_lane.set(lane)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class Waiter:
+    __slots__ = ("client", "cost", "future", "granted")
+
+    def __init__(self, client: str, cost: float):
+        self.client = client
+        self.cost = cost
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.granted = False
+
+
+class Lane:
+    """
+    Folds of one priority class, started while their cost fits in `capacity`.
+
+    Each client has its own queue. Queues are served by deficit round robin:
+    a client's turn adds `quantum` to its deficit, and its folds start while
+    the deficit covers their cost. Clients thus get equal shares of upstream
+    cost, however many or large their folds. A fold costing more than the
+    whole capacity starts once the lane is idle.
+    """
+
+    def __init__(
+        self, name: str, capacity: float, quantum: float, max_queued_per_client: int
+    ):
+        self.name = name
+        self.capacity = capacity
+        self.quantum = quantum
+        self.max_queued_per_client = max_queued_per_client
+        # Clients with queued folds, in round robin order
+        self.queues: "OrderedDict[str, Deque[Waiter]]" = OrderedDict()
+        self.deficits: Dict[str, float] = {}
+        self.in_flight = 0.0
+        self.running = 0
+        # Whether the client at the head has had its quantum for this turn
+        self._turn_started = False
+
+    def enqueue(self, client: str, cost: float, capped: bool = True) -> Waiter:
+        queue = self.queues.get(client)
+        if capped and queue is not None and len(queue) >= self.max_queued_per_client:
+            SCHEDULER_REJECTED.labels(self.name).inc()
+            raise ProteinFoldingRateLimitError(
+                "Too many folds queued for this client, please retry later",
+                QUEUE_FULL_RETRY_AFTER,
+            )
+        if queue is None:
+            queue = self.queues[client] = deque()
+            self.deficits[client] = 0.0
+        waiter = Waiter(client, cost)
+        queue.append(waiter)
+        SCHEDULER_QUEUED.labels(self.name).inc()
+        self._dispatch()
+        return waiter
+
+    def cancel(self, waiter: Waiter) -> None:
+        """Withdraw a waiter whose caller gave up, granted or not."""
+        if waiter.granted:
+            self.release(waiter)
+            return
+        queue = self.queues.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        SCHEDULER_QUEUED.labels(self.name).dec()
+        if not queue:
+            self._drop(waiter.client)
+        # The withdrawn fold may have been the one holding up the others
+        self._dispatch()
+
+    def release(self, waiter: Waiter) -> None:
+        self.in_flight = max(0.0, self.in_flight - waiter.cost)
+        self.running -= 1
+        SCHEDULER_COST_IN_FLIGHT.labels(self.name).dec(waiter.cost)
+        self._dispatch()
+
+    def _drop(self, client: str) -> None:
+        if next(iter(self.queues)) == client:
+            self._turn_started = False
+        del self.queues[client]
+        del self.deficits[client]
+
+    def _fits(self, cost: float) -> bool:
+        return self.running == 0 or self.in_flight + cost <= self.capacity
+
+    def _skip_idle_rounds(self) -> None:
+        """
+        Add the quanta of the rounds in which no client could start a fold
+        at once, instead of going round the clients that many times.
+        """
+        rounds = min(
+            math.ceil((queue[0].cost - self.deficits[client]) / self.quantum) - 1
+            for client, queue in self.queues.items()
+        )
+        if rounds > 0:
+            for client in self.deficits:
+                self.deficits[client] += rounds * self.quantum
+
+    def _dispatch(self) -> None:
+        """Start queued folds in round robin order while capacity allows."""
+        while self.queues:
+            client, queue = next(iter(self.queues.items()))
+            if not self._turn_started:
+                self._skip_idle_rounds()
+                self.deficits[client] += self.quantum
+                self._turn_started = True
+            while queue and queue[0].cost <= self.deficits[client]:
+                waiter = queue[0]
+                if not self._fits(waiter.cost):
+                    # Resume this turn when a running fold ends
+                    return
+                queue.popleft()
+                self.deficits[client] -= waiter.cost
+                self._start(waiter)
+            self._turn_started = False
+            if queue:
+                self.queues.move_to_end(client)
+            else:
+                # Deficits are not banked by clients without queued folds
+                self._drop(client)
+
+    def _start(self, waiter: Waiter) -> None:
+        waiter.granted = True
+        self.in_flight += waiter.cost
+        self.running += 1
+        SCHEDULER_QUEUED.labels(self.name).dec()
+        SCHEDULER_COST_IN_FLIGHT.labels(self.name).inc(waiter.cost)
+        if not waiter.future.done():
+            waiter.future.set_result(None)
+
+
+class FoldScheduler:
+    """
+    Admission control for upstream folds: priority lanes with fair queues.
+
+    Interactive and batch folds have separate lanes and capacities, so a
+    backlog of Boltz-2 predictions never delays a quick ESMFold fold. Within
+    a lane, clients share the capacity fairly by estimated cost. Each worker
+    schedules its own folds.
+    """
+
+    def __init__(self, lanes: Dict[str, Lane], enabled: bool = True):
+        self.lanes = lanes
+        self.enabled = enabled
+
+    @asynccontextmanager
+    async def slot(self, lane: str, cost: float) -> AsyncIterator[None]:
+        """
+        Wait for the fold's turn in `lane`, then run the body.
+
+        Raises:
+            ProteinFoldingRateLimitError: If a trusted client already has too
+                many folds queued in the lane
+        """
+        if not self.enabled:
+            yield
+            return
+
+        queue = self.lanes[lane]
+        with span("schedule", lane=lane, cost=round(cost, 2)) as schedule_span:
+            started = time.monotonic()
+            waiter = queue.enqueue(
+                _current_client.get(), cost, capped=_client_trusted.get()
+            )
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                queue.cancel(waiter)
+                raise
+            wait = time.monotonic() - started
+            schedule_span.set(wait_seconds=round(wait, 3))
+            SCHEDULER_WAIT_SECONDS.labels(lane).observe(wait)
+
+        try:
+            yield
+        finally:
+            queue.release(waiter)
+
+
+class ClientMiddleware:
+    """
+    Identify the client of each request for fair scheduling.
+
+    The client is SCHEDULER_CLIENT_HEADER when configured, e.g. set by an
+    authenticating proxy, and the client address otherwise. Clients could
+    pick any value for a header, so it is only used when configured. Only
+    clients identified by the header have their queued folds capped: behind
+    a proxy, every client has the proxy's address.
+    """
+
+    def __init__(self, app: ASGIApp, header: Optional[str] = None):
+        self.app = app
+        self.header = header.lower().encode("latin-1") if header else None
+
+    def _client(self, scope: Scope) -> Tuple[str, bool]:
+        """The client id of a request, and whether it is trusted."""
+        if self.header is not None:
+            for name, value in scope["headers"]:
+                if name == self.header and value:
+                    return value.decode("latin-1"), True
+        client = scope.get("client")
+        return (client[0] if client else "anonymous"), False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client, trusted = self._client(scope)
+        with fold_context(client=client, trusted=trusted):
+            await self.app(scope, receive, send)
+
+
+fold_scheduler = FoldScheduler(
+    {
+        INTERACTIVE: Lane(
+            INTERACTIVE,
+            env.SCHEDULER_INTERACTIVE_CAPACITY,
+            env.SCHEDULER_QUANTUM,
+            env.SCHEDULER_MAX_QUEUED_PER_CLIENT,
+        ),
+        BATCH: Lane(
+            BATCH,
+            env.SCHEDULER_BATCH_CAPACITY,
+            env.SCHEDULER_QUANTUM,
+            env.SCHEDULER_MAX_QUEUED_PER_CLIENT,
+        ),
+    },
+    enabled=env.SCHEDULER_ENABLED,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import mimetypes
+import os
+import stat
+from email.utils import formatdate
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.responses import FileResponse, Response
+
+from config import check_env_vars
+from protein_folding.cache import MemoryLRU
+from protein_folding.compression import negotiate_encoding
+
+# Global configuration
+env = check_env_vars()
+
+# Vite writes content-hashed file names into assets/, so they never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# index.html, images and the favicon keep their names across deploys
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Variants written by `invoke precompress`, most preferred first
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def _version(stat_result: os.stat_result) -> Tuple[int, int]:
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+class StaticFile:
+    """Headers and precompressed variants of one file, valid for one version."""
+
+    def __init__(self, path: str, stat_result: os.stat_result):
+        self.path = path
+        self.stat_result = stat_result
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.variants: Dict[str, Tuple[str, os.stat_result]] = {}
+        variant_versions: List[Optional[Tuple[int, int]]] = []
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            try:
+                variant_stat = os.stat(path + suffix)
+            except OSError:
+                variant_versions.append(None)
+                continue
+            variant_versions.append(_version(variant_stat))
+            # A variant older than its file is left over from a previous build
+            if variant_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+                self.variants[encoding] = (path + suffix, variant_stat)
+        # Variants written, rewritten or removed on their own change it too
+        self.version = (_version(stat_result), *variant_versions)
+
+    @staticmethod
+    def current_version(path: str) -> Optional[Tuple]:
+        """The version of `path` and its variants on disk, None if it is gone."""
+        versions: List[Optional[Tuple[int, int]]] = []
+        for variant in (path, *(path + s for s in PRECOMPRESSED_SUFFIXES.values())):
+            try:
+                versions.append(_version(os.stat(variant)))
+            except OSError:
+                if variant == path:
+                    return None
+                versions.append(None)
+        return tuple(versions)
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # Each representation needs its own strong validator
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+class StaticDirectory:
+    """
+    Serve the frontend build with validators, caching and precompression.
+
+    Responses carry an ETag and answer If-None-Match with 304. When the
+    client accepts it, a `.br` or `.gz` variant written at build time is sent
+    instead of the file. Files up to `memory_max_file_bytes` are kept in an
+    LRU so hot assets are served without touching the disk; larger ones are
+    streamed.
+    """
+
+    def __init__(
+        self, directory: str, memory_max_bytes: int, memory_max_file_bytes: int
+    ):
+        self.root = os.path.realpath(directory)
+        self.memory_max_file_bytes = memory_max_file_bytes
+        self._memory = MemoryLRU(memory_max_bytes)
+        self._files: Dict[str, StaticFile] = {}
+
+    def resolve(self, relative_path: str) -> Optional[StaticFile]:
+        """
+        Look up a file below the root directory.
+
+        Returns None for paths escaping the root (including via symlinks),
+        dotfiles, precompressed variants and anything that is not a regular
+        file.
+        """
+        # Known files skip path resolution. Stating the file and its variants
+        # per request keeps the cached headers honest when the build is replaced
+        static_file = self._files.get(relative_path)
+        if static_file is not None:
+            if StaticFile.current_version(static_file.path) == static_file.version:
+                return static_file
+            del self._files[relative_path]
+
+        try:
+            path = os.path.realpath(os.path.join(self.root, relative_path))
+        except ValueError:
+            # Embedded null byte
+            return None
+        if os.path.commonpath((self.root, path)) != self.root:
+            return None
+        relative = os.path.relpath(path, self.root)
+        if any(part.startswith(".") for part in relative.split(os.sep)):
+            return None
+        if path.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+            return None
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        static_file = StaticFile(path, stat_result)
+        self._files[relative_path] = static_file
+        return static_file
+
+    async def _read(self, path: str, stat_result: os.stat_result) -> bytes:
+        key = f"{path}:{stat_result.st_mtime_ns}:{stat_result.st_size}"
+        body = self._memory.get(key)
+        if body is None:
+            body = await asyncio.to_thread(_read_file, path)
+            self._memory.set(key, body, float("inf"))
+        return body
+
+    async def response(
+        self, request: Request, relative_path: str, immutable: bool = False
+    ) -> Response:
+        """
+        Build the response for a file below the root directory.
+
+        Args:
+            request: The incoming request, for its conditional and
+                Accept-Encoding headers
+            relative_path: Path of the file relative to the root directory
+            immutable: Whether the file name is content-hashed, allowing
+                clients to cache it for a year without revalidating
+
+        Raises:
+            HTTPException: 404 if there is no such file
+        """
+        static_file = self.resolve(relative_path)
+        if static_file is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+
+        encoding = None
+        if static_file.variants:
+            encoding = negotiate_encoding(
+                request.headers.get("accept-encoding", ""),
+                tuple(static_file.variants),
+            )
+        etag = static_file.etag_for(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": (
+                IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+            ),
+            "Last-Modified": static_file.last_modified,
+        }
+        if static_file.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        path, stat_result = static_file.path, static_file.stat_result
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            path, stat_result = static_file.variants[encoding]
+
+        if stat_result.st_size <= self.memory_max_file_bytes:
+            body = await self._read(path, stat_result)
+            return Response(body, headers=headers, media_type=static_file.media_type)
+        return FileResponse(
+            path,
+            headers=headers,
+            media_type=static_file.media_type,
+            stat_result=stat_result,
+        )
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+static_dir = StaticDirectory(
+    env.STATIC_DIR,
+    memory_max_bytes=env.STATIC_MEMORY_BYTES,
+    memory_max_file_bytes=env.STATIC_MEMORY_MAX_FILE_BYTES,
+)
@@ -0,0 +1,32 @@
+import os
+import sqlite3
+
+from config import check_env_vars
+
+# Global configuration
+env = check_env_vars()
+
+
+def data_path(filename: str) -> str:
+    """Return the path of a file in the shared data directory."""
+    return os.path.join(env.DATA_DIR, filename)
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database shared between uvicorn worker processes.
+
+    WAL mode lets readers proceed while another worker writes, and the busy
+    timeout makes concurrent writers wait instead of failing immediately.
+    The connection is in autocommit mode; use explicit BEGIN for transactions.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(
+        path, timeout=30.0, isolation_level=None, check_same_thread=False
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
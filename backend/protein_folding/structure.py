@@ -0,0 +1,693 @@
+import re
+from operator import itemgetter
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Fixed-width PDB ATOM/HETATM columns as zero-based [start, end) slices
+PDB_RECORD = (0, 6)
+PDB_ATOM_NAME = (12, 16)
+PDB_RES_NAME = (17, 20)
+PDB_CHAIN_ID = (21, 22)
+PDB_RES_SEQ = (22, 26)
+PDB_INS_CODE = (26, 27)
+PDB_X = (30, 38)
+PDB_Y = (38, 46)
+PDB_Z = (46, 54)
+PDB_B_FACTOR = (60, 66)
+
+# Columns past the B-factor (occupancy aside, only element and charge) are unused
+PDB_LINE_WIDTH = PDB_B_FACTOR[1]
+
+# The _atom_site loop header: "loop_" followed by its "_atom_site." tags
+MMCIF_ATOM_SITE_LOOP = re.compile(
+    r"^loop_[ \t]*\r?\n((?:[ \t]*_atom_site\.[^\n]*\n)+)", re.MULTILINE
+)
+# One CIF value: a quoted string (closed by a quote followed by whitespace),
+# the start of a comment, or a bare word
+MMCIF_TOKEN = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(#)|(\S+)""")
+MMCIF_RESERVED = ("loop_", "data_", "save_", "global_", "stop_")
+# Starts of lines that begin a new tag or block, i.e. end a loop
+MMCIF_LOOP_END_WORDS = (b"_", *(word.encode() for word in MMCIF_RESERVED))
+MMCIF_LOOP_END_CHARS = np.frombuffer(b"_lLdDsSgG", dtype=np.uint8)
+MMCIF_NULLS = (b"?", b".")
+
+# mmCIF text is parsed a chunk at a time and tokenized rows are converted to
+# arrays in batches, so no per-line copy of the whole file exists
+MMCIF_CHUNK_CHARS = 1 << 18
+MMCIF_BATCH_ROWS = 8192
+
+# Structure fields and the _atom_site tags they are read from, by preference
+MMCIF_TAGS = {
+    "hetero": ("group_PDB",),
+    "atom_names": ("label_atom_id", "auth_atom_id"),
+    "res_names": ("label_comp_id", "auth_comp_id"),
+    "chain_ids": ("auth_asym_id", "label_asym_id"),
+    "res_seq": ("auth_seq_id", "label_seq_id"),
+    "ins_codes": ("pdbx_PDB_ins_code",),
+    "x": ("Cartn_x",),
+    "y": ("Cartn_y",),
+    "z": ("Cartn_z",),
+    "b_factors": ("B_iso_or_equiv",),
+}
+MMCIF_NUMBERS = ("res_seq", "x", "y", "z", "b_factors")
+
+SPACE, NEWLINE, CARRIAGE_RETURN = ord(" "), ord("\n"), ord("\r")
+QUOTE, DOUBLE_QUOTE, SEMICOLON, HASH = ord("'"), ord('"'), ord(";"), ord("#")
+PLUS, MINUS, DOT, ZERO, NINE = ord("+"), ord("-"), ord("."), ord("0"), ord("9")
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+# A Structure field, or a function decoding it on first access
+Field = Union[np.ndarray, Callable[[], np.ndarray]]
+
+
+def _line_table(text: str, prefixes: Tuple[str, ...]) -> np.ndarray:
+    """
+    Pack the lines of `text` starting with one of `prefixes` into a byte table.
+
+    Lines are located with array operations and copied in one gather through a
+    sliding-window view of the text, so there is no Python loop per line.
+
+    Returns:
+        (n_lines, PDB_LINE_WIDTH) uint8 table of the leading columns of each
+        line, blank-padded past the end of short lines
+    """
+    buffer = np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8)
+
+    newlines = np.flatnonzero(buffer == NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buffer)]))
+
+    if starts[-1] + PDB_LINE_WIDTH > len(buffer):
+        # Pad so a full-width window fits at every line start
+        buffer = np.concatenate(
+            (buffer, np.full(PDB_LINE_WIDTH, SPACE, dtype=np.uint8))
+        )
+    ends -= (ends > starts) & (buffer[np.maximum(ends - 1, 0)] == CARRIAGE_RETURN)
+
+    selected = np.zeros(len(starts), dtype=bool)
+    for prefix in prefixes:
+        matches = np.ones(len(starts), dtype=bool)
+        for offset, char in enumerate(prefix.encode()):
+            matches &= buffer[starts + offset] == char
+        selected |= matches
+    starts, ends = starts[selected], ends[selected]
+
+    windows = np.lib.stride_tricks.sliding_window_view(buffer, PDB_LINE_WIDTH)
+    table = windows[starts]
+    # Short lines picked up the start of the next line; blank those bytes
+    lengths = ends - starts
+    short = np.flatnonzero(lengths < PDB_LINE_WIDTH)
+    if len(short):
+        table[short] = np.where(
+            np.arange(PDB_LINE_WIDTH) >= lengths[short, None], SPACE, table[short]
+        )
+    return table
+
+
+def _column(table: np.ndarray, span: Tuple[int, int]) -> np.ndarray:
+    """
+    Cut a fixed-width column out of a line table as a (width, n_lines) table.
+
+    The result is position-major, so each character position of the column is
+    one contiguous array.
+    """
+    return np.ascontiguousarray(table[:, span[0] : span[1]].T)
+
+
+def _parse_decimals(table: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse blank-padded decimal numbers in a position-major byte table.
+
+    Runs a small state machine over the character positions, accumulating
+    digits with integer arithmetic and dividing by a power of ten once, which
+    yields the same correctly rounded float64 as `float()`.
+
+    Returns:
+        Parsed values, and a mask of fields that are well-formed decimals
+    """
+    width, n = table.shape
+    # Up to 9 digits fit in int32, which halves the memory traffic
+    mantissa = np.zeros(n, dtype=np.int32 if width <= 9 else np.int64)
+    decimals = np.zeros(n, dtype=np.int8)
+    valid = np.ones(n, dtype=bool)
+    negative = np.zeros(n, dtype=bool)
+    any_digit = np.zeros(n, dtype=bool)
+    seen_dot = np.zeros(n, dtype=bool)
+    started = np.zeros(n, dtype=bool)
+    ended = np.zeros(n, dtype=bool)
+
+    for char in table:
+        digit = (char >= ZERO) & (char <= NINE)
+        dot = char == DOT
+        minus = char == MINUS
+        sign = minus | (char == PLUS)
+        blank = char == SPACE
+
+        # One token: optional leading sign, digits, at most one decimal point
+        valid &= digit | dot | sign | blank
+        valid &= ~(ended & ~blank) & ~(sign & started) & ~(dot & seen_dot)
+
+        mantissa = np.where(digit, mantissa * 10 + (char - ZERO), mantissa)
+        decimals += digit & seen_dot
+        negative |= minus
+        any_digit |= digit
+        seen_dot |= dot
+        ended |= started & blank
+        started |= ~blank
+
+    values = mantissa / POWERS_OF_TEN[np.minimum(decimals, 18)]
+    values[negative] *= -1
+    return values, valid & any_digit & (decimals <= 18)
+
+
+def _parse_floats(table: np.ndarray) -> np.ndarray:
+    """Parse a float column, using NaN for fields that are not numbers."""
+    values, valid = _parse_decimals(table)
+    for i in np.flatnonzero(~valid):
+        # Rare malformed or exotic fields (e.g. exponents): parse one at a time
+        try:
+            values[i] = float(table[:, i].tobytes())
+        except ValueError:
+            values[i] = np.nan
+    return values
+
+
+def _parse_ints(table: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse an integer column, returning the values and a mask of valid fields."""
+    values, valid = _parse_decimals(table)
+    valid &= ~(table == DOT).any(axis=0)
+    return values.astype(np.int32), valid
+
+
+def _strip_text(table: np.ndarray) -> np.ndarray:
+    """Strip blanks from a position-major text column, returning byte strings."""
+    width, n = table.shape
+    # Shift the first non-blank character of each field to position 0
+    lead = np.full(n, width)
+    for position in range(width - 1, -1, -1):
+        lead[table[position] != SPACE] = position
+    rows = np.arange(n)
+    stripped = np.zeros((n, width), dtype=np.uint8)
+    for position in range(width):
+        source = lead + position
+        stripped[:, position] = table[np.minimum(source, width - 1), rows]
+        stripped[source >= width, position] = 0
+    # Trailing NUL bytes are dropped by NumPy's fixed-width bytes dtype
+    stripped[stripped == SPACE] = 0
+    return stripped.view(f"S{width}").ravel()
+
+
+def _cif_tokens(line: str) -> List[str]:
+    """Split one line of CIF into values, unquoting them and dropping comments."""
+    tokens = []
+    for match in MMCIF_TOKEN.finditer(line):
+        single, double, comment, bare = match.groups()
+        if comment is not None:
+            break
+        tokens.append(
+            bare if bare is not None else single if single is not None else double
+        )
+    return tokens
+
+
+def _ends_loop(token: str) -> bool:
+    return token.startswith("_") or token.lower().startswith(MMCIF_RESERVED)
+
+
+def _cif_chunks(text: str, start: int) -> Iterator[str]:
+    """Yield `text[start:]` in pieces of whole lines of about MMCIF_CHUNK_CHARS."""
+    while start < len(text):
+        end = text.find("\n", start + MMCIF_CHUNK_CHARS)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+
+def _cif_loop_rows(
+    text: str, start: int, width: int, pick: Callable[[List[str]], Tuple]
+) -> Iterator[List[Tuple]]:
+    """
+    Yield the rows of a CIF loop in batches, keeping the values `pick` selects.
+
+    Reads from offset `start` (the line after the loop header) until the next
+    tag, reserved word or end of text. Rows may span lines, and values may be
+    quoted or semicolon-delimited text fields.
+
+    Args:
+        text: CIF text
+        start: Offset of the first line of loop values
+        width: Number of tags in the loop
+        pick: Selects the wanted values from a row of `width` values
+    """
+    batch: List[Tuple] = []
+    pending: List[str] = []
+    text_field: Optional[List[str]] = None
+
+    for chunk in _cif_chunks(text, start):
+        for line in chunk.splitlines():
+            if text_field is not None:
+                if not line.startswith(";"):
+                    text_field.append(line)
+                    continue
+                tokens = ["\n".join(text_field), *_cif_tokens(line[1:])]
+                text_field = None
+            elif line.startswith(";"):
+                text_field = [line[1:]]
+                continue
+            else:
+                tokens = _cif_tokens(line)
+
+            for token in tokens:
+                if not pending and _ends_loop(token):
+                    if batch:
+                        yield batch
+                    return
+                pending.append(token)
+                if len(pending) == width:
+                    batch.append(pick(pending))
+                    pending = []
+            if len(batch) >= MMCIF_BATCH_ROWS:
+                yield batch
+                batch = []
+
+    if batch:
+        yield batch
+
+
+def _text_array(values: Tuple[str, ...]) -> np.ndarray:
+    """Convert CIF text values to byte strings, mapping "?" and "." to b""."""
+    array = np.array(values, dtype=np.bytes_)
+    return np.where(np.isin(array, MMCIF_NULLS), b"", array)
+
+
+def _number_array(values: Tuple[str, ...]) -> np.ndarray:
+    """Convert CIF numeric values to float64, using NaN for non-numbers."""
+    try:
+        return np.array(values).astype(np.float64)
+    except ValueError:
+        numbers = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                numbers[i] = float(value)
+            except ValueError:
+                pass
+        return numbers
+
+
+def _missing_field(field: str, n: int) -> np.ndarray:
+    """Fill value for a Structure field whose _atom_site column is absent."""
+    if field in MMCIF_NUMBERS:
+        return np.full(n, np.nan)
+    return np.zeros(n, dtype="S1")
+
+
+def _mmcif_fields(values: Dict[str, Tuple[str, ...]], n: int) -> Dict[str, Field]:
+    """Convert a batch of tokenized _atom_site columns to field arrays."""
+    fields: Dict[str, Field] = {}
+    for field in MMCIF_TAGS:
+        if field not in values:
+            fields[field] = _missing_field(field, n)
+        elif field in MMCIF_NUMBERS:
+            fields[field] = _number_array(values[field])
+        else:
+            fields[field] = _text_array(values[field])
+    return fields
+
+
+def _loop_end(buffer: np.ndarray) -> Optional[int]:
+    """Offset of the first line in `buffer` that starts a tag or block, if any."""
+    heads = np.flatnonzero(buffer[:-1] == NEWLINE) + 1
+    for head in heads[np.isin(buffer[heads], MMCIF_LOOP_END_CHARS)].tolist():
+        if buffer[head : head + 8].tobytes().lower().startswith(MMCIF_LOOP_END_WORDS):
+            return head
+    return None
+
+
+def _token_column(
+    buffer: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> np.ndarray:
+    """Gather tokens into a blank-padded, position-major (width, n) byte table."""
+    lengths = ends - starts
+    width = max(int(lengths.max(initial=1)), 1)
+    positions = np.arange(width)[:, None]
+    table = buffer[np.minimum(starts + positions, len(buffer) - 1)]
+    table[positions >= lengths] = SPACE
+    return table
+
+
+def _token_text(table: np.ndarray) -> np.ndarray:
+    """Convert a position-major table of bare tokens to byte strings."""
+    rows = np.ascontiguousarray(np.where(table == SPACE, 0, table).T)
+    text = rows.view(f"S{len(table)}").ravel()
+    return np.where(np.isin(text, MMCIF_NULLS), b"", text)
+
+
+def _row_picker(columns: Dict[str, int]) -> Callable[[List[str]], Tuple]:
+    """Select the values of `columns` from a row, always returning a tuple."""
+    indices = list(columns.values())
+    if len(indices) == 1:
+        return lambda row: (row[indices[0]],)
+    return itemgetter(*indices)
+
+
+def _split_chunk(
+    buffer: np.ndarray, width: int, columns: Dict[str, int]
+) -> Tuple[Dict[str, Field], np.ndarray]:
+    """
+    Split a chunk of bare CIF values on whitespace with array operations.
+
+    Rows need not follow lines. Values are decoded with the same fixed-width
+    parsers as PDB columns; columns other than the residue number are kept as
+    gathered byte tables and decoded on first access.
+
+    Returns:
+        Fields of the complete rows, and the bytes of a trailing partial row
+    """
+    comments = np.flatnonzero(buffer == HASH)
+    if len(comments):
+        # Blank out comment lines
+        newlines = np.flatnonzero(buffer == NEWLINE)
+        for comment in comments:
+            buffer[comment : newlines[np.searchsorted(newlines, comment)]] = SPACE
+
+    blank = buffer <= SPACE
+    change = blank[1:] != blank[:-1]
+    token_starts = np.flatnonzero(change & blank[:-1]) + 1
+    token_ends = np.flatnonzero(change & blank[1:]) + 1
+    n = len(token_starts) // width
+    carry = (
+        buffer[token_starts[n * width] : -1]
+        if n * width < len(token_starts)
+        else buffer[:0]
+    )
+    token_starts = token_starts[: n * width].reshape(n, width)
+    token_ends = token_ends[: n * width].reshape(n, width)
+
+    fields: Dict[str, Field] = {}
+    for field in MMCIF_TAGS:
+        if field not in columns:
+            fields[field] = _missing_field(field, n)
+            continue
+        index = columns[field]
+        table = _token_column(buffer, token_starts[:, index], token_ends[:, index])
+        if field == "res_seq":
+            values, valid = _parse_ints(table)
+            fields[field] = np.where(valid, values, np.nan)
+        elif field in MMCIF_NUMBERS:
+            fields[field] = partial(_parse_floats, table)
+        else:
+            fields[field] = partial(_token_text, table)
+    return fields, carry
+
+
+def _tokenize_chunk(
+    buffer: np.ndarray, width: int, columns: Dict[str, int]
+) -> Tuple[Dict[str, Field], np.ndarray]:
+    """
+    Tokenize a chunk of CIF values with quoting or comments, line by line.
+
+    Lines without quotes or comments are split directly; the others go
+    through the CIF token pattern.
+
+    Returns:
+        Fields of the complete rows, and the bytes of a trailing partial row
+    """
+    pick = _row_picker(columns)
+    text = buffer.tobytes().decode("ascii")
+    rows: List[Tuple] = []
+    pending: List[str] = []
+    # Line offset and token index where the pending row starts
+    pending_start = (0, 0)
+    offset = 0
+    for line in text.split("\n"):
+        if "'" in line or '"' in line or "#" in line:
+            tokens = _cif_tokens(line)
+        else:
+            tokens = line.split()
+            if len(tokens) == width and not pending:
+                rows.append(pick(tokens))
+                offset += len(line) + 1
+                continue
+        for index, token in enumerate(tokens):
+            if not pending:
+                pending_start = (offset, index)
+            pending.append(token)
+            if len(pending) == width:
+                rows.append(pick(pending))
+                pending = []
+        offset += len(line) + 1
+
+    carry = buffer[:0]
+    if pending:
+        line_start, index = pending_start
+        line = text[line_start : text.index("\n", line_start)]
+        spans = [match.start() for match in MMCIF_TOKEN.finditer(line)]
+        carry = buffer[line_start + spans[index] : -1]
+    return _mmcif_fields(dict(zip(columns, zip(*rows))), len(rows)), carry
+
+
+def _atom_site_chunks(
+    text: str, start: int, width: int, columns: Dict[str, int]
+) -> Optional[List[Dict[str, Field]]]:
+    """
+    Parse the values of a CIF loop a chunk at a time.
+
+    Chunks of bare values are split with array operations, and chunks with
+    quoted values or comments are tokenized line by line. Rows cut off by a
+    chunk boundary carry over to the next chunk.
+
+    Args:
+        text: CIF text
+        start: Offset of the first line of loop values
+        width: Number of tags in the loop
+        columns: Structure field to its column index in the loop
+
+    Returns:
+        Fields per chunk, or None if the loop has semicolon text fields and
+        needs the full tokenizer
+    """
+    newline = np.array([NEWLINE], dtype=np.uint8)
+    carry = newline[:0]
+    batches = []
+    for chunk in _cif_chunks(text, start):
+        encoded = np.frombuffer(chunk.encode("ascii", "replace"), dtype=np.uint8)
+        # Framing the chunk with newlines puts a blank before and after every
+        # token, and makes every line start follow a newline
+        buffer = np.concatenate((newline, carry, encoded, newline))
+        end = _loop_end(buffer)
+        if end is not None:
+            buffer = buffer[:end]
+
+        if (buffer[np.flatnonzero(buffer == SEMICOLON) - 1] == NEWLINE).any():
+            return None
+        if (
+            (buffer == QUOTE).any()
+            or (buffer == DOUBLE_QUOTE).any()
+            or (buffer[np.flatnonzero(buffer == HASH) - 1] != NEWLINE).any()
+        ):
+            fields, carry = _tokenize_chunk(buffer, width, columns)
+        else:
+            fields, carry = _split_chunk(buffer, width, columns)
+        batches.append(fields)
+        if end is not None:
+            break
+    return batches
+
+
+def _joined(parts: List[Field], rows: np.ndarray) -> Callable[[], np.ndarray]:
+    """Decode and join the chunks of a column on first use, keeping `rows`."""
+
+    def decode() -> np.ndarray:
+        chunks = [part() if callable(part) else part for part in parts]
+        return np.concatenate(chunks)[rows]
+
+    return decode
+
+
+def _pdb_coords(table: np.ndarray) -> np.ndarray:
+    """Parse the x, y, z columns into an (n_lines, 3) float32 array."""
+    return np.stack(
+        [_parse_floats(_column(table, span)) for span in (PDB_X, PDB_Y, PDB_Z)],
+        axis=1,
+    ).astype(np.float32)
+
+
+# Decoders for the fields of a Structure, applied to its PDB line table
+PDB_FIELDS = {
+    "hetero": lambda table: (
+        table[:, :6] == np.frombuffer(b"HETATM", dtype=np.uint8)
+    ).all(axis=1),
+    "atom_names": lambda table: _strip_text(_column(table, PDB_ATOM_NAME)),
+    "res_names": lambda table: _strip_text(_column(table, PDB_RES_NAME)),
+    "chain_ids": lambda table: _strip_text(_column(table, PDB_CHAIN_ID)),
+    "ins_codes": lambda table: _strip_text(_column(table, PDB_INS_CODE)),
+    "coords": _pdb_coords,
+    "b_factors": lambda table: _parse_floats(_column(table, PDB_B_FACTOR)),
+}
+
+
+class Structure:
+    """
+    Atoms of a protein structure stored as parallel NumPy arrays.
+
+    One entry per ATOM/HETATM record, in file order:
+
+    - hetero: bool, True for HETATM records
+    - atom_names, res_names, chain_ids: stripped byte strings (e.g. b"CA")
+    - res_seq: int32 residue numbers
+    - ins_codes: byte strings, b"" when absent
+    - coords: float32, shape (n_atoms, 3)
+    - b_factors: float64, NaN when absent
+
+    Residues are runs of consecutive atoms sharing (chain id, residue number,
+    insertion code). Parsers keep fields other than `res_seq` in a compact
+    raw form and decode each on first access, so callers only pay for the
+    fields they use.
+    """
+
+    __slots__ = ("res_seq", "_fields")
+
+    def __init__(self, res_seq: np.ndarray, **fields: Field):
+        self.res_seq = res_seq
+        self._fields = fields
+
+    def _field(self, name: str) -> np.ndarray:
+        value = self._fields[name]
+        if callable(value):
+            value = self._fields[name] = value()
+        return value
+
+    hetero = property(lambda self: self._field("hetero"))
+    atom_names = property(lambda self: self._field("atom_names"))
+    res_names = property(lambda self: self._field("res_names"))
+    chain_ids = property(lambda self: self._field("chain_ids"))
+    ins_codes = property(lambda self: self._field("ins_codes"))
+    coords = property(lambda self: self._field("coords"))
+    b_factors = property(lambda self: self._field("b_factors"))
+
+    def __len__(self) -> int:
+        return len(self.res_seq)
+
+    def __repr__(self) -> str:
+        return (
+            f"Structure(atoms={len(self)}, residues={len(self.residue_starts())}, "
+            f"chains={len(np.unique(self.chain_ids))})"
+        )
+
+    @classmethod
+    def from_pdb(cls, pdb: str) -> "Structure":
+        """
+        Parse the ATOM/HETATM records of a PDB string.
+
+        Atom records are packed into a fixed-width byte table and columns are
+        decoded with array operations, without a Python loop per line.
+        Records whose residue number cannot be parsed are dropped.
+
+        Args:
+            pdb: PDB format string
+
+        Returns:
+            Structure with one entry per atom record
+        """
+        table = _line_table(pdb, ("ATOM", "HETATM"))
+        res_seq, valid = _parse_ints(_column(table, PDB_RES_SEQ))
+        table = table[valid]
+        return cls(
+            res_seq[valid],
+            **{name: partial(decode, table) for name, decode in PDB_FIELDS.items()},
+        )
+
+    @classmethod
+    def from_mmcif(cls, mmcif: str) -> "Structure":
+        """
+        Parse the _atom_site loop of an mmCIF string.
+
+        The loop is tokenized in a single streaming pass that keeps only the
+        columns a Structure needs. Loops of bare values are split with array
+        operations; quoted values and text fields go through a full CIF
+        tokenizer. Chains and residue numbers come from the auth_* columns
+        when present, falling back to label_*. Atoms without an integer
+        residue number are dropped.
+
+        Args:
+            mmcif: mmCIF format string
+
+        Returns:
+            Structure with one entry per atom record
+        """
+        header = MMCIF_ATOM_SITE_LOOP.search(mmcif)
+        tags = [
+            tag[len("_atom_site.") :]
+            for tag in (header.group(1).split() if header else [])
+            if tag.startswith("_atom_site.")
+        ]
+        columns = {}
+        for field, candidates in MMCIF_TAGS.items():
+            for candidate in candidates:
+                if candidate in tags:
+                    columns[field] = tags.index(candidate)
+                    break
+
+        batches = None
+        if columns:
+            width = len(tags)
+            batches = _atom_site_chunks(mmcif, header.end(), width, columns)
+            if batches is None:
+                rows = _cif_loop_rows(mmcif, header.end(), width, _row_picker(columns))
+                batches = [
+                    _mmcif_fields(dict(zip(columns, zip(*batch))), len(batch))
+                    for batch in rows
+                ]
+        if not batches:
+            batches = [_mmcif_fields({}, 0)]
+
+        res_seq = np.concatenate([batch["res_seq"] for batch in batches])
+        valid = ~np.isnan(res_seq) & (res_seq == np.round(res_seq))
+        fields = {
+            field: _joined([batch[field] for batch in batches], valid)
+            for field in MMCIF_TAGS
+        }
+        return cls(
+            res_seq[valid].astype(np.int32),
+            hetero=lambda: fields["hetero"]() == b"HETATM",
+            atom_names=fields["atom_names"],
+            res_names=fields["res_names"],
+            chain_ids=fields["chain_ids"],
+            ins_codes=fields["ins_codes"],
+            coords=lambda: np.stack(
+                [fields["x"](), fields["y"](), fields["z"]()], axis=1
+            ).astype(np.float32),
+            b_factors=fields["b_factors"],
+        )
+
+    def residue_starts(self) -> np.ndarray:
+        """Indices of the first atom of every residue."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.intp)
+        changed = (
+            (self.chain_ids[1:] != self.chain_ids[:-1])
+            | (self.res_seq[1:] != self.res_seq[:-1])
+            | (self.ins_codes[1:] != self.ins_codes[:-1])
+        )
+        return np.concatenate(([0], np.flatnonzero(changed) + 1))
+
+    def residue_means(self, values: np.ndarray) -> np.ndarray:
+        """
+        Average a per-atom array over each residue, ignoring NaN entries.
+
+        Args:
+            values: Per-atom values, e.g. `b_factors`
+
+        Returns:
+            Per-residue means in residue order (NaN for residues without values)
+        """
+        starts = self.residue_starts()
+        if len(starts) == 0:
+            return np.zeros(0, dtype=np.float64)
+        present = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+        counts = np.add.reduceat(present.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
@@ -0,0 +1,277 @@
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import check_env_vars
+
+# Global configuration
+env = check_env_vars()
+
+TRACE_HEADER = "X-Trace-Id"
+# Incoming trace ids are honored only if they look like ours
+TRACE_ID_PATTERN = re.compile(r"^[0-9a-f]{8,32}$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+class Trace:
+    """The spans recorded for one request or background job."""
+
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.spans: List["Span"] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        root = self.spans[0]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": root.start,
+            "duration_ms": root.duration_ms,
+            "spans": [span.as_dict() for span in self.spans],
+        }
+
+
+class Span:
+    """A timed step of a trace. Use as a context manager."""
+
+    __slots__ = (
+        "trace",
+        "name",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start",
+        "duration_ms",
+        "error",
+        "_started",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        trace.spans.append(self)
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes known only once the step has run, e.g. a status code."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current_span.reset(self._token)
+        if self.parent_id is None:
+            recorder.record(self.trace)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span outside of a trace; does nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Start a child span of the current span.
+
+    Outside of a trace, which is always the case with tracing disabled, this
+    returns a shared no-op span, so instrumented code costs one context
+    variable lookup.
+
+    Args:
+        name: Step name, e.g. "upstream.post"
+        **attributes: JSON-serializable details of the step
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes: Any):
+    """
+    Start a new trace whose root span covers the block.
+
+    The trace is recorded when the root span ends. Returns a no-op span when
+    tracing is disabled.
+    """
+    if not env.TRACING_ENABLED:
+        return NOOP_SPAN
+    trace = Trace(trace_id or uuid.uuid4().hex, name)
+    return Span(trace, name, None, attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return None if current is None else current.trace.trace_id
+
+
+class TraceRecorder:
+    """
+    Keeps the latest finished traces of this worker in a ring buffer, and
+    optionally appends every trace as a JSON line to a file shared by all
+    workers.
+
+    Exported traces are written by a background thread, in batches, so the
+    event loop never waits on the file.
+    """
+
+    def __init__(self, capacity: int, export_path: Optional[str] = None):
+        self._traces: Deque[Trace] = deque(maxlen=capacity)
+        self.export_path = export_path
+        # Traces waiting for the exporter thread; None asks it to stop
+        self._exports: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = (
+            queue.SimpleQueue()
+        )
+        self._exporter: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace) -> None:
+        self._traces.append(trace)
+        if self.export_path:
+            self._start_exporter(self.export_path)
+            self._exports.put(trace.as_dict())
+
+    def _start_exporter(self, path: str) -> None:
+        with self._lock:
+            if self._exporter is None:
+                self._exporter = threading.Thread(
+                    target=self._export, args=(path,), name="trace-export", daemon=True
+                )
+                self._exporter.start()
+
+    def _export(self, path: str) -> None:
+        """Append queued traces to `path` until asked to stop."""
+        stopped = False
+        while not stopped:
+            batch = [self._exports.get()]
+            while True:
+                try:
+                    batch.append(self._exports.get_nowait())
+                except queue.Empty:
+                    break
+            stopped = None in batch
+            traces = [trace for trace in batch if trace is not None]
+            if not traces:
+                continue
+            lines = "".join(
+                json.dumps(trace, separators=(",", ":")) + "\n" for trace in traces
+            )
+            try:
+                with open(path, "a") as f:
+                    f.write(lines)
+            except OSError as e:
+                logging.warning(f"Could not export {len(traces)} traces: {e}")
+
+    def close(self) -> None:
+        """Write out the queued traces and stop the exporter thread."""
+        with self._lock:
+            exporter, self._exporter = self._exporter, None
+        if exporter is not None:
+            self._exports.put(None)
+            exporter.join()
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """The latest `limit` traces, newest first."""
+        traces = list(self._traces)[-limit:] if limit > 0 else []
+        return [trace.as_dict() for trace in reversed(traces)]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        for trace in reversed(self._traces):
+            if trace.trace_id == trace_id:
+                return trace.as_dict()
+        return None
+
+
+recorder = TraceRecorder(env.TRACE_BUFFER_SIZE, env.TRACE_EXPORT_PATH)
+
+
+class TracingMiddleware:
+    """
+    Wrap each HTTP request in a trace and return its id in X-Trace-Id.
+
+    A well-formed X-Trace-Id sent by the client is reused so traces can be
+    correlated with client logs.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = Headers(scope=scope).get(TRACE_HEADER, "").lower()
+        if not TRACE_ID_PATTERN.match(trace_id):
+            trace_id = uuid.uuid4().hex
+
+        with start_trace(
+            "request", trace_id, method=scope["method"], path=scope["path"]
+        ) as root:
+
+            async def send_with_trace_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    root.set(status=message["status"])
+                    MutableHeaders(scope=message)[TRACE_HEADER] = trace_id
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+            route = scope.get("route")
+            if route is not None:
+                root.set(route=route.path)
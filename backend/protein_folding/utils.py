@@ -1,5 +1,57 @@
-from typing import List
-from collections import defaultdict
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+# NumPy is imported by the functions that need it, keeping it off the import
+# path of the app: the FASTA helpers here are used at startup
+if TYPE_CHECKING:
+    import numpy as np
+
+    from protein_folding.structure import Structure
+
+
+def normalize_sequence(sequence: str) -> str:
+    """Normalize a protein sequence to the canonical form sent upstream."""
+    return sequence.strip().upper()
+
+
+def parse_fasta(fasta: str) -> List[Tuple[str, str]]:
+    """
+    Parse a multi-record FASTA string.
+
+    Sequence lines are joined per record and the record id is the first word
+    of the header. Records without a header or with an empty id are numbered
+    by position.
+
+    Args:
+        fasta: FASTA formatted text
+
+    Returns:
+        List of (record id, sequence) tuples in file order
+    """
+    records: List[Tuple[str, str]] = []
+    header = None
+    chunks: List[str] = []
+
+    def flush():
+        if header is not None or chunks:
+            record_id = header or f"record_{len(records) + 1}"
+            records.append((record_id, "".join(chunks)))
+
+    for line in fasta.splitlines():
+        line = line.strip()
+        if not line or line.startswith(";"):
+            continue
+        if line.startswith(">"):
+            flush()
+            fields = line[1:].split(maxsplit=1)
+            header = fields[0] if fields else ""
+            chunks = []
+        else:
+            chunks.append(line)
+    flush()
+
+    return records
 
 
 def calculate_plddt(protein_structure: str) -> List[float]:
@@ -30,7 +82,8 @@ def calculate_plddt_from_pdb(protein_structure: str) -> List[float]:
     Extract pLDDT scores from a PDB structure string.
 
     In AlphaFold/ESMFold PDB files, the B-factor column contains pLDDT scores.
-    This function extracts and averages these scores per residue.
+    This function extracts and averages these scores per residue, using the
+    vectorized `Structure` parser.
 
     Args:
         protein_structure: PDB format string containing the protein structure
@@ -38,34 +91,23 @@ def calculate_plddt_from_pdb(protein_structure: str) -> List[float]:
     Returns:
         List of pLDDT scores (0-100) ordered by residue index
     """
-    # Map to collect pLDDT scores per residue (1-based indexing)
-    residue_to_scores = defaultdict(list)
-
-    for line in protein_structure.splitlines():
-        if line.startswith("ATOM"):
-            # In a PDB file:
-            # - Columns 23-26 (indices 22:26 in zero-based Python indexing)
-            #   contain the residue index
-            # - Columns 61-66 (indices 60:66 in zero-based Python indexing)
-            #   contain the temperature factor (B-factor) field,
-            #   which is used to store the pLDDT score in the case of AlphaFold/ESMFold
-            #   Since the plddt is assigned to multiple atoms in a residue, we take the average
-            try:
-                # ESMFold stores pLDDT as values between 0 and 1, need to multiply by 100
-                score = float(line[60:66].strip()) * 100
-                residue_idx = int(line[22:26].strip())
-                residue_to_scores[residue_idx].append(score)
-            except (ValueError, IndexError):
-                # Skip lines with parsing errors
-                continue
-
-    plddt_scores = []
-    for residue_idx in sorted(residue_to_scores.keys()):
-        scores = residue_to_scores[residue_idx]
-        avg_score = sum(scores) / len(scores)
-        plddt_scores.append(avg_score)
-
-    return plddt_scores
+    import numpy as np
+
+    from protein_folding.structure import Structure
+
+    structure = Structure.from_pdb(protein_structure)
+
+    # Only ATOM records with a pLDDT in the B-factor column (columns 61-66)
+    atoms = ~structure.hetero & ~np.isnan(structure.b_factors)
+
+    # Since the plddt is assigned to multiple atoms in a residue, we take the
+    # average, grouping atoms by residue number (columns 23-26)
+    _, residue_index = np.unique(structure.res_seq[atoms], return_inverse=True)
+    # ESMFold stores pLDDT as values between 0 and 1, need to multiply by 100
+    sums = np.bincount(residue_index, weights=structure.b_factors[atoms] * 100)
+    counts = np.bincount(residue_index)
+
+    return (sums / counts).tolist()
 
 
 def calculate_plddt_from_mmcif(mmcif_structure: str) -> List[float]:
@@ -73,87 +115,86 @@ def calculate_plddt_from_mmcif(mmcif_structure: str) -> List[float]:
     Extract pLDDT scores from an mmCIF structure string.
 
     In mmCIF format, pLDDT scores are stored in the B-factor equivalent field
-    (_atom_site.B_iso_or_equiv). This function extracts and averages these scores per residue.
+    (_atom_site.B_iso_or_equiv). This function extracts and averages these scores
+    per residue, where residues are keyed by chain, residue number and insertion
+    code, so chains and ligands are never merged.
 
     Args:
         mmcif_structure: mmCIF format string containing the protein structure
 
     Returns:
-        List of pLDDT scores (0-100) ordered by residue index
+        List of pLDDT scores (0-100) ordered as the residues appear in the file
     """
-    lines = mmcif_structure.splitlines()
-
-    # Find the _atom_site loop section
-    atom_site_start = None
-    atom_site_headers = []
-
-    for i, line in enumerate(lines):
-        if line.strip().startswith("_atom_site."):
-            if atom_site_start is None:
-                atom_site_start = i
-            atom_site_headers.append(line.strip())
-        elif atom_site_start is not None and (
-            line.startswith("ATOM") or line.startswith("HETATM")
-        ):
-            break
-        elif (
-            atom_site_start is not None
-            and line.strip()
-            and not line.strip().startswith("_atom_site.")
-        ):
-            break
-
-    if atom_site_start is None:
-        return []
-
-    # Find column indices for residue number and B-factor
-    auth_seq_id_idx = None
-    b_iso_idx = None
-
-    for i, header in enumerate(atom_site_headers):
-        if header == "_atom_site.auth_seq_id":
-            auth_seq_id_idx = i
-        elif header == "_atom_site.B_iso_or_equiv":
-            b_iso_idx = i
-
-    if auth_seq_id_idx is None or b_iso_idx is None:
-        return []
-
-    # Extract data from atom site records
-    residue_to_scores = defaultdict(list)
-
-    # Find where the data starts (after headers)
-    data_start = atom_site_start + len(atom_site_headers)
-
-    for line in lines[data_start:]:
-        line = line.strip()
-        if not line or line.startswith("#") or line.startswith("_"):
-            continue
-        if line.startswith("loop_") or line.startswith("data_"):
-            break
+    from protein_folding.structure import Structure
 
-        # Split the line into fields
-        fields = line.split()
+    return calculate_residue_plddt(Structure.from_mmcif(mmcif_structure))
 
-        if len(fields) <= max(auth_seq_id_idx, b_iso_idx):
-            continue
 
-        try:
-            residue_idx = int(fields[auth_seq_id_idx])
-            # Boltz2 might store pLDDT as 0-1 or 0-100, check the range
-            b_factor = float(fields[b_iso_idx])
-            # If B-factor is between 0-1, multiply by 100 to get pLDDT percentage
-            if b_factor <= 1.0:
-                b_factor *= 100
-            residue_to_scores[residue_idx].append(b_factor)
-        except (ValueError, IndexError):
-            continue
+def calculate_mmcif_plddt(
+    mmcif_structure: str,
+) -> Tuple[List[float], Dict[str, List[float]]]:
+    """
+    Parse an mmCIF structure once and extract its pLDDT overall and per chain.
+
+    A plain module-level function, so it can run in a process pool.
+
+    Args:
+        mmcif_structure: mmCIF format string containing the structure
+
+    Returns:
+        The per-residue pLDDT scores (0-100) and those of each chain
+    """
+    from protein_folding.structure import Structure
+
+    structure = Structure.from_mmcif(mmcif_structure)
+    return calculate_residue_plddt(structure), calculate_chain_plddt(structure)
+
+
+def calculate_residue_plddt(structure: Structure) -> List[float]:
+    """
+    Average the pLDDT scores of a parsed structure per residue.
+
+    Args:
+        structure: Structure with pLDDT in its B-factors
+
+    Returns:
+        List of pLDDT scores (0-100) in residue order, skipping residues
+        without scores
+    """
+    scores, _ = _residue_plddt(structure)
+    return scores.tolist()
+
+
+def calculate_chain_plddt(structure: Structure) -> Dict[str, List[float]]:
+    """
+    Average the pLDDT scores of a parsed structure per residue, for each chain.
+
+    Args:
+        structure: Structure with pLDDT in its B-factors
+
+    Returns:
+        Chain id to its per-residue pLDDT scores (0-100), in file order
+    """
+    scores, chain_ids = _residue_plddt(structure)
+    by_chain: Dict[str, List[float]] = {}
+    for chain_id in dict.fromkeys(chain_ids.tolist()):
+        by_chain[chain_id.decode()] = scores[chain_ids == chain_id].tolist()
+    return by_chain
+
+
+def scale_plddt(b_factors: np.ndarray) -> np.ndarray:
+    """pLDDT (0-100) of atoms from their B-factors."""
+    import numpy as np
+
+    # Boltz2 might store pLDDT as 0-1 or 0-100: scale values up to 1.0
+    return np.where(b_factors <= 1.0, b_factors * 100, b_factors)
+
 
-    # Calculate average pLDDT per residue and return sorted list
-    plddt_scores = []
-    for residue_idx in sorted(residue_to_scores.keys()):
-        scores = residue_to_scores[residue_idx]
-        avg_score = sum(scores) / len(scores)
-        plddt_scores.append(avg_score)
+def _residue_plddt(structure: Structure) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-residue pLDDT (0-100) and chain id of every residue that has scores."""
+    import numpy as np
 
-    return plddt_scores
+    scores = structure.residue_means(scale_plddt(structure.b_factors))
+    chain_ids = structure.chain_ids[structure.residue_starts()]
+    scored = ~np.isnan(scores)
+    return scores[scored], chain_ids[scored]
@@ -5,6 +5,8 @@ from invoke import exceptions
 from invoke.tasks import task
 import os
 import logging
+import shutil
+import gzip
 
 
 @task
@@ -24,9 +26,47 @@ def shell(ctx):
     ctx.run("bash", pty=True)
 
 
+def reset_metrics_dir():
+    """Give each server run a fresh Prometheus multiprocess directory."""
+    path = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR",
+        os.path.join(os.environ.get("DATA_DIR", "data"), "prometheus"),
+    )
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+@task
+def seed_dev_db(ctx):
+    """Migrate the database and add dummy users for development."""
+    import asyncio
+
+    from protein_folding.database import db
+
+    users = [
+        ("Alice", "alice@example.com"),
+        ("Bob", "bob@example.com"),
+        ("Charlie", "charlie@example.com"),
+    ]
+
+    async def seed():
+        await db.migrate()
+        await db.transaction(
+            lambda conn: conn.executemany(
+                "INSERT OR IGNORE INTO Users (name, email) VALUES (?, ?)", users
+            )
+        )
+        db.close()
+
+    asyncio.run(seed())
+    print("Dev Database setup completed")
+
+
 @task
 def serve_dev(ctx):
     port = os.environ.get("PORT", "8000")
+    reset_metrics_dir()
+    seed_dev_db(ctx)
     ctx.run(
         f"uvicorn main:app --reload --host 0.0.0.0 --port {port} --reload-dir . --reload-include '*.md' --http httptools --reload-delay 0.25 --workers 4",
         pty=True,
@@ -37,12 +77,63 @@ def serve_dev(ctx):
 def serve(ctx):
     port = os.environ.get("PORT", "10000")
     workers = os.environ.get("WORKERS", "4")
+    reset_metrics_dir()
     ctx.run(
         f"uvicorn main:app --host 0.0.0.0 --port {port} --workers {workers} --http httptools",
         pty=True,
     )
 
 
+# Compressible file types of the frontend build
+PRECOMPRESS_EXTENSIONS = (
+    ".html",
+    ".js",
+    ".mjs",
+    ".css",
+    ".json",
+    ".map",
+    ".svg",
+    ".txt",
+    ".wasm",
+    ".ico",
+)
+
+
+@task
+def precompress(ctx, directory="static", min_size=1024):
+    """
+    Write .br and .gz variants next to the compressible files of the build.
+
+    The static routes send them to clients that accept the encoding. A variant
+    is only kept if it is at least 10% smaller than its file.
+    """
+    import brotli
+
+    written = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if not filename.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                body = f.read()
+            if len(body) < int(min_size):
+                continue
+            variants = {
+                ".br": brotli.compress(body, quality=11),
+                ".gz": gzip.compress(body, compresslevel=9, mtime=0),
+            }
+            for suffix, compressed in variants.items():
+                if len(compressed) > len(body) * 0.9:
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+                    continue
+                with open(path + suffix, "wb") as f:
+                    f.write(compressed)
+                written += 1
+    logging.info(f"Wrote {written} precompressed files in {directory}")
+
+
 class PyLintHandler(FileSystemEventHandler):
     def __init__(self, ctx):
         self.ctx = ctx
@@ -0,0 +1,156 @@
+"""
+Fixtures serving the app and benchmarks.mock_upstream over real sockets.
+
+Settings are read once per process when the app modules are first imported,
+so the environment is set here, before any test imports them: state goes to
+a fresh DATA_DIR and upstream requests go to the mock.
+"""
+
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List
+
+import httpx
+import pytest
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_PORT = free_port()
+MOCK_URL = f"http://127.0.0.1:{MOCK_PORT}"
+DATA_DIR = tempfile.mkdtemp(prefix="pomelo-tests-")
+
+TEST_ENV = {
+    "NVIDIA_API_KEY": "test",
+    "DATA_DIR": DATA_DIR,
+    "PROMETHEUS_MULTIPROC_DIR": os.path.join(DATA_DIR, "prometheus"),
+    "NVIDIA_API_BASE_URL": MOCK_URL,
+    "NVCF_API_BASE_URL": MOCK_URL,
+    "LOOP_MONITOR_ENABLED": "false",
+    # Poll NVCF and other workers' leases quickly
+    "NVCF_POLL_SECONDS": "1",
+    "NVCF_POLL_INITIAL_DELAY": "0.05",
+    "NVCF_POLL_MAX_DELAY": "0.1",
+    "FOLD_LEASE_POLL_INTERVAL": "0.05",
+    # Budgets no test runs out of unless it drains them
+    "ESMFOLD_RATE_PER_MINUTE": "6000",
+    "ESMFOLD_RATE_BURST": "1000",
+    "BOLTZ2_RATE_PER_MINUTE": "6000",
+    "BOLTZ2_RATE_BURST": "1000",
+}
+os.environ.update(TEST_ENV)
+
+from benchmarks import mock_upstream  # noqa: E402
+from benchmarks.mock_upstream import MockConfig, MockUpstreamServer  # noqa: E402
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+def unique_sequence(length: int = 64) -> str:
+    """A sequence no other test folds, so it never hits the fold cache."""
+    rng = random.Random(uuid.uuid4().int)
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def upstream_calls() -> Dict[str, int]:
+    return httpx.get(f"{MOCK_URL}/mock/calls").json()
+
+
+def wait_for(condition, timeout: float = 10.0, interval: float = 0.01) -> bool:
+    """Poll `condition` until it holds or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return condition()
+
+
+@pytest.fixture(scope="session")
+def upstream() -> Iterator[MockUpstreamServer]:
+    with MockUpstreamServer(port=MOCK_PORT) as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream(upstream: MockUpstreamServer) -> Iterator[None]:
+    """Give each test the mock's default behaviour and zeroed call counts."""
+    mock_upstream.configure(**MockConfig().model_dump())
+    httpx.post(f"{upstream.url}/mock/reset")
+    yield
+
+
+@pytest.fixture(scope="session")
+def app_url(upstream: MockUpstreamServer) -> Iterator[str]:
+    """The app, served by uvicorn in a thread of the test process."""
+    import main
+
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    assert wait_for(lambda: server.started), "The app did not start"
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def worker_urls(upstream: MockUpstreamServer) -> Iterator[List[str]]:
+    """Two app processes sharing a fresh DATA_DIR, like two uvicorn workers."""
+    data_dir = tempfile.mkdtemp(prefix="pomelo-tests-workers-")
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(data_dir, "prometheus"),
+    }
+    ports = [free_port(), free_port()]
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+
+    def started(url: str) -> bool:
+        try:
+            return httpx.get(f"{url}/metrics").status_code == 200
+        except httpx.TransportError:
+            return False
+
+    try:
+        assert wait_for(
+            lambda: all(started(url) for url in urls), timeout=30
+        ), "The workers did not start"
+        yield urls
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait(timeout=10)
+        shutil.rmtree(data_dir, ignore_errors=True)
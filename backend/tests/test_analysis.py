@@ -0,0 +1,73 @@
+"""Structure analysis rejects structures it cannot or should not analyze."""
+
+import warnings
+
+import httpx
+import pytest
+
+from benchmarks.synthetic import synthetic_pdb
+from protein_folding.analysis import service
+from protein_folding.analysis.compute import analyze_structure
+from protein_folding.exceptions import ProteinStructureValidationError
+from protein_folding.models import MAX_STRUCTURE_LENGTH
+
+
+def with_x(pdb: str, residue: int, x: str, atom: str = "CA") -> str:
+    """Replace the x coordinate of an atom of the `residue`th residue."""
+    lines = pdb.split("\n")
+    i = [i for i, line in enumerate(lines) if line[12:16].strip() == atom][residue]
+    lines[i] = lines[i][:30] + f"{x:>8}" + lines[i][38:]
+    return "\n".join(lines)
+
+
+def test_analysis_within_the_limits():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert analyze_structure(synthetic_pdb(10), "pdb", 2000, max_residues=10)
+
+
+def test_too_many_residues():
+    with pytest.raises(ProteinStructureValidationError, match="11 residues"):
+        analyze_structure(synthetic_pdb(11), "pdb", 2000, max_residues=10)
+
+
+@pytest.mark.parametrize("x", ["abc", "1e999", "nan"])
+def test_coordinates_that_are_not_numbers(x):
+    pdb = with_x(synthetic_pdb(10), 3, x)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with pytest.raises(ProteinStructureValidationError, match="not numbers"):
+            analyze_structure(pdb, "pdb", 2000, max_residues=10)
+
+
+def test_only_c_alpha_coordinates_are_checked():
+    pdb = with_x(synthetic_pdb(10), 3, "abc", atom="N")
+
+    assert analyze_structure(pdb, "pdb", 2000, max_residues=10)
+
+
+def analyze(app_url: str, structure: str) -> httpx.Response:
+    return httpx.post(
+        f"{app_url}/api/v1/analysis",
+        json={"structure": structure, "format": "pdb"},
+        timeout=30,
+    )
+
+
+def test_rejected_structures_are_bad_requests(app_url, monkeypatch):
+    monkeypatch.setattr(service.env, "ANALYSIS_MAX_RESIDUES", 10)
+
+    too_many = analyze(app_url, synthetic_pdb(12, seed=25))
+    assert too_many.status_code == 400
+    assert "more than the limit of 10" in too_many.text
+
+    unreadable = analyze(app_url, with_x(synthetic_pdb(10, seed=25), 0, "abc"))
+    assert unreadable.status_code == 400
+    assert "not numbers" in unreadable.text
+
+
+def test_structure_longer_than_the_limit_is_refused(app_url):
+    response = analyze(app_url, "x" * (MAX_STRUCTURE_LENGTH + 1))
+
+    assert response.status_code == 422
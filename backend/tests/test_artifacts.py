@@ -0,0 +1,178 @@
+"""Stored fold structures and their downloads."""
+
+import os
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from protein_folding.artifacts import ArtifactStore, artifact_store, parse_range
+
+SIZE = 100
+DAY = 24 * 60 * 60
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-9", (0, 10)),
+        ("bytes=90-", (90, 100)),
+        ("bytes=-10", (90, 100)),
+        # Past the end is cut to the content
+        ("bytes=90-200", (90, 100)),
+        ("bytes=-200", (0, 100)),
+        ("bytes=99-99", (99, 100)),
+        ("Bytes = 0-9", (0, 10)),
+        # Ignored: the whole content is sent
+        ("bytes=0-9,20-29", None),
+        ("bytes=0-9, -5", None),
+        ("items=0-9", None),
+        ("bytes=a-9", None),
+        ("bytes=0-b", None),
+        ("bytes=", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    ["bytes=-0", "bytes=5-2", "bytes=100-", "bytes=100-200", "bytes=500-"],
+)
+def test_unsatisfiable_range(header):
+    with pytest.raises(HTTPException) as raised:
+        parse_range(header, SIZE)
+
+    assert raised.value.status_code == 416
+    assert raised.value.headers == {"Content-Range": f"bytes */{SIZE}"}
+
+
+@pytest.fixture
+def store(tmp_path) -> ArtifactStore:
+    return ArtifactStore(str(tmp_path), retention_seconds=DAY)
+
+
+def age(store: ArtifactStore, artifact_id: str, seconds: float) -> None:
+    path = store.get(artifact_id).path
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def stored_files(store: ArtifactStore):
+    return [name for _, _, files in os.walk(store.directory) for name in sorted(files)]
+
+
+def test_storing_a_structure_twice_keeps_one_file(store):
+    artifact_id = store.put("ATOM 1\n", "pdb")
+    age(store, artifact_id, DAY / 2)
+
+    assert store.put("ATOM 1\n", "pdb") == artifact_id
+    # The same text stored as mmCIF is another artifact
+    assert store.put("ATOM 1\n", "cif") != artifact_id
+
+    assert len(stored_files(store)) == 2
+    # Storing again renews the retention
+    assert time.time() - store.get(artifact_id).stat_result.st_mtime < 60
+    assert store.read(store.get(artifact_id)) == "ATOM 1\n"
+
+
+def test_prune_removes_artifacts_past_the_retention(store):
+    expired = store.put("expired\n", "pdb")
+    renewed = store.put("renewed\n", "pdb")
+    kept = store.put("kept\n", "pdb")
+    age(store, expired, DAY + 60)
+    age(store, renewed, DAY + 60)
+    abandoned = os.path.join(store.directory, "abandoned.tmp")
+    open(abandoned, "w").close()
+    os.utime(abandoned, (0, 0))
+
+    store.put("renewed\n", "pdb")
+
+    assert store.prune() == 2
+    assert store.get(expired) is None
+    assert store.get(renewed) is not None
+    assert store.get(kept) is not None
+    assert not os.path.exists(abandoned)
+
+
+@pytest.fixture
+def artifact(app_url):
+    content = "".join(f"ATOM  {i:5d}\n" for i in range(1000))
+    artifact_id = artifact_store.put(content, "pdb")
+    return f"{app_url}/api/v1/artifacts/{artifact_id}", content
+
+
+def download(url: str, **headers: str) -> httpx.Response:
+    return httpx.get(url, headers={"Accept-Encoding": "identity", **headers})
+
+
+def test_range_download(artifact):
+    url, content = artifact
+
+    response = download(url, Range="bytes=10-19")
+
+    assert response.status_code == 206
+    assert response.text == content[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(content)}"
+
+    suffix = download(url, Range="bytes=-5")
+    assert suffix.status_code == 206
+    assert suffix.text == content[-5:]
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [{"Range": "bytes=0-9,20-29"}, {"Range": "bytes=0-9", "If-Range": '"stale"'}],
+    ids=["multiple-ranges", "if-range-not-matching"],
+)
+def test_ignored_range_sends_the_whole_structure(artifact, headers):
+    url, content = artifact
+
+    response = download(url, **headers)
+
+    assert response.status_code == 200
+    assert response.text == content
+    assert "content-range" not in response.headers
+
+
+def test_if_range_matching_the_etag_sends_the_range(artifact):
+    url, content = artifact
+    etag = download(url).headers["etag"]
+
+    response = download(url, Range="bytes=0-9", **{"If-Range": etag})
+
+    assert response.status_code == 206
+    assert response.text == content[:10]
+
+
+@pytest.mark.parametrize("header", ["bytes=-0", "bytes=5-2", "bytes=99999-"])
+def test_unsatisfiable_range_download(artifact, header):
+    url, content = artifact
+
+    response = download(url, Range=header)
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+
+def test_gzip_download_and_revalidation(artifact):
+    url, content = artifact
+
+    response = httpx.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == content
+    etag = response.headers["etag"]
+    assert etag != download(url).headers["etag"]
+    revalidated = httpx.get(
+        url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_unknown_artifact_is_not_found(app_url):
+    response = httpx.get(f"{app_url}/api/v1/artifacts/{'0' * 64}.pdb")
+
+    assert response.status_code == 404
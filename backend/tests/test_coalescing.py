@@ -0,0 +1,95 @@
+"""Identical concurrent folds make a single upstream call."""
+
+import asyncio
+from typing import List
+
+import httpx
+
+from benchmarks import mock_upstream
+from conftest import unique_sequence, upstream_calls
+
+CONCURRENT_REQUESTS = 8
+
+
+async def post_all(urls: List[str], path: str, body: dict) -> List[httpx.Response]:
+    """POST `body` to `path` once per URL, all at the same time."""
+    async with httpx.AsyncClient(timeout=30) as client:
+        return await asyncio.gather(
+            *(client.post(f"{url}{path}", json=body) for url in urls)
+        )
+
+
+def test_concurrent_esmfold_requests_make_one_upstream_call(app_url):
+    mock_upstream.configure(esmfold_latency="0.5")
+    body = {"sequence": unique_sequence()}
+
+    responses = asyncio.run(
+        post_all([app_url] * CONCURRENT_REQUESTS, "/api/v1/protein_fold/esmfold", body)
+    )
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_REQUESTS
+    assert len({r.content for r in responses}) == 1
+    assert upstream_calls()["esmfold"] == 1
+
+
+def test_concurrent_boltz2_requests_make_one_upstream_call(app_url):
+    mock_upstream.configure(boltz2_latency="0.5")
+    body = {"sequence": unique_sequence(), "diffusion_samples": 2}
+
+    responses = asyncio.run(
+        post_all([app_url] * CONCURRENT_REQUESTS, "/api/v1/protein_fold/boltz2", body)
+    )
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_REQUESTS
+    assert len({r.content for r in responses}) == 1
+    assert upstream_calls()["boltz2"] == 1
+
+
+def test_identical_folds_in_a_batch_make_one_upstream_call(app_url):
+    mock_upstream.configure(esmfold_latency="0.2")
+    sequence = unique_sequence()
+    records = [{"id": str(i), "sequence": sequence} for i in range(5)]
+
+    response = httpx.post(
+        f"{app_url}/api/v1/protein_fold/esmfold/batch",
+        json={"records": records},
+        timeout=30,
+    )
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == len(records)
+    assert upstream_calls()["esmfold"] == 1
+
+
+def test_concurrent_folds_on_two_workers_make_one_upstream_call(worker_urls):
+    # Long enough for every request to reach a worker while the fold runs
+    mock_upstream.configure(esmfold_latency="1", boltz2_latency="1")
+    urls = worker_urls * (CONCURRENT_REQUESTS // len(worker_urls))
+
+    esmfold = asyncio.run(
+        post_all(urls, "/api/v1/protein_fold/esmfold", {"sequence": unique_sequence()})
+    )
+    boltz2 = asyncio.run(
+        post_all(urls, "/api/v1/protein_fold/boltz2", {"sequence": unique_sequence()})
+    )
+
+    for responses in (esmfold, boltz2):
+        assert [r.status_code for r in responses] == [200] * len(urls)
+        assert len({r.content for r in responses}) == 1
+    calls = upstream_calls()
+    assert calls["esmfold"] == 1
+    assert calls["boltz2"] == 1
+
+
+def test_followers_on_another_worker_share_the_leaders_failure(worker_urls):
+    # Every Boltz-2 job fails once its latency has passed
+    mock_upstream.configure(boltz2_latency="1", job_failure_rate=1.0)
+    urls = worker_urls * (CONCURRENT_REQUESTS // len(worker_urls))
+
+    responses = asyncio.run(
+        post_all(urls, "/api/v1/protein_fold/boltz2", {"sequence": unique_sequence()})
+    )
+
+    assert [r.status_code for r in responses] == [500] * len(urls)
+    # The waiting worker raised the leader's error instead of folding again
+    assert upstream_calls()["boltz2"] == 1
@@ -0,0 +1,58 @@
+"""Migrations of the application database."""
+
+import asyncio
+import sqlite3
+from typing import Iterator
+
+import pytest
+
+from protein_folding import database
+from protein_folding.database import MIGRATIONS, Database
+
+LEGACY_USERS = [(1, "Alice", "alice@example.com"), (7, "Bob", "bob@example.com")]
+
+
+def create_legacy_database(path: str) -> None:
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE Users "
+            "(id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL UNIQUE)"
+        )
+        conn.executemany("INSERT INTO Users VALUES (?, ?, ?)", LEGACY_USERS)
+    conn.close()
+
+
+@pytest.fixture
+def db(tmp_path) -> Iterator[Database]:
+    db = Database(str(tmp_path / "pomelo.db"), pool_size=1)
+    yield db
+    db.close()
+
+
+def users(db: Database):
+    rows = asyncio.run(db.fetch_all("SELECT id, name, email FROM Users ORDER BY id"))
+    return [tuple(row) for row in rows]
+
+
+def test_migrate_copies_the_legacy_users_once(db, tmp_path, monkeypatch):
+    legacy = str(tmp_path / "database.db")
+    create_legacy_database(legacy)
+    monkeypatch.setattr(database.env, "LEGACY_DATABASE_FILE", legacy)
+
+    assert asyncio.run(db.migrate()) == len(MIGRATIONS)
+    assert users(db) == LEGACY_USERS
+
+    # Later changes on either side are left alone
+    asyncio.run(db.execute("DELETE FROM Users WHERE id = 7"))
+    asyncio.run(db.migrate())
+    assert users(db) == LEGACY_USERS[:1]
+
+
+def test_migrate_without_a_legacy_database(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        database.env, "LEGACY_DATABASE_FILE", str(tmp_path / "database.db")
+    )
+
+    assert asyncio.run(db.migrate()) == len(MIGRATIONS)
+    assert users(db) == []
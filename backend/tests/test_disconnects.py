@@ -0,0 +1,142 @@
+"""Folds are cancelled when their client disconnects mid-flight."""
+
+import asyncio
+import json
+import re
+import socket
+import time
+from typing import Dict, Iterator
+from urllib.parse import urlsplit
+
+import httpx
+import pytest
+
+from benchmarks import mock_upstream
+from conftest import unique_sequence, upstream_calls, wait_for
+from protein_folding.ratelimit import upstream_limiter
+from protein_folding.scheduler import fold_scheduler
+
+# Upstream latency: every fold is still running when its client goes away
+LATENCY = 3.0
+# Several NVCF poll intervals (NVCF_POLL_MAX_DELAY in conftest)
+QUIET_SECONDS = 0.5
+# How long the rate limit test leaves no ESMFold token
+DRAIN_SECONDS = 2.0
+
+
+def disconnects(app_url: str, route: str) -> float:
+    """Current value of pomelo_client_disconnects_total for `route`."""
+    metrics = httpx.get(f"{app_url}/metrics").text
+    match = re.search(
+        rf'^pomelo_client_disconnects_total{{route="{re.escape(route)}"}} (\S+)$',
+        metrics,
+        re.MULTILINE,
+    )
+    return float(match.group(1)) if match else 0.0
+
+
+def open_request(app_url: str, path: str, body: dict) -> socket.socket:
+    """Send a POST over a raw socket, leaving it open to be closed mid-flight."""
+    url = urlsplit(app_url)
+    data = json.dumps(body).encode()
+    sock = socket.create_connection((url.hostname, url.port))
+    sock.sendall(
+        f"POST {path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+    )
+    return sock
+
+
+def assert_released() -> None:
+    """No fold is left running or queued in the worker's scheduler."""
+    for lane in fold_scheduler.lanes.values():
+        assert wait_for(lambda: lane.running == 0 and lane.in_flight == 0, timeout=2)
+        assert not lane.queues
+
+
+def esmfold_usage() -> Dict[str, float]:
+    return asyncio.run(upstream_limiter.usage())["esmfold"]
+
+
+@pytest.mark.parametrize(
+    "path, model, body, started",
+    [
+        (
+            "/api/v1/protein_fold/esmfold",
+            "esmfold",
+            lambda: {"sequence": unique_sequence()},
+            lambda calls: calls["esmfold"] >= 1,
+        ),
+        (
+            "/api/v1/protein_fold/boltz2",
+            "boltz2",
+            lambda: {"sequence": unique_sequence()},
+            # Submitted, and NVCF is being polled
+            lambda calls: calls["nvcf_status"] >= 1,
+        ),
+        (
+            "/api/v1/protein_fold/esmfold/batch",
+            "esmfold",
+            lambda: {
+                "records": [
+                    {"id": str(i), "sequence": unique_sequence()} for i in range(20)
+                ]
+            },
+            lambda calls: calls["esmfold"] >= 1,
+        ),
+    ],
+    ids=["esmfold", "boltz2", "batch"],
+)
+def test_disconnect_cancels_the_fold(app_url, path, model, body, started):
+    mock_upstream.configure(esmfold_latency=str(LATENCY), boltz2_latency=str(LATENCY))
+    disconnects_before = disconnects(app_url, path)
+    request_body = body()
+
+    sock = open_request(app_url, path, request_body)
+    assert wait_for(lambda: started(upstream_calls()))
+    disconnected_at = time.monotonic()
+    sock.close()
+
+    assert_released()
+    # Cancelled, not run to completion
+    assert time.monotonic() - disconnected_at < LATENCY
+    calls = upstream_calls()
+    time.sleep(QUIET_SECONDS)
+    assert upstream_calls()["nvcf_status"] == calls["nvcf_status"]
+    assert wait_for(lambda: disconnects(app_url, path) == disconnects_before + 1)
+
+    # The cancelled fold is not left in flight for the same request to join
+    mock_upstream.configure(esmfold_latency="0", boltz2_latency="0")
+    response = httpx.post(f"{app_url}{path}", json=request_body, timeout=30)
+    assert response.status_code == 200
+    assert upstream_calls()[model] > calls[model]
+
+
+@pytest.fixture
+def drained_esmfold_bucket() -> Iterator[None]:
+    """Leave no ESMFold token for the next DRAIN_SECONDS."""
+    budget = upstream_limiter.budgets["esmfold"]
+    upstream_limiter.buckets.drain("esmfold", budget, DRAIN_SECONDS)
+    yield
+    assert wait_for(lambda: esmfold_usage()["backlog"] == 0)
+
+
+def test_disconnect_while_rate_limited_refunds_the_token(
+    app_url, drained_esmfold_bucket
+):
+    path = "/api/v1/protein_fold/esmfold"
+    granted_before = esmfold_usage()["granted"]
+    disconnects_before = disconnects(app_url, path)
+
+    sock = open_request(app_url, path, {"sequence": unique_sequence()})
+    # Queued for a token that refills later
+    assert wait_for(lambda: esmfold_usage()["granted"] == granted_before + 1)
+    sock.close()
+
+    assert_released()
+    assert wait_for(lambda: esmfold_usage()["granted"] == granted_before)
+    assert wait_for(lambda: disconnects(app_url, path) == disconnects_before + 1)
+    # Past the time the token would have been used
+    assert wait_for(lambda: esmfold_usage()["backlog"] == 0)
+    assert upstream_calls()["esmfold"] == 0
@@ -0,0 +1,35 @@
+"""FASTA uploads are bounded before they are decoded or parsed."""
+
+import httpx
+
+from conftest import unique_sequence, upstream_calls
+from protein_folding import routers
+
+FASTA_PATH = "/api/v1/protein_fold/esmfold/batch/fasta"
+
+
+def upload(app_url: str, fasta: bytes) -> httpx.Response:
+    return httpx.post(
+        f"{app_url}{FASTA_PATH}", files={"file": ("batch.fasta", fasta)}, timeout=30
+    )
+
+
+def test_fasta_within_the_limit_is_folded(app_url, monkeypatch):
+    fasta = f">a\n{unique_sequence()}\n>b\n{unique_sequence()}\n".encode()
+    monkeypatch.setattr(routers.env, "ESMFOLD_FASTA_MAX_BYTES", len(fasta))
+
+    response = upload(app_url, fasta)
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 2
+
+
+def test_fasta_over_the_limit_is_rejected(app_url, monkeypatch):
+    monkeypatch.setattr(routers.env, "ESMFOLD_FASTA_MAX_BYTES", 1000)
+    # Not valid UTF-8 either: the size is checked before decoding
+    fasta = f">a\n{unique_sequence(2000)}\n".encode() + b"\xff"
+
+    response = upload(app_url, fasta)
+
+    assert response.status_code == 413
+    assert upstream_calls()["esmfold"] == 0
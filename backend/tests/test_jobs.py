@@ -0,0 +1,64 @@
+"""Background Boltz-2 jobs report the progress of the fold they await."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import httpx
+
+from benchmarks import mock_upstream
+from conftest import unique_sequence, upstream_calls, wait_for
+
+JOBS_PATH = "/api/v1/protein_fold/boltz2/jobs"
+
+
+def submit(app_url: str, body: dict) -> str:
+    response = httpx.post(f"{app_url}{JOBS_PATH}", json=body)
+    assert response.status_code == 202
+    return response.json()["job_id"]
+
+
+def stages_until_done(app_url: str, job_ids: List[str]) -> Dict[str, List[str]]:
+    """The progress stages each job goes through, polled until all have ended."""
+    stages: Dict[str, List[str]] = {job_id: [] for job_id in job_ids}
+
+    def done() -> bool:
+        ended = True
+        for job_id, seen in stages.items():
+            job = httpx.get(f"{app_url}{JOBS_PATH}/{job_id}").json()
+            stage = job["progress"].get("stage")
+            if not seen or seen[-1] != stage:
+                seen.append(stage)
+            ended &= job["status"] in ("succeeded", "failed")
+        return ended
+
+    assert wait_for(done, timeout=20, interval=0.02)
+    return stages
+
+
+def test_identical_jobs_all_get_progress(app_url):
+    mock_upstream.configure(boltz2_latency="1.5")
+    body = {"sequence": unique_sequence(), "diffusion_samples": 1}
+
+    job_ids = [submit(app_url, body) for _ in range(3)]
+
+    for stages in stages_until_done(app_url, job_ids).values():
+        assert "polling" in stages, stages
+        assert stages[-1] == "done"
+    assert upstream_calls()["boltz2"] == 1
+
+
+def test_job_joining_a_request_in_flight_gets_progress(app_url):
+    mock_upstream.configure(boltz2_latency="1.5")
+    body = {"sequence": unique_sequence(), "diffusion_samples": 1}
+
+    with ThreadPoolExecutor(1) as executor:
+        request = executor.submit(
+            httpx.post, f"{app_url}/api/v1/protein_fold/boltz2", json=body, timeout=20
+        )
+        assert wait_for(lambda: upstream_calls()["nvcf_status"] >= 1)
+        job_id = submit(app_url, body)
+        stages = stages_until_done(app_url, [job_id])[job_id]
+        assert request.result().status_code == 200
+
+    assert "polling" in stages, stages
+    assert upstream_calls()["boltz2"] == 1
@@ -0,0 +1,213 @@
+"""Token buckets and the upstream rate limiter built on them."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Iterator
+
+import httpx
+import pytest
+
+from benchmarks import mock_upstream
+from conftest import unique_sequence, upstream_calls
+from protein_folding import ratelimit
+from protein_folding.exceptions import (
+    ProteinFoldingAPIError,
+    ProteinFoldingRateLimitError,
+)
+from protein_folding.ratelimit import (
+    Budget,
+    TokenBuckets,
+    UpstreamRateLimiter,
+    upstream_limiter,
+)
+
+# One token a second, two at most
+BUDGET = Budget(rate_per_minute=60, burst=2)
+MAX_WAIT = 2.0
+
+
+class Clock:
+    """Stands in for the time module in ratelimit; advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def buckets(tmp_path) -> Iterator[TokenBuckets]:
+    buckets = TokenBuckets(str(tmp_path / "rate_limits.db"))
+    yield buckets
+    buckets.close()
+
+
+@pytest.fixture
+def limiter(buckets) -> UpstreamRateLimiter:
+    return UpstreamRateLimiter(buckets, {"model": BUDGET}, max_wait=MAX_WAIT)
+
+
+def test_tokens_refill_at_the_budget_rate_up_to_the_burst(buckets, clock):
+    assert buckets.reserve("model", BUDGET, MAX_WAIT) == 0
+    assert buckets.reserve("model", BUDGET, MAX_WAIT) == 0
+    assert buckets.usage("model", BUDGET)["tokens"] == 0
+
+    clock.now += 1.5
+    assert buckets.usage("model", BUDGET)["tokens"] == pytest.approx(1.5)
+    clock.now += 60
+    assert buckets.usage("model", BUDGET)["tokens"] == BUDGET.burst
+
+
+def test_empty_bucket_reserves_tokens_ahead_up_to_the_max_wait(buckets, clock):
+    waits = [buckets.reserve("model", BUDGET, MAX_WAIT) for _ in range(4)]
+
+    # The balance goes negative, and each caller waits for its own token
+    assert waits == [0, 0, 1.0, 2.0]
+    assert buckets.usage("model", BUDGET)["tokens"] == -2
+    # A third second of waiting is over the maximum: refused, nothing taken
+    assert buckets.reserve("model", BUDGET, MAX_WAIT) is None
+    usage = buckets.usage("model", BUDGET)
+    assert usage["tokens"] == -2
+    assert (usage["granted"], usage["rejected"]) == (4, 1)
+
+
+def test_refund_returns_a_token(buckets, clock):
+    for _ in range(3):
+        buckets.reserve("model", BUDGET, MAX_WAIT)
+
+    buckets.refund("model", BUDGET)
+
+    usage = buckets.usage("model", BUDGET)
+    assert usage["tokens"] == 0
+    assert usage["granted"] == 2
+
+
+def test_cancelled_wait_refunds_its_token(limiter, buckets):
+    # No token for the next 10 seconds
+    buckets.drain("model", BUDGET, 10)
+
+    async def wait_and_cancel() -> None:
+        async def acquire() -> None:
+            async with limiter.acquire("model", max_wait=60):
+                pass
+
+        task = asyncio.create_task(acquire())
+        while buckets.usage("model", BUDGET)["granted"] == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(wait_and_cancel())
+
+    usage = buckets.usage("model", BUDGET)
+    assert usage["granted"] == 0
+    assert usage["tokens"] == pytest.approx(-10, abs=0.1)
+
+
+def test_cancelled_while_taking_the_token_refunds_it(limiter, buckets, monkeypatch):
+    reserve = buckets.reserve
+
+    def slow_reserve(*args):
+        time.sleep(0.2)
+        return reserve(*args)
+
+    monkeypatch.setattr(buckets, "reserve", slow_reserve)
+
+    async def cancel_while_reserving() -> None:
+        async def acquire() -> None:
+            async with limiter.acquire("model"):
+                pass
+
+        task = asyncio.create_task(acquire())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_reserving())
+
+    usage = buckets.usage("model", BUDGET)
+    assert usage["granted"] == 0
+    assert usage["tokens"] == pytest.approx(BUDGET.burst)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ProteinFoldingAPIError("Too many requests", 429),
+        httpx.HTTPStatusError(
+            "Too many requests",
+            request=httpx.Request("POST", "http://upstream"),
+            response=httpx.Response(429),
+        ),
+    ],
+    ids=["api-error", "http-status-error"],
+)
+def test_upstream_429_drains_the_bucket(limiter, buckets, clock, error):
+    async def rate_limited() -> None:
+        async with limiter.acquire("model"):
+            raise error
+
+    with pytest.raises(type(error)):
+        asyncio.run(rate_limited())
+
+    # Every worker backs off for RATE_LIMIT_UPSTREAM_BACKOFF_SECONDS
+    backoff = ratelimit.env.RATE_LIMIT_UPSTREAM_BACKOFF_SECONDS
+    assert buckets.usage("model", BUDGET)["tokens"] == -backoff * BUDGET.rate
+
+
+def test_other_upstream_errors_leave_the_bucket(limiter, buckets, clock):
+    async def failed() -> None:
+        async with limiter.acquire("model"):
+            raise ProteinFoldingAPIError("Unavailable", 503)
+
+    with pytest.raises(ProteinFoldingAPIError):
+        asyncio.run(failed())
+
+    assert buckets.usage("model", BUDGET)["tokens"] == BUDGET.burst - 1
+
+
+def test_retry_after_is_when_a_token_is_within_the_max_wait(limiter, buckets, clock):
+    assert asyncio.run(limiter.retry_after("model")) == 0
+
+    buckets.drain("model", BUDGET, 10)
+
+    # The next token refills in 11 seconds, 9 past the longest wait
+    assert asyncio.run(limiter.retry_after("model")) == pytest.approx(9)
+
+    async def refused() -> None:
+        async with limiter.acquire("model"):
+            pass
+
+    with pytest.raises(ProteinFoldingRateLimitError) as raised:
+        asyncio.run(refused())
+    assert raised.value.retry_after == pytest.approx(9)
+    assert raised.value.status_code == 429
+
+
+def test_each_boltz2_invocation_attempt_takes_a_token(app_url):
+    # Every invocation is answered 503, which NVCF has not started a job for
+    mock_upstream.configure(error_rate=1.0, error_statuses=(503,))
+    granted_before = asyncio.run(upstream_limiter.usage())["boltz2"]["granted"]
+
+    response = httpx.post(
+        f"{app_url}/api/v1/protein_fold/boltz2",
+        json={"sequence": unique_sequence()},
+        timeout=30,
+    )
+
+    assert response.status_code == 503
+    attempts = upstream_calls()["boltz2"]
+    assert attempts == ratelimit.env.UPSTREAM_RETRY_ATTEMPTS
+    granted = asyncio.run(upstream_limiter.usage())["boltz2"]["granted"]
+    assert granted == granted_before + attempts
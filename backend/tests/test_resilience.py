@@ -0,0 +1,225 @@
+"""Circuit breakers, retries and hedged requests for upstream calls."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import List, Optional
+
+import httpx
+import pytest
+
+from protein_folding import resilience
+from protein_folding.exceptions import (
+    ProteinFoldingAPIError,
+    ProteinFoldingCircuitOpenError,
+)
+from protein_folding.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    HedgePolicy,
+    RetryPolicy,
+    UpstreamResilience,
+    retry_reason,
+)
+
+REQUEST = httpx.Request("POST", "http://upstream")
+RESET_SECONDS = 30.0
+
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    return httpx.HTTPStatusError(
+        f"{status}", request=REQUEST, response=httpx.Response(status)
+    )
+
+
+class Clock:
+    """Stands in for the time module in resilience; advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def breaker(clock) -> CircuitBreaker:
+    return CircuitBreaker(
+        "test", failure_threshold=3, reset_seconds=RESET_SECONDS, half_open_probes=2
+    )
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    # A success in between resets the count
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.acquire()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.acquire()
+    assert breaker.retry_after == RESET_SECONDS
+
+
+def test_half_open_breaker_lets_a_limited_number_of_probes_through(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += RESET_SECONDS
+
+    assert breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire()
+    assert not breaker.acquire()
+    # A probe ending with a client error gives its place back
+    breaker.release()
+    assert breaker.acquire()
+    assert not breaker.acquire()
+
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.acquire()
+
+
+def test_failed_probe_opens_the_breaker_again(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += RESET_SECONDS
+    assert breaker.acquire()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.acquire()
+    clock.now += RESET_SECONDS
+    assert breaker.acquire()
+    assert breaker.state == HALF_OPEN
+
+
+@pytest.mark.parametrize(
+    "error, idempotent, reason",
+    [
+        (httpx.ConnectError("refused", request=REQUEST), False, "connect"),
+        (httpx.ConnectTimeout("timed out", request=REQUEST), False, "connect"),
+        (status_error(503), False, "503"),
+        (ProteinFoldingAPIError("Unavailable", 503), False, "503"),
+        # May have started a job upstream
+        (httpx.ReadError("reset", request=REQUEST), False, None),
+        (httpx.ReadTimeout("timed out", request=REQUEST), False, None),
+        (status_error(502), False, None),
+        (status_error(504), False, None),
+        (status_error(500), False, None),
+        (ProteinFoldingAPIError("Too many requests", 429), False, None),
+        (httpx.ReadError("reset", request=REQUEST), True, "connection"),
+        (status_error(502), True, "502"),
+        (status_error(504), True, "504"),
+        (httpx.ReadTimeout("timed out", request=REQUEST), True, None),
+        (status_error(500), True, None),
+        (status_error(400), True, None),
+    ],
+)
+def test_retry_reason(error, idempotent, reason):
+    assert retry_reason(error, idempotent) == reason
+
+
+def upstream(hedge: Optional[HedgePolicy] = None) -> UpstreamResilience:
+    return UpstreamResilience(
+        RetryPolicy(attempts=3, initial_delay=0, max_delay=0, multiplier=2, jitter=0),
+        {
+            "test": CircuitBreaker(
+                "test", failure_threshold=5, reset_seconds=30, half_open_probes=1
+            )
+        },
+        {"test": hedge} if hedge is not None else {},
+    )
+
+
+@pytest.mark.parametrize(
+    "error, attempts",
+    [
+        (httpx.ConnectError("refused", request=REQUEST), 3),
+        (status_error(503), 3),
+        (status_error(502), 1),
+        (httpx.ReadError("reset", request=REQUEST), 1),
+    ],
+    ids=["connect-error", "503", "502", "read-error"],
+)
+def test_non_idempotent_calls_retry_only_when_not_processed(error, attempts):
+    calls: List[int] = []
+
+    async def attempt() -> None:
+        calls.append(1)
+        raise error
+
+    with pytest.raises(type(error)):
+        asyncio.run(upstream().call("test", attempt, idempotent=False))
+    assert len(calls) == attempts
+
+
+def test_open_circuit_refuses_calls_without_attempting():
+    resilient = upstream()
+    calls: List[int] = []
+
+    async def attempt() -> None:
+        calls.append(1)
+        raise status_error(503)
+
+    # Five failures in two calls of up to three attempts
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(resilient.call("test", attempt, idempotent=False))
+    assert len(calls) == 5
+
+    with pytest.raises(ProteinFoldingCircuitOpenError):
+        asyncio.run(resilient.call("test", attempt, idempotent=False))
+    assert len(calls) == 5
+
+
+def hedging() -> HedgePolicy:
+    policy = HedgePolicy(percentile=0.5, min_delay=0.05, min_samples=1, window=10)
+    policy.latencies.add(0.05)
+    return policy
+
+
+@pytest.mark.parametrize("winner", ["hedge", "first"])
+def test_hedge_cancels_the_losing_attempt(winner):
+    cancelled: List[str] = []
+
+    def request(name: str, seconds: float):
+        async def attempt() -> str:
+            try:
+                await asyncio.sleep(seconds)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            return name
+
+        return attempt
+
+    # The hedge goes out after 0.05 s
+    first, hedge = (5.0, 0.01) if winner == "hedge" else (0.1, 5.0)
+
+    result = asyncio.run(
+        upstream(hedging()).call(
+            "test",
+            request("first", first),
+            idempotent=True,
+            hedge=request("hedge", hedge),
+        )
+    )
+
+    assert result == winner
+    assert cancelled == ["first" if winner == "hedge" else "hedge"]
@@ -0,0 +1,84 @@
+"""Per-client caps of the fold scheduler."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from protein_folding.exceptions import ProteinFoldingRateLimitError
+from protein_folding.scheduler import (
+    INTERACTIVE,
+    ClientMiddleware,
+    FoldScheduler,
+    Lane,
+    fold_context,
+)
+
+
+def scheduler() -> FoldScheduler:
+    # Room for one fold at a time, and one more queued per client
+    lane = Lane(INTERACTIVE, capacity=1, quantum=1, max_queued_per_client=1)
+    return FoldScheduler({INTERACTIVE: lane})
+
+
+async def queue_folds(scheduler: FoldScheduler, count: int) -> List[BaseException]:
+    """Start `count` folds of cost 1 that never finish; the errors of those refused."""
+    errors: List[BaseException] = []
+
+    async def fold() -> None:
+        try:
+            async with scheduler.slot(INTERACTIVE, 1):
+                await asyncio.Event().wait()
+        except ProteinFoldingRateLimitError as e:
+            errors.append(e)
+
+    tasks = [asyncio.create_task(fold()) for _ in range(count)]
+    await asyncio.sleep(0.01)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return errors
+
+
+def test_trusted_client_is_capped():
+    async def run() -> List[BaseException]:
+        with fold_context(client="user-a", trusted=True):
+            return await queue_folds(scheduler(), 3)
+
+    # One running, one queued, one refused
+    errors = asyncio.run(run())
+    assert len(errors) == 1
+    assert errors[0].status_code == 429
+
+
+def test_client_known_by_address_only_is_not_capped():
+    async def run() -> List[BaseException]:
+        # e.g. the address of the proxy every client comes through
+        with fold_context(client="10.0.0.1"):
+            return await queue_folds(scheduler(), 3)
+
+    assert asyncio.run(run()) == []
+
+
+@pytest.mark.parametrize(
+    "header, headers, capped",
+    [
+        (None, [(b"x-client-id", b"user-a")], False),
+        ("X-Client-Id", [(b"x-client-id", b"user-a")], True),
+        ("X-Client-Id", [], False),
+    ],
+    ids=["no-header-configured", "header-sent", "header-missing"],
+)
+def test_client_middleware_caps_only_clients_named_by_the_header(
+    header, headers, capped
+):
+    errors: List[BaseException] = []
+
+    async def app(scope, receive, send) -> None:
+        errors.extend(await queue_folds(scheduler(), 3))
+
+    middleware = ClientMiddleware(app, header=header)
+    scope = {"type": "http", "headers": headers, "client": ("10.0.0.1", 1234)}
+    asyncio.run(middleware(scope, None, None))
+
+    assert len(errors) == (1 if capped else 0)
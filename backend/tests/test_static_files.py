@@ -0,0 +1,57 @@
+"""Static files are served from the current build, precompressed variants too."""
+
+import asyncio
+import os
+
+import pytest
+from starlette.requests import Request
+
+from protein_folding.static_files import StaticDirectory
+
+
+def get(accept_encoding: str = "") -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())]
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def write(path, body: bytes, mtime_ns: int) -> None:
+    path.write_bytes(body)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def static(tmp_path) -> StaticDirectory:
+    write(tmp_path / "app.js", b"console.log(1)", 1_000_000_000)
+    write(tmp_path / "app.js.br", b"brotli-1", 2_000_000_000)
+    return StaticDirectory(
+        str(tmp_path), memory_max_bytes=1 << 20, memory_max_file_bytes=1 << 20
+    )
+
+
+def served(static: StaticDirectory, accept_encoding: str = "br"):
+    response = asyncio.run(static.response(get(accept_encoding), "app.js"))
+    return response.headers.get("content-encoding"), response.body
+
+
+def test_rebuilt_variant_is_served(static, tmp_path):
+    assert served(static) == ("br", b"brotli-1")
+
+    write(tmp_path / "app.js.br", b"brotli-22", 3_000_000_000)
+
+    assert served(static) == ("br", b"brotli-22")
+
+
+def test_added_and_removed_variants_are_noticed(static, tmp_path):
+    assert served(static, "gzip") == (None, b"console.log(1)")
+
+    write(tmp_path / "app.js.gz", b"gzip-1", 2_000_000_000)
+    assert served(static, "gzip") == ("gzip", b"gzip-1")
+
+    (tmp_path / "app.js.br").unlink()
+    assert served(static, "br") == (None, b"console.log(1)")
+
+
+def test_variant_older_than_its_file_is_ignored(static, tmp_path):
+    write(tmp_path / "app.js", b"console.log(2)", 4_000_000_000)
+
+    assert served(static) == (None, b"console.log(2)")
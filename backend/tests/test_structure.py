@@ -0,0 +1,189 @@
+"""
+pLDDT extraction matches the line-by-line parsers it replaced.
+
+Expected values were recorded from the original implementation, in
+fixtures/baseline_plddt.json for the synthetic structures. The mmCIF cases
+the original got wrong (chains merged by residue number, semicolon text
+fields) expect the correct values instead.
+"""
+
+import json
+import os
+from typing import List, Tuple
+
+import pytest
+
+from benchmarks.synthetic import synthetic_mmcif, synthetic_pdb
+from protein_folding.utils import calculate_plddt_from_mmcif, calculate_plddt_from_pdb
+
+with open(
+    os.path.join(os.path.dirname(__file__), "fixtures", "baseline_plddt.json")
+) as f:
+    BASELINE = json.load(f)
+
+MMCIF_TAGS = (
+    "group_PDB",
+    "id",
+    "label_atom_id",
+    "label_comp_id",
+    "auth_asym_id",
+    "auth_seq_id",
+    "B_iso_or_equiv",
+)
+
+
+def pdb_atom(
+    res_seq: int,
+    b_factor: str,
+    record: str = "ATOM",
+    name: str = "CA",
+    x: str = "1.000",
+) -> str:
+    """A PDB atom line, with fields given as text so they can be malformed."""
+    return (
+        f"{record:<6}{1:5d} {name:<4} ALA A{res_seq:4d}    {x:>8}{2.0:8.3f}"
+        f"{3.0:8.3f}{1.0:6.2f}{b_factor:>6}           C"
+    )
+
+
+@pytest.mark.parametrize("n_residues", [1, 10, 1000])
+def test_synthetic_pdb(n_residues):
+    assert calculate_plddt_from_pdb(synthetic_pdb(n_residues)) == pytest.approx(
+        BASELINE[f"pdb/{n_residues}"]
+    )
+
+
+@pytest.mark.parametrize(
+    "pdb, expected",
+    [
+        pytest.param(
+            synthetic_pdb(10).replace("\n", "\r\n"),
+            BASELINE["pdb/10"],
+            id="crlf-line-endings",
+        ),
+        pytest.param(
+            "\n".join(
+                [
+                    pdb_atom(1, "0.50"),
+                    # Cut before and inside the B-factor column
+                    pdb_atom(2, "0.70")[:54],
+                    pdb_atom(3, "0.90")[:62],
+                ]
+            ),
+            [50.0],
+            id="short-lines",
+        ),
+        pytest.param(
+            "\n".join(
+                [
+                    pdb_atom(-3, "0.50"),
+                    pdb_atom(-3, "0.70", name="CB"),
+                    pdb_atom(0, "0.40"),
+                    pdb_atom(2, "0.90"),
+                ]
+            ),
+            [60.0, 40.0, 90.0],
+            id="negative-residue-numbers",
+        ),
+        pytest.param(
+            "\n".join(
+                [
+                    pdb_atom(1, "0.50"),
+                    pdb_atom(2, "0.10", record="HETATM", name="C1"),
+                    pdb_atom(1, "0.90", record="HETATM", name="C1"),
+                ]
+            ),
+            [50.0],
+            id="hetatm-lines",
+        ),
+        pytest.param(
+            "\n".join(
+                [
+                    pdb_atom(1, "0.50"),
+                    pdb_atom(2, "abc"),
+                    pdb_atom(3, "0.7x0"),
+                    # Only the residue number and B-factor are read
+                    pdb_atom(4, "0.80", x="abc"),
+                    pdb_atom(4, "1e-1"),
+                    pdb_atom(5, "0.50")[:22] + "  x " + pdb_atom(5, "0.50")[26:],
+                    "ATOM  bad line",
+                ]
+            ),
+            [50.0, 45.0],
+            id="bad-numbers",
+        ),
+    ],
+)
+def test_pdb_edge_cases(pdb: str, expected: List[float]):
+    assert calculate_plddt_from_pdb(pdb) == pytest.approx(expected)
+
+
+def mmcif(rows: Tuple[str, ...], end: str = "#\n") -> str:
+    """An mmCIF with a single _atom_site loop of MMCIF_TAGS, ended by `end`."""
+    header = "".join(f"_atom_site.{tag}\n" for tag in MMCIF_TAGS)
+    return "data_test\n#\nloop_\n" + header + "".join(f"{row}\n" for row in rows) + end
+
+
+def test_synthetic_mmcif():
+    assert calculate_plddt_from_mmcif(synthetic_mmcif(50)) == pytest.approx(
+        BASELINE["mmcif/50"]
+    )
+
+
+def test_mmcif_chains_and_ligands_are_not_merged():
+    plddt = calculate_plddt_from_mmcif(synthetic_mmcif(50, n_chains=2, ligand_atoms=5))
+
+    # Two chains of 25 residues and the ligand. The original parser keyed
+    # residues by number alone and returned 25 values
+    assert len(plddt) == 51
+    # Chain A draws the same values as the first residues of a single chain
+    assert plddt[:25] == pytest.approx(BASELINE["mmcif/50"][:25])
+
+
+@pytest.mark.parametrize(
+    "cif, expected",
+    [
+        pytest.param(
+            mmcif(
+                (
+                    "ATOM 1 N ALA A 1 80.0",
+                    """ATOM 2 "C1'" ALA A 1 90.0""",
+                    "ATOM 3 'O' ALA A 2 70.0",
+                    """HETATM 4 "O5'" 'LIG' B 3 60.0""",
+                )
+            ),
+            [85.0, 70.0, 60.0],
+            id="quoted-tokens",
+        ),
+        pytest.param(
+            mmcif(
+                (
+                    "ATOM 1 N ALA A 1 80.0",
+                    # A semicolon text field spanning lines inside a row
+                    "ATOM 2 CA",
+                    ";multi-line",
+                    "text",
+                    ";",
+                    "A 2 60.0",
+                    "ATOM 3 C ALA A 2 40.0",
+                )
+            ),
+            [80.0, 50.0],
+            id="semicolon-text-field",
+        ),
+        pytest.param(
+            mmcif(
+                (
+                    "ATOM 1 N ALA A 1 80.0",
+                    "ATOM 2 CA ALA A 1 0.5",
+                    "ATOM 3 C ALA A 2 70.0",
+                ),
+                end="",
+            ).rstrip("\n"),
+            [65.0, 70.0],
+            id="last-loop-unterminated",
+        ),
+    ],
+)
+def test_mmcif_edge_cases(cif: str, expected: List[float]):
+    assert calculate_plddt_from_mmcif(cif) == pytest.approx(expected)
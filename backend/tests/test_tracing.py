@@ -0,0 +1,62 @@
+"""Traces are exported to TRACE_EXPORT_PATH off the event loop."""
+
+import json
+import threading
+import uuid
+
+from protein_folding import tracing
+from protein_folding.tracing import Span, Trace, TraceRecorder
+
+
+def finished_trace(name: str) -> Trace:
+    trace = Trace(uuid.uuid4().hex, name)
+    Span(trace, name, None, {})
+    return trace
+
+
+def test_exported_traces_are_appended_in_order(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    recorder = TraceRecorder(capacity=10, export_path=str(path))
+    traces = [finished_trace(f"fold-{i}") for i in range(50)]
+
+    for trace in traces:
+        recorder.record(trace)
+    recorder.close()
+
+    exported = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [t["trace_id"] for t in exported] == [t.trace_id for t in traces]
+    # Only the latest traces are kept in memory
+    assert len(recorder.recent(100)) == 10
+
+
+def test_record_does_not_wait_for_the_export_file(tmp_path, monkeypatch):
+    writable = threading.Event()
+    real_open = open
+
+    def slow_open(*args, **kwargs):
+        writable.wait(timeout=10)
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(tracing, "open", slow_open, raising=False)
+    path = tmp_path / "traces.jsonl"
+    recorder = TraceRecorder(capacity=10, export_path=str(path))
+
+    # Returns while the exporter is stuck opening the file
+    recorder.record(finished_trace("fold"))
+    assert recorder.recent(1)[0]["name"] == "fold"
+    assert not path.exists()
+
+    writable.set()
+    recorder.close()
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_unwritable_export_path_is_logged(tmp_path, caplog):
+    recorder = TraceRecorder(
+        capacity=10, export_path=str(tmp_path / "missing" / "traces.jsonl")
+    )
+
+    recorder.record(finished_trace("fold"))
+    recorder.close()
+
+    assert "Could not export 1 traces" in caplog.text
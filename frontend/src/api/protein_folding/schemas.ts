@@ -38,6 +38,7 @@ export type Boltz2Request = z.infer<typeof Boltz2RequestSchema>;
 export const Boltz2ResultSchema = z.object({
   mmcif_string: z.string(),
   plddt: z.array(z.number()),
+  chain_plddt: z.record(z.string(), z.array(z.number())).optional(),
   confidence_scores: z.array(z.number()),
 });
 export type Boltz2Result = z.infer<typeof Boltz2ResultSchema>;